@@ -1,15 +1,12 @@
+import functools
 import gettext
 import logging
-import math
 import os
 from enum import Enum
 from importlib.metadata import PackageNotFoundError, version
 from importlib.resources import as_file, files
 
 import geopandas as gpd
-import matplotlib
-import matplotlib.pyplot as plt
-import matplotlib.ticker as ticker
 import pandas as pd
 import pyproj
 import rasterio
@@ -25,7 +22,6 @@ from enca.framework.config_check import (
 )
 from enca.framework.errors import Error
 from enca.framework.geoprocessing import (
-    MINIMUM_RESOLUTION,
     POLY_MIN_SIZE,
     SHAPE_ID,
     GeoProcessing,
@@ -34,7 +30,7 @@ from enca.framework.geoprocessing import (
     number_blocks,
     statistics_byArea,
 )
-from enca.framework.run import _LAND_COVER, Run
+from enca.framework.run import _LAND_COVER, Run, _shape_ids, _snap_bounds
 
 try:
     dist_name = 'sys4enca'
@@ -52,6 +48,18 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 
+@functools.lru_cache(maxsize=1)
+def _version_info():
+    """Build the version string for :meth:`ENCARun.version_info`.
+
+    Package versions don't change within a session, so we only look up the package metadata once.
+    """
+    return f'ENCA version {__version__} using ' \
+           f'GDAL (osgeo) {version("GDAL")}, rasterio {version("rasterio")}, geopandas {version("geopandas")} ' \
+           f'numpy {version("numpy")}, pandas {version("pandas")}, ' \
+           f'pyproj {pyproj.__version__}., PROJ {pyproj.proj_version_str}'
+
+
 class RunType(Enum):
     """ENCA runs belong to one of these types."""
 
@@ -73,9 +81,6 @@ AREA_RAST = 'Area_rast'
 PARAMETERS_CSV = 'parameters_csv'
 LAND_COVER = 'land_cover'
 
-# Use non-interactive matplotlib backend
-matplotlib.use('Agg')
-
 
 class ENCARun(Run):
     """Run class with extra properties for ENCA."""
@@ -143,10 +148,7 @@ class ENCARun(Run):
 
     def version_info(self):
         """Return string with describing version of ENCA and its main dependencies."""
-        return f'ENCA version {__version__} using ' \
-               f'GDAL (osgeo) {version("GDAL")}, rasterio {version("rasterio")}, geopandas {version("geopandas")} ' \
-               f'numpy {version("numpy")}, pandas {version("pandas")}, ' \
-               f'pyproj {pyproj.__version__}., PROJ {pyproj.proj_version_str}'
+        return _version_info()
 
     def area_stats(self, block_shape=(2048, 2048), add_progress=lambda p: None):
         """Count number of pixels per statistics region, and number of overlapping pixels with each reporting region.
@@ -206,7 +208,7 @@ class ENCARun(Run):
 
         try:
             check_epsg = self.admin_shape.crs.to_epsg()
-        except Exception:
+        except AttributeError:  # no CRS at all
             raise ConfigError('Please provide an administrative boundaries shapefile with a valid EPSG projection.',
                               [_ADMIN_BOUNDS])
 
@@ -214,7 +216,7 @@ class ENCARun(Run):
             self.admin_shape.to_crs(epsg=self.epsg, inplace=True)
             logger.debug('Warped administrative boundaries vector file.')
 
-        self.admin_shape[SHAPE_ID] = range(1, 1 + self.admin_shape.shape[0])
+        self.admin_shape[SHAPE_ID] = _shape_ids(len(self.admin_shape))
 
         # Get the administrative regions needed to cover all selected SELU ("statistical") regions:
         logger.debug('Clip administrative boundaries shapefile by selected statistical regions.')
@@ -223,7 +225,7 @@ class ENCARun(Run):
         df_check = df_check[~df_check.is_empty]
         df_check = df_check[df_check.area > POLY_MIN_SIZE]
         # Check if the adminstrative regions cover the set of seleted statistical regions:
-        area_delta = self.statistics_shape.area.sum() - df_check.area.sum()
+        area_delta = self.statistics_areas.sum() - df_check.area.sum()
         '''
         if abs(area_delta) > (self.src_res[0] * self.src_res[1] / 3.):
             raise ConfigError('The administrative boundaries shapefile does not cover all selected SELU shapes.',
@@ -260,6 +262,12 @@ class ENCARun(Run):
 
     def write_selu_maps(self, parameters, selu_stats, year):
         """Plot some columns of the SELU + statistics GeoDataFrame."""
+        # matplotlib is only needed here, and importing it takes a noticeable part of the package import time.
+        import matplotlib
+        matplotlib.use('Agg')  # Use non-interactive matplotlib backend
+        import matplotlib.pyplot as plt
+        import matplotlib.ticker as ticker
+
         for column in parameters:
             fig, ax = plt.subplots(figsize=(10, 10))
             selu_stats.plot(column=column, ax=ax, legend=True,
@@ -343,16 +351,9 @@ class ENCARunAdminAOI(ENCARun):
         """Override _StudyScopeCheck to set AOI based administrative boundaries shapefile."""
         # Generate the bounds for the AOI
         logger.debug('Calculate the raster AOI based on administrative boundaries')
-        # first get total bounds for selected regions in statistical vector file
-        # format: minx, miny, maxx, maxy
-        bbox = self.admin_shape.total_bounds
-        # allign to min_resolution increment to support better merges
-        bbox = bbox / MINIMUM_RESOLUTION
-        # named tuple - BoundingBox(left, bottom, right, top)
-        AOI_bbox = rasterio.coords.BoundingBox(left=math.floor(bbox[0]) * MINIMUM_RESOLUTION,
-                                               bottom=math.floor(bbox[1]) * MINIMUM_RESOLUTION,
-                                               right=math.ceil(bbox[2]) * MINIMUM_RESOLUTION,
-                                               top=math.ceil(bbox[3]) * MINIMUM_RESOLUTION)
+        # total bounds of the selected administrative regions, aligned to MINIMUM_RESOLUTION increments to support
+        # better merges
+        AOI_bbox = _snap_bounds(self.admin_shape.total_bounds)
 
         # Set up the accord object with the needed extent
         logger.debug('Initialize the global raster AccoRD object')
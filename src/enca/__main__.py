@@ -1,8 +1,6 @@
 import logging
 import sys
 
-import yaml
-
 import enca
 import enca.components
 import enca.framework.geoprocessing
@@ -44,8 +42,7 @@ def main():
     args = parse_args()
     enca.framework.run.set_up_console_logging(logger, args.verbose)
     if args.config:
-        with open(args.config) as f:
-            config = yaml.safe_load(f)
+        config = enca.framework.run.load_yaml(args.config)
     else:
         config = dict()
 
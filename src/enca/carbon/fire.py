@@ -6,7 +6,7 @@ import rasterio.warp as warp
 
 import enca
 from enca.framework.config_check import ConfigItem, YEARLY
-from enca.framework.geoprocessing import block_window_generator, RasterType
+from enca.framework.geoprocessing import block_window_generator, GeoProcessing, RasterType
 
 FOREST_BIOMASS = 'forest_biomass'
 BURNT_AREAS = 'burnt_areas'
@@ -47,12 +47,13 @@ class CarbonFire(enca.ENCARun):
             aoi_bounds = warp.transform_bounds(ds_aoi.crs,  ds_modis.crs, *ds_aoi.bounds)
             aoi_window = ds_modis.window(*aoi_bounds).round_offsets().round_lengths(op='ceil')
             bbox = rasterio.windows.bounds(aoi_window, ds_modis.transform)
-            cmd = (f'gdalwarp --config GDAL_CACHEMAX 256 -overwrite -t_srs "{ds_modis.crs}" '
-                   f'-te {bbox[0]} {bbox[1]} {bbox[2]} {bbox[3]} '
-                   f'-tr {ds_modis.res[0]} {ds_modis.res[1]} '
-                   '-r bilinear -co COMPRESS=DEFLATE -co INTERLEAVE=BAND -co TILED=YES -overwrite '
-                   f'"{file_biomass}" "{self.file_biomass_modis}"')
-        subprocess.check_call(cmd, shell=True)
+            cmd = ['gdalwarp', '--config', 'GDAL_CACHEMAX', GeoProcessing.gdal_cache_pct,
+                   '-wm', str(GeoProcessing.gdal_warp_memory), '-overwrite', '-t_srs', str(ds_modis.crs),
+                   '-te', str(bbox[0]), str(bbox[1]), str(bbox[2]), str(bbox[3]),
+                   '-tr', str(ds_modis.res[0]), str(ds_modis.res[1]),
+                   '-r', 'bilinear', '-co', 'COMPRESS=DEFLATE', '-co', 'INTERLEAVE=BAND', '-co', 'TILED=YES',
+                   file_biomass, self.file_biomass_modis]
+        subprocess.check_call(cmd)
 
     def fire_carbon(self, year, block_shape=(1024, 1024)):
         """Mask biomass with MODIS burnt areas, and convert to carbon."""
@@ -6,7 +6,7 @@ import rasterio
 
 import enca
 from enca.framework.config_check import ConfigItem, YEARLY
-from enca.framework.geoprocessing import block_window_generator, average_rasters
+from enca.framework.geoprocessing import block_window_generator, average_rasters, GeoProcessing
 
 
 logger = logging.getLogger(__name__)
@@ -89,12 +89,12 @@ class CarbonErosion(enca.ENCARun):
             tresolution = src.transform[0]
             bbox = src.bounds
             target_epsg = src.crs.to_epsg()
-        cmd = ('gdalwarp --config GDAL_CACHEMAX 256 -overwrite -t_srs '
-               'EPSG:{} -te {} {} {} {} -tr {} {} -r bilinear '
-               '-co COMPRESS=deflate -co BIGTIFF=YES -multi "{}" "{}"').format(
-                   target_epsg, bbox.left, bbox.bottom, bbox.right, bbox.top, tresolution, tresolution,
-                   path_temp, path_out)
-        subprocess.check_call(cmd, shell=True)
+        cmd = ['gdalwarp', '--config', 'GDAL_CACHEMAX', GeoProcessing.gdal_cache_pct,
+               '-wm', str(GeoProcessing.gdal_warp_memory), '-overwrite', '-t_srs', f'EPSG:{target_epsg}',
+               '-te', str(bbox.left), str(bbox.bottom), str(bbox.right), str(bbox.top),
+               '-tr', str(tresolution), str(tresolution), '-r', 'bilinear',
+               '-co', 'COMPRESS=deflate', '-co', 'BIGTIFF=YES', '-multi', path_temp, path_out]
+        subprocess.check_call(cmd)
         return path_out
 
     def soil_carbon_average(self, tresolution, bbox, target_crs, block_shape=(1024, 1024)):
@@ -190,27 +190,25 @@ class CarbonErosion(enca.ENCARun):
 def Cut2AOI(path_in, path_out, bbox):
     """Cut raster to AOI when in same coordinate system."""
     # get extent, resolution and projection from AOI raster file
-    cmd = 'gdal_translate --config GDAL_CACHEMAX 256 -co COMPRESS=LZW -projwin {} {} {} {} "{}" "{}"'.format(
-                                                                  bbox[0], bbox[3], bbox[2], bbox[1],
-                                                                  path_in, path_out)
-    subprocess.check_call(cmd, shell=True)
+    cmd = ['gdal_translate', '--config', 'GDAL_CACHEMAX', GeoProcessing.gdal_cache_pct, '-co', 'COMPRESS=LZW',
+           '-projwin', str(bbox[0]), str(bbox[3]), str(bbox[2]), str(bbox[1]), path_in, path_out]
+    subprocess.check_call(cmd)
 
 
 def Resample2AOI(path_in, path_out, target_crs, bbox, tresolution, wResampling='bilinear'):
     """Resample a file to an AOI without any checks."""
-    cmd = ('gdalwarp --config GDAL_CACHEMAX 256 -overwrite -t_srs "{}" '
-           '-te {} {} {} {} -tr {} {} -r {} -co COMPRESS=LZW -co BIGTIFF=YES -multi "{}" "{}"').format(
-               str(target_crs).replace('"', '\\"'), bbox.left, bbox.bottom, bbox.right, bbox.top,
-               tresolution, tresolution, wResampling, path_in, path_out)
-    subprocess.check_call(cmd, shell=True)
+    cmd = ['gdalwarp', '--config', 'GDAL_CACHEMAX', GeoProcessing.gdal_cache_pct,
+           '-wm', str(GeoProcessing.gdal_warp_memory), '-overwrite', '-t_srs', str(target_crs),
+           '-te', str(bbox.left), str(bbox.bottom), str(bbox.right), str(bbox.top),
+           '-tr', str(tresolution), str(tresolution), '-r', wResampling,
+           '-co', 'COMPRESS=LZW', '-co', 'BIGTIFF=YES', '-multi', path_in, path_out]
+    subprocess.check_call(cmd)
 
 
 def FillHoles(path_in, path_out):
     """Fill nodata holes."""
-    cmd = '"{}" -md 25 "{}" "{}"'.format(_GDAL_FILLNODATA , path_in, path_out)
-    subprocess.check_call(cmd, shell=True)
+    subprocess.check_call([_GDAL_FILLNODATA, '-md', '25', path_in, path_out])
     # bring back the nodata value in the file
     with rasterio.open(path_in) as src:
         nodata = src.nodata
-    cmd = '"{}" -a_nodata "{}" "{}"'.format(_GDAL_EDIT, nodata, path_out)
-    subprocess.check_call(cmd, shell=True)
+    subprocess.check_call([_GDAL_EDIT, '-a_nodata', str(nodata), path_out])
@@ -19,10 +19,9 @@ which passes the tests from the :func:`check_csv` function, and a subsection ``f
 contains two values that should pass the checks defined in :obj:`ConfigRaster`."""
 
 import copy
-import glob
 import logging
 import os
-from functools import reduce
+from functools import cached_property, lru_cache, reduce
 
 import fiona
 import pandas as pd
@@ -36,6 +35,44 @@ from .geoprocessing import RasterType
 
 logger = logging.getLogger(__name__)
 
+_RASTER_SUFFIXES = ('.tif', '.tiff')
+
+
+def list_rasters(dir):
+    """Return the paths of all files with extension ``.tif`` or ``.tiff`` in directory ``dir``.
+
+    Extensions are matched case-insensitively, hidden files are skipped.  The directory is scanned only once as long as
+    it is not modified.
+
+    :param dir: Directory to scan.
+    :return: List of file paths.
+    """
+    return list(_list_rasters_cached(dir, os.stat(dir).st_mtime_ns))
+
+
+@lru_cache(maxsize=64)
+def _list_rasters_cached(dir, mtime):
+    """Cached version of :func:`list_rasters`, the modification time is only part of the cache key."""
+    with os.scandir(dir) as entries:
+        return tuple(entry.path for entry in entries
+                     if not entry.name.startswith('.') and entry.name.lower().endswith(_RASTER_SUFFIXES)
+                     and entry.is_file())
+
+
+class _SafeFilenameTable(dict):
+    """Translation table for :meth:`str.translate` which replaces non-alphanumeric characters by '_'.
+
+    Entries are filled in on first use, so the table covers all of unicode.
+    """
+
+    def __missing__(self, key):
+        self[key] = value = key if chr(key).isalnum() else '_'
+        return value
+
+
+# Translation table to make file names out of config keys:
+_SAFE_FILENAME_TABLE = _SafeFilenameTable()
+
 
 class ConfigError(Error):
     """Subclass to signal errors in the configuration or input files provided by the user.
@@ -179,6 +216,11 @@ class ConfigShape(ConfigItem):
 
 class RasterMixin:
 
+    @cached_property
+    def safe_name(self):
+        """Name derived from the config path of this item, safe to use as a file or directory name."""
+        return '_'.join(map(str, self._path)).translate(_SAFE_FILENAME_TABLE)
+
     def check_raster(self, file):
         """Check if ``file`` can be opened using :func:`rasterio.open`, and has the required minimum extent.
 
@@ -231,7 +273,7 @@ class ConfigRasterDir(ConfigItem, RasterMixin):
         if not os.path.isdir(dir):
             raise Error(f'"{dir}" is not a directory.')
 
-        raster_files = glob.glob(os.path.join(dir, '*.tif')) + glob.glob(os.path.join(dir, '*.tiff'))
+        raster_files = list_rasters(dir)
 
         if not raster_files:
             raise Error(f'"{dir}" does not contain any with extension ".tif" or ".tiff".')
@@ -364,6 +406,12 @@ def check_exists(file):
         raise Error(f'File "{file}" does not exist.')
 
 
+def check_positive_int(value):
+    """Check if ``value`` is a positive integer, raise :obj:`.errors.Error` otherwise."""
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        raise Error(f'Expected a positive integer, got "{value}".')
+
+
 def check_csv(file, required_columns=[], unique_columns=[], allow_missing=True, dtypes=None, delimiter=None):
     """Check if ``file`` can be read using :func:`pandas.read_csv`.
 
@@ -1,12 +1,19 @@
 """Geographic raster and vector data processing utilities."""
 
+import concurrent.futures
+import copy
 import datetime
+import functools
+import hashlib
 import logging
 import math
 import os
 import re
+import shlex
+import shutil
 import subprocess
-from contextlib import ExitStack
+import threading
+from contextlib import ExitStack, contextmanager, suppress
 from enum import Enum
 from importlib.metadata import version
 from os.path import splitext, basename, normpath
@@ -16,11 +23,15 @@ import numpy as np
 import geopandas as gpd
 import pandas as pd
 import rasterio
-import rasterio.mask
+import rasterio.features
+import rasterio.fill
+import rasterio.warp
 import shapely.geometry
 from osgeo import __version__ as GDALversion
+from rasterio.enums import Resampling
+from rasterio.errors import RasterioError
+from rasterio.vrt import WarpedVRT
 from rasterio.windows import Window
-from scipy.ndimage import correlate
 
 from .ecosystem import ECOTYPE, ECO_ID
 from .errors import Error
@@ -42,19 +53,48 @@ ESRI_IDENTIFIER = [54009]
 MINIMUM_RESOLUTION = 100.
 POLY_MIN_SIZE = 0.1  # size in square metre for minimum area for valid statistics vector to be used
 EARTH_CIRCUMFERENCE_METRE = 40075000
+_METRE_PER_DEGREE_LAT = round(EARTH_CIRCUMFERENCE_METRE / 360)  # length of a degree of latitude, rounded to metres
+RASTERIZE_MAX_COORDINATES = 2000000  # above this number of vertices, rasterize() uses gdal_rasterize by default
 
-_GDAL_FILLNODATA = 'gdal_fillnodata.bat' if os.name == 'nt' else 'gdal_fillnodata.py'
-_GDAL_EDIT = 'gdal_edit.bat' if os.name == 'nt' else 'gdal_edit.py'
-_GDAL_CALC = 'gdal_calc.bat' if os.name == 'nt' else 'gdal_calc.py'
-_GDAL_POLY = 'gdal_polygonize.bat' if os.name == 'nt' else 'gdal_polygonize.py'
+
+def _gdal_script(name):
+    """Return the command for a GDAL Python utility: the .bat wrapper on Windows, resolved on the PATH only once."""
+    name = f'{name}.bat' if os.name == 'nt' else f'{name}.py'
+    return shutil.which(name) or name
+
+
+_GDAL_FILLNODATA = _gdal_script('gdal_fillnodata')
+_GDAL_EDIT = _gdal_script('gdal_edit')
+_GDAL_POLY = _gdal_script('gdal_polygonize')
+_POLY_ARGS = (_GDAL_POLY, '-8')  # polygonize with 8-connectedness, like our in-process vectorize
+_STAMP_SUFFIX = '.enca.stamp'  # sidecar file identifying the input and options an output file was produced with
+_TILE_SIZE = 512  # tile size of our GeoTIFF outputs, which roughly matches the chunks the GDAL warper works on
+# gdalwarp options shared by all our warps (the in-process equivalent is in GeoProcessing._warp_in_process)
+# (plus the number of warper threads, see GeoProcessing._warp_args)
+_WARP_ARGS = ('-et', '0', '-ovr', 'None', '-wo', 'SAMPLE_STEPS=50', '-wo', 'SOURCE_EXTRA=5', '-wo', 'SAMPLE_GRID=YES')
 
 SUM = 'sum'
 COUNT = 'px_count'
 
+_INPUT_FILE_TAG = re.compile(r'^(input-file\d*)$')  # raster tags which describe the input files of a raster
+_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"  # format of the time stamps in our raster tags
+_REGION_MISMATCH = ('Mismatch between selected regions and rasterized regions shapefile.  '
+                    'This may happen when continuing from a previous run with different settings.')
+
+
+@functools.lru_cache(maxsize=None)
+def _software_tags():
+    """Return the raster tags describing the software versions, which are the same for every file we write."""
+    return {"ENCA-version": version('sys4enca'),
+            "software_raster_processing": "rasterio {} (on GDAL {}); "
+                                          "GDAL binary {}".format(rasterio.__version__, rasterio.__gdal_version__,
+                                                                  GDALversion),
+            "software_vector_processing": "geopandas {}".format(gpd.__version__)}
+
+
 # Map rasterio dtypes to GDAL command line dtypes names:
-# Note: For signed int8, we use a workaround to make GDAL do the right thing. g
-# Plugging in output type 'Byte -co PIXELTYPE-SIGNEDBYTE' in our external GDAL command lines will only work as long as
-# we run them from a single string, with shell=True.
+# Note: For signed int8, we use a workaround to make GDAL do the right thing: the output type
+# 'Byte -co PIXELTYPE=SIGNEDBYTE' has to be split into separate command line arguments (see _ot_args).
 _dtype_map = {
     rasterio.int8: 'Byte -co PIXELTYPE=SIGNEDBYTE',  # TODO change this to 'Int8' from GDAL 3.7 onwards...
     rasterio.uint8: 'Byte',
@@ -69,6 +109,118 @@ _dtype_map = {
     # rasterio.complex128: 'CFloat64',
     # rasterio.complex_int16: 'Cint16'
 }
+_dtype_map_inverse = {gdal_name: dtype for dtype, gdal_name in _dtype_map.items()}
+_DTYPE_MAP = {np.dtype(dtype): gdal_name for dtype, gdal_name in _dtype_map.items()}
+
+
+def _smallest_int_dtype(*values):
+    """Return the GDAL name of the narrowest integer type which can hold all given (integer) values.
+
+    :return: GDAL data type name, or None if the values don't fit in a 32 bit integer type.
+    """
+    low, high = min(values), max(values)
+    for dtype in ('uint8', 'uint16', 'int16', 'uint32', 'int32'):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return _DTYPE_MAP[np.dtype(dtype)]
+    return None
+
+
+@functools.lru_cache(maxsize=32)
+def _crs_epsg(crs):
+    """Return the EPSG code of a CRS, cached because :meth:`rasterio.crs.CRS.to_epsg` may search the PROJ database."""
+    return crs.to_epsg()
+
+
+def _remove_files(*paths):
+    """Remove intermediate files, skipping the ones which were not (yet) created and paths which are None."""
+    for path in paths:
+        if path is not None:
+            with suppress(FileNotFoundError):
+                os.remove(path)
+
+
+def _output_exists(path, stamp=None):
+    """Check if an output file was already produced, with a single stat call.
+
+    An empty file is left behind by an interrupted run: it is removed, so the output is produced again.  If a ``stamp``
+    is given, the output is only reused if its stamp file (see :func:`_write_stamp`) matches, otherwise it was produced
+    from another version of the input or with other options, and it is removed as well.
+    """
+    try:
+        size = os.stat(path).st_size
+    except FileNotFoundError:
+        return False
+    if size > 0 and (stamp is None or _read_stamp(path) == stamp):
+        return True
+    os.remove(path)
+    return False
+
+
+def _read_stamp(path):
+    """Return the stamp written for output file ``path``, or None if there is none."""
+    try:
+        with open(path + _STAMP_SUFFIX) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _write_stamp(path, stamp):
+    """Write the stamp of a successfully produced output file ``path`` to its sidecar file."""
+    with open(path + _STAMP_SUFFIX, 'w') as f:
+        f.write(stamp)
+
+
+def _gdal_dtype(dtype):
+    """Map a rasterio/numpy dtype to its GDAL command line name; anything else (e.g. a GDAL name) is passed through."""
+    if dtype is None:  # np.dtype(None) would give float64
+        return None
+    try:
+        return _DTYPE_MAP.get(np.dtype(dtype), dtype)
+    except TypeError:
+        return dtype
+
+
+def _rasterio_dtype(gdal_name):
+    """Map a GDAL command line dtype name (as found in :data:`_dtype_map`) back to a rasterio dtype."""
+    return _dtype_map_inverse.get(gdal_name) or ('uint8' if gdal_name == 'Byte' else gdal_name.lower())
+
+
+def _ot_args(dtype):
+    """Return the GDAL command line arguments for output data type ``dtype`` (a GDAL name from :data:`_dtype_map`)."""
+    return ['-ot', *dtype.split()]
+
+
+def _predictor(dtype):
+    """Return the GeoTIFF PREDICTOR to use with DEFLATE compression for a GDAL dtype name (None if there is none).
+
+    Horizontal differencing (2) compresses large areas of equal values in integer rasters very well, the floating
+    point predictor (3) does the same for smoothly varying floating point rasters.
+    """
+    return {'i': 2, 'u': 2, 'f': 3}.get(np.dtype(_rasterio_dtype(dtype)).kind)
+
+
+def _creation_profile(dtype):
+    """Return the rasterio profile items for our tiled, DEFLATE compressed GeoTIFF outputs (see _creation_options)."""
+    profile = {'tiled': True, 'blockxsize': _TILE_SIZE, 'blockysize': _TILE_SIZE, 'compress': 'deflate',
+               'interleave': 'band'}
+    if _predictor(dtype) is not None:
+        profile['predictor'] = _predictor(dtype)
+    return profile
+
+
+def _creation_options(dtype):
+    """Return the GDAL command line creation options for our tiled, DEFLATE compressed GeoTIFF outputs.
+
+    :param dtype: GDAL dtype name of the output
+    """
+    options = ['-co', 'COMPRESS=DEFLATE', '-co', 'INTERLEAVE=BAND', '-co', 'TILED=YES',
+               '-co', f'BLOCKXSIZE={_TILE_SIZE}', '-co', f'BLOCKYSIZE={_TILE_SIZE}']
+    predictor = _predictor(dtype)
+    if predictor is not None:
+        options += ['-co', f'PREDICTOR={predictor}']
+    return options
 
 
 class RasterType(Enum):
@@ -81,6 +233,45 @@ class RasterType(Enum):
     ABSOLUTE_VOLUME = 3
 
 
+# Decision table for Bring2AOI: (processing case, raster type, resolution case) -> (processing mode, resampling mode)
+# possible processing_modes: Crop2AOI, Translate2AOI, Warp2AOI, VolumeWarp2AOI
+# possible resampling_modes: nearest, sum, bilinear, mode, average
+_PROCESSING_TABLE = {
+    ('crop', RasterType.CATEGORICAL, 'same'): ('Crop2AOI', 'nearest'),
+    ('crop', RasterType.RELATIVE, 'same'): ('Crop2AOI', 'bilinear'),
+    ('crop', RasterType.ABSOLUTE_POINT, 'same'): ('Crop2AOI', 'nearest'),
+    ('crop', RasterType.ABSOLUTE_VOLUME, 'same'): ('Crop2AOI', 'nearest'),
+    ('resample', RasterType.CATEGORICAL, 'up-sampling'): ('Translate2AOI', 'nearest'),
+    ('resample', RasterType.CATEGORICAL, 'down-sampling'): ('Translate2AOI', 'mode'),
+    ('resample', RasterType.RELATIVE, 'up-sampling'): ('Translate2AOI', 'bilinear'),
+    ('resample', RasterType.RELATIVE, 'down-sampling'): ('Translate2AOI', 'average'),
+    ('resample', RasterType.ABSOLUTE_POINT, 'up-sampling'): ('Translate2AOI', 'bilinear'),
+    ('resample', RasterType.ABSOLUTE_POINT, 'down-sampling'): ('Translate2AOI', 'average'),
+    ('resample', RasterType.ABSOLUTE_VOLUME, 'up-sampling'): ('VolumeWarp2AOI', 'sum'),
+    ('resample', RasterType.ABSOLUTE_VOLUME, 'down-sampling'): ('VolumeWarp2AOI', 'sum'),
+    ('warp', RasterType.CATEGORICAL, 'same'): ('Warp2AOI', 'nearest'),
+    ('warp', RasterType.CATEGORICAL, 'up-sampling'): ('Warp2AOI', 'nearest'),
+    ('warp', RasterType.CATEGORICAL, 'down-sampling'): ('Warp2AOI', 'mode'),
+    ('warp', RasterType.RELATIVE, 'same'): ('Warp2AOI', 'near'),
+    ('warp', RasterType.RELATIVE, 'up-sampling'): ('Warp2AOI', 'bilinear'),
+    ('warp', RasterType.RELATIVE, 'down-sampling'): ('Warp2AOI', 'average'),
+    ('warp', RasterType.ABSOLUTE_POINT, 'same'): ('Warp2AOI', 'near'),
+    ('warp', RasterType.ABSOLUTE_POINT, 'up-sampling'): ('Warp2AOI', 'bilinear'),
+    ('warp', RasterType.ABSOLUTE_POINT, 'down-sampling'): ('Warp2AOI', 'average'),
+    ('warp', RasterType.ABSOLUTE_VOLUME, 'same'): ('VolumeWarp2AOI', 'sum'),
+    ('warp', RasterType.ABSOLUTE_VOLUME, 'up-sampling'): ('VolumeWarp2AOI', 'sum'),
+    ('warp', RasterType.ABSOLUTE_VOLUME, 'down-sampling'): ('VolumeWarp2AOI', 'sum'),
+}
+
+
+def _read_tags(path):
+    """Return the dataset tags of a raster file, with the dataset name added as tag 'name'."""
+    with rasterio.open(path, 'r') as src:
+        src_tags = src.tags()
+        src_tags.update(name=src.name)
+    return src_tags
+
+
 class Metadata(object):
     """This class handles all metadata.
 
@@ -93,13 +284,8 @@ class Metadata(object):
         self.module = module
         self.master_tags = {"creator": creator,
                             "Module": self.module,
-                            "ENCA-version": version('sys4enca'),
-                            "software_raster_processing": "rasterio {} (on GDAL {}); "
-                                                          "GDAL binary {}".format(rasterio.__version__,
-                                                                                  rasterio.__gdal_version__,
-                                                                                  GDALversion),
-                            "software_vector_processing": "geopandas {}".format(gpd.__version__),
-                            "creation_time": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+                            **_software_tags(),
+                            "creation_time": datetime.datetime.now().strftime(_TIMESTAMP_FORMAT)}
         self.raster_tags = {}
 
     def read_raster_tags(self, path_list):
@@ -110,14 +296,15 @@ class Metadata(object):
         :param path_list: list of absolute file names for which the metadata is extracted
         """
         self.raster_tags = {}
-        counter = 1
+        # Reading the tags is mostly waiting for I/O, so with several input files, we open them concurrently.
+        if len(path_list) > 1:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(8, len(path_list))) as executor:
+                all_tags = list(executor.map(_read_tags, path_list))
+        else:
+            all_tags = [_read_tags(path) for path in path_list]
         # now we refill with all files used to process the current file
-        for path in path_list:
+        for counter, src_tags in enumerate(all_tags, start=1):
             history_counter = 1
-            # get tags of raster file
-            with rasterio.open(path, 'r') as src:
-                src_tags = src.tags()
-                src_tags.update(name=src.name)
             # now we create the current file history line
             if "file_creation" not in src_tags.keys():
                 src_tags['file_creation'] = 'unknown'
@@ -134,11 +321,10 @@ class Metadata(object):
                                          src_tags['processing'])})
             # deal with existing 1st child history lines of input files
             for key in src_tags.keys():
-                if re.match("^(input-file\\d*)$", key):
+                if _INPUT_FILE_TAG.match(key):
                     # now we add this tag line to the history of the specific file
                     self.raster_tags.update({"input-file{}-history{}".format(counter, history_counter): src_tags[key]})
                     history_counter += 1
-            counter += 1
 
     def update_dataset_tags(self, ds, processing_info, unit, *input_rasters):
         """Update metadata tags of a :class:`rasterio.DatasetWriter`.
@@ -159,23 +345,198 @@ class Metadata(object):
         :param unit_info: Unit of the raster values
         :return: dictionary of metadata tags for rasterio
         """
-        # first we fill the main tags for the new file
-        out_tags = {"file_creation": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        # the main tags for the new file, the master tags, and the raster tags prepared from the input files if exist
+        out_tags = {"file_creation": datetime.datetime.now().strftime(_TIMESTAMP_FORMAT),
                     "processing": processing_info,
-                    "unit": unit_info}
-        # now we add the master tags
-        out_tags.update(self.master_tags)
-        # now we add the raster tags prepared from the input files if exist
-        if self.raster_tags:
-            out_tags.update(self.raster_tags)
-            # reset raster_tags since it is a one-time use
-            self.raster_tags = {}
+                    "unit": unit_info,
+                    **self.master_tags,
+                    **self.raster_tags}
+        # reset raster_tags since it is a one-time use
+        self.raster_tags = {}
         return out_tags
 
 
+def _clip_to_block(geometries, bounds, res):
+    """Clip geometries which stick out of a block to that block, in a single vectorized GEOS call.
+
+    Geometries crossing block borders would otherwise be handed to the rasterizer with all of their vertices for
+    every block they touch.  The clip rectangle lies half a pixel outside the block, so the edges introduced by
+    clipping only touch pixels outside the block, and the burned values inside the block are unchanged, also with
+    ``all_touched``.
+
+    :param geometries: array of shapely geometries
+    :param bounds: (left, bottom, right, top) of the block
+    :param res: (x, y) pixel size
+    :return: array of clipped geometries, which may contain empty geometries
+    """
+    left, bottom, right, top = bounds
+    rect = (left - res[0] / 2, bottom - res[1] / 2, right + res[0] / 2, top + res[1] / 2)
+    geom_bounds = shapely.bounds(geometries)
+    outside = ((geom_bounds[:, 0] < rect[0]) | (geom_bounds[:, 1] < rect[1])
+               | (geom_bounds[:, 2] > rect[2]) | (geom_bounds[:, 3] > rect[3]))
+    if not outside.any():
+        return geometries
+    geometries = geometries.copy()
+    geometries[outside] = shapely.clip_by_rect(geometries[outside], *rect)
+    return geometries
+
+
+def _value_bins(values):
+    """Return the offset and number of bins to count the given raster values with :func:`np.bincount`.
+
+    Raster value ``v`` goes in bin ``v - offset``, where the offset is the smallest value, if negative, or 0.
+
+    :param values: integer raster values
+    :return: tuple (offset, number of bins)
+    """
+    if len(values) == 0:
+        return 0, 0
+    offset = min(int(min(values)), 0)
+    return offset, int(max(values)) - offset + 1
+
+
+def _factor_table(factors, *values):
+    """Build a dense lookup table of factors by (combination of) raster values, for :func:`_lookup_factors`.
+
+    Raster value ``v`` is stored at index ``v + 1``: the first and last index along every axis catch the raster values
+    below 0 and above the largest given value.  These, and all combinations without a factor, look up NaN.
+
+    :param factors: array of factors (NaN for none)
+    :param values: for every axis, an array with the raster value of every factor
+    :return: numpy array with the lookup table
+    """
+    table = np.full([int(np.max(axis_values, initial=0)) + 3 for axis_values in values], np.nan)
+    table[tuple(np.asarray(axis_values, dtype=np.intp) + 1 for axis_values in values)] = factors
+    return table
+
+
+def _lookup_factors(table, *arrays):
+    """Look up the factor for every pixel in a table built by :func:`_factor_table`, in a single pass over the block.
+
+    :param table: lookup table
+    :param arrays: raster blocks with the raster values for every axis of the table
+    :return: array of factors, NaN for pixels without a factor
+    """
+    return table[tuple(np.clip(np.add(array, 1, dtype=np.intp), 0, size - 1)
+                       for array, size in zip(arrays, table.shape))]
+
+
+def _thread_buffer(buffers, name, shape, dtype):
+    """Return an array of the given shape, backed by a buffer which is reused by all blocks processed in a thread.
+
+    Saves allocating (and page faulting) fresh arrays for every block: the array is only valid until the next call with
+    the same ``buffers`` and ``name`` in the same thread.
+
+    :param buffers: :class:`threading.local` holding the buffers
+    :param name: name of the buffer in ``buffers``
+    :param shape: shape of the array
+    :param dtype: data type of the array
+    :return: numpy array (uninitialized)
+    """
+    size = math.prod(shape)
+    buffer = getattr(buffers, name, None)
+    if buffer is None or buffer.size < size or buffer.dtype != dtype:
+        buffer = np.empty(size, dtype)
+        setattr(buffers, name, buffer)
+    return buffer[:size].reshape(shape)
+
+
+def _valid_mask(block, nodata):
+    """Return the mask of the pixels of a block which are not nodata (``nodata`` may be NaN, or None)."""
+    if nodata is None:
+        return np.ones(block.shape, dtype=bool)
+    if np.isnan(nodata):
+        return ~np.isnan(block)
+    return block != nodata
+
+
+def _cache_file(path_cache, name):
+    """Return the path of the .npy file holding raster ``name`` in the raw raster cache ``path_cache``."""
+    return f'{path_cache}_{name}.npy'
+
+
+def _create_cache(path_cache, **datasets):
+    """Create a cache of raw (uncompressed) copies of the first band of some rasters.
+
+    The cache is filled block by block with :func:`_write_cached`, so a second pass over the same rasters can read them
+    from :func:`_open_cache` with :func:`_read_cached`, instead of reading and decompressing them again.
+
+    :param path_cache: path prefix of the cache files, or None for no cache
+    :param datasets: rasterio datasets to cache, by name
+    :return: dict of writable memory maps by name (empty for no cache)
+    """
+    if path_cache is None:
+        return {}
+    return {name: np.lib.format.open_memmap(_cache_file(path_cache, name), mode='w+', dtype=src.dtypes[0],
+                                            shape=src.shape)
+            for name, src in datasets.items()}
+
+
+def _open_cache(path_cache, *names):
+    """Open the memory maps of rasters ``names`` in the raw raster cache ``path_cache`` for reading."""
+    return {name: np.load(_cache_file(path_cache, name), mmap_mode='r') for name in names}
+
+
+def _write_cached(cache, name, window, block):
+    """Store a block of raster ``name`` in a raw raster cache (if any), see :func:`_create_cache`.
+
+    Blocks are written through a memory map, so different threads can write different blocks at the same time.
+    """
+    if cache:
+        (row_start, row_stop), (col_start, col_stop) = window
+        cache[name][row_start:row_stop, col_start:col_stop] = block
+
+
+def _read_cached(cache, name, window, out):
+    """Read a block of raster ``name`` from a raw raster cache (see :func:`_open_cache`) into ``out``."""
+    (row_start, row_stop), (col_start, col_stop) = window
+    np.copyto(out, cache[name][row_start:row_stop, col_start:col_stop])
+    return out
+
+
+def _with_gdal_env(method):
+    """Decorate a :class:`GeoProcessing` method to run it inside a :class:`rasterio.Env` with our GDAL options."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with rasterio.Env(**self.gdal_env_options):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _with_default_gdal_env(function):
+    """Decorate a module level function to run it with the GDAL options of :class:`GeoProcessing`.
+
+    If the caller already set up a :class:`rasterio.Env` in the current thread (e.g. a :class:`GeoProcessing` method),
+    that one is used.  :class:`rasterio.Env` settings are per thread, so this also applies in worker threads.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if rasterio.env.hasenv():
+            return function(*args, **kwargs)
+        with rasterio.Env(**GeoProcessing.gdal_env_options):
+            return function(*args, **kwargs)
+    return wrapper
+
+
 class GeoProcessing(object):
     """Handles the geoprocessing of raster and vector files towards given profile of reference raster."""
 
+    #: GDAL configuration options, used for in-process GDAL calls and passed on to the GDAL command line tools.
+    gdal_env_options = {'GDAL_CACHEMAX': 1024,
+                        'GDAL_NUM_THREADS': 'ALL_CPUS',
+                        'VSI_CACHE': 'TRUE',
+                        'VSI_CACHE_SIZE': 67108864,
+                        'CPL_VSIL_CURL_ALLOWED_EXTENSIONS': '.tif,.tiff',
+                        'CHECK_DISK_FREE_SPACE': 'NO'}
+    #: Block cache size for the GDAL command line tools, as a percentage of the RAM (overrides GDAL_CACHEMAX of
+    #: :attr:`gdal_env_options`, which is used in-process).
+    gdal_cache_pct = '10%'
+    #: Warp memory limit (MB) for gdalwarp and our in-process warps.  (gdalwarp only accepts a percentage of the RAM
+    #: since GDAL 3.8.)
+    gdal_warp_memory = 512
+    #: Number of threads GDAL uses to warp and compress a single raster, None for all CPUs (see :meth:`copy`).
+    num_threads = None
+
     def __init__(self, creator, module, temp_dir, ProjectExtentTiff=None, GDAL_verbose=False):
         """Initialize the GeoProcessing object with basic metadata and optional reference raster.
 
@@ -203,8 +564,8 @@ class GeoProcessing(object):
             # note: if really Geographical projection needed then init the ref_profile and ref_extent manually
             try:
                 self._epsg_check(param['epsg'], ProjectExtentTiff)
-            except Exception:
-                raise ValueError('the provided raster file to init the GeoProcessing object has no valid EPSG.')
+            except Error as e:
+                raise ValueError('the provided raster file to init the GeoProcessing object has no valid EPSG.') from e
 
             if param['epsg'] in ESRI_IDENTIFIER:
                 raise RuntimeError('ESRI projections without EPSG conversion are currently not supported as '
@@ -228,6 +589,230 @@ class GeoProcessing(object):
         self.temp_dir = temp_dir
         self.src_parameters = {}   # all the parameters of the raster file which has to be geoprocessed
 
+    @property
+    def ref_extent(self):
+        """Extent of the reference grid, typically the extent of the statistical raster processing file."""
+        return self._ref_extent
+
+    @ref_extent.setter
+    def ref_extent(self, extent):
+        self._ref_extent = extent
+        # Prepared once here, so repeated predicate tests against the reference extent use GEOS' indexed geometry.
+        self._ref_box = None if extent is None else shapely.box(*extent)
+        if self._ref_box is not None:
+            shapely.prepare(self._ref_box)
+
+    @property
+    def ref_epsg(self):
+        """EPSG code of the reference profile's CRS."""
+        return _crs_epsg(self.ref_profile['crs'])
+
+    @property
+    def reporting_epsg(self):
+        """EPSG code of the reporting profile's CRS."""
+        return _crs_epsg(self.reporting_profile['crs'])
+
+    @property
+    def ref_res(self):
+        """Resolution (x, y) of the reference profile, as positive floats."""
+        transform = self.ref_profile['transform']
+        return float(transform.a), float(abs(transform.e))
+
+    @property
+    def reporting_res(self):
+        """Resolution (x, y) of the reporting profile, as positive floats."""
+        transform = self.reporting_profile['transform']
+        return float(transform.a), float(abs(transform.e))
+
+    def _projwin(self):
+        """Return the reference extent as gdal_translate -projwin arguments (ulx uly lrx lry)."""
+        return [str(self.ref_extent.left), str(self.ref_extent.top),
+                str(self.ref_extent.right), str(self.ref_extent.bottom)]
+
+    def _stamp(self, path_in, *options):
+        """Return a stamp identifying the processing of ``path_in`` to the reference grid.
+
+        The stamp changes when the input file is modified, or when the reference grid or any of the ``options`` change.
+
+        :param path_in: input raster file
+        :param options: processing method and options which determine the output
+        """
+        try:
+            stat = os.stat(path_in)
+            version = (stat.st_mtime_ns, stat.st_size)
+        except OSError:  # not a regular file (e.g. a GDAL virtual file system path)
+            version = None
+        key = (os.path.abspath(path_in), version, self.ref_profile['crs'].to_wkt(),
+               tuple(self.ref_profile['transform']), self.ref_profile['width'], self.ref_profile['height'], options)
+        return hashlib.sha1(repr(key).encode()).hexdigest()
+
+    def contains_bbox(self, geom):
+        """Check if geometries lie inside the reference extent.
+
+        :param geom: shapely geometry, or array of geometries
+        :return: bool, or boolean array
+        """
+        self._check()
+        return shapely.contains(self._ref_box, geom)
+
+    def copy(self, num_threads=None):
+        """Return a copy which can process raster files in parallel with this object.
+
+        The reference and reporting profiles are shared, the state kept while processing a single raster file (source
+        parameters and raster tags) is not.
+
+        :param num_threads: number of threads GDAL may use to warp and compress a single raster in the copy, e.g. its
+                            share of the CPUs when several copies run at the same time (default: same as this object)
+        """
+        other = copy.copy(self)
+        other.metadata = copy.copy(self.metadata)
+        other.src_parameters = {}
+        if num_threads is not None:
+            other.num_threads = num_threads
+        return other
+
+    def _num_threads_option(self):
+        """Return :attr:`num_threads` as a value for the GDAL NUM_THREADS options."""
+        return 'ALL_CPUS' if self.num_threads is None else str(self.num_threads)
+
+    def _warp_args(self):
+        """Return the gdalwarp options shared by all our warps, including the number of warper threads."""
+        return (*_WARP_ARGS, '-wo', f'NUM_THREADS={self._num_threads_option()}')
+
+    def _helper_path(self, path_out, name):
+        """Return the path of an intermediate file used to produce ``path_out``.
+
+        The helper file is put next to the output file, so parallel runs producing different output files don't
+        overwrite each other's intermediate files.
+
+        :param path_out: output file path
+        :param name: name of the intermediate file
+        """
+        return '{}_{}'.format(splitext(path_out)[0], name)
+
+    def _check_call(self, cmd, **kwargs):
+        """Run a GDAL command line tool with :attr:`gdal_env_options` and :attr:`gdal_cache_pct` in its environment.
+
+        The command is run without a shell, so arguments (e.g. paths with spaces) need no quoting.
+
+        :param cmd: list of arguments, starting with the program to run.
+        :param kwargs: extra keyword arguments for :func:`subprocess.check_call`.
+        """
+        if logger.isEnabledFor(logging.DEBUG):  # log a command line which can be pasted in a shell
+            logger.debug('Run %s', shlex.join(cmd))
+        env = dict(os.environ, **self._gdal_config_options())
+        kwargs.setdefault('stdout', self.GDAL_print)
+        subprocess.check_call(cmd, env=env, **kwargs)
+
+    def _gdal_config_options(self):
+        """Return the GDAL configuration options for the GDAL command line tools and :mod:`osgeo.gdal` calls."""
+        return dict({key: str(value) for key, value in self.gdal_env_options.items()},
+                    GDAL_CACHEMAX=self.gdal_cache_pct, GDAL_NUM_THREADS=self._num_threads_option())
+
+    @contextmanager
+    def _osgeo_gdal(self):
+        """Import :mod:`osgeo.gdal`, with our GDAL configuration options set for the current thread.
+
+        :return: context manager yielding the :mod:`osgeo.gdal` module
+        """
+        from osgeo import gdal
+
+        config = self._gdal_config_options()
+        previous = {key: gdal.GetThreadLocalConfigOption(key, None) for key in config}
+        for key, value in config.items():
+            gdal.SetThreadLocalConfigOption(key, value)
+        try:
+            yield gdal
+        finally:
+            for key, value in previous.items():
+                gdal.SetThreadLocalConfigOption(key, value)
+
+    def _translate(self, args, use_gdal=False, tags=None):
+        """Run gdal_translate, in-process through :func:`osgeo.gdal.Translate` unless ``use_gdal`` is set.
+
+        The in-process call saves starting a process, which has to initialize GDAL and PROJ again, for every raster.
+
+        :param args: gdal_translate arguments, ending with the input and output file.
+        :param use_gdal: use the gdal_translate command line tool instead of translating in-process.
+        :param tags: metadata tags which replace the metadata copied from the input file (only when in-process).
+        """
+        if use_gdal:
+            self._check_call(['gdal_translate', *args])
+            return
+
+        *options, src, dst = args
+        with self._osgeo_gdal() as gdal:
+            ds = gdal.Translate(dst, src, options=gdal.TranslateOptions(options=options))
+            if ds is None:  # without gdal.UseExceptions(), errors are only signaled through the return value
+                raise RuntimeError(gdal.GetLastErrorMsg())
+            if tags is not None:
+                # like gdal_edit -unsetmd in adapt_file_metadata, but we keep the AREA_OR_POINT structure metadata
+                metadata = {key: str(value) for key, value in tags.items()}
+                area_or_point = ds.GetMetadataItem('AREA_OR_POINT')
+                if area_or_point is not None:
+                    metadata['AREA_OR_POINT'] = area_or_point
+                ds.SetMetadata(metadata)
+            ds = None  # close the output, so it is completely written
+
+    def _copy_window(self, path_in, path_out, dtype, tags=None, max_block_bytes=64 * 1024 * 1024):
+        """Copy the reference extent out of a raster which is on the reference grid already, without any resampling.
+
+        This only applies when the input has the reference resolution, its pixels are aligned with the reference
+        extent, it covers the reference extent and it already has the output data type.  The output is then a plain
+        copy of a window of the input, which we write block by block with the same creation options as
+        :meth:`_translate`.
+
+        :param path_in: input raster file
+        :param path_out: output raster file
+        :param dtype: GDAL data type name of the output, as used for the command line tools
+        :param tags: metadata tags for the output file
+        :param max_block_bytes: memory budget for a single block (all bands)
+        :return: True if the window was copied, False if the input does not qualify (nothing was written then)
+        """
+        np_dtype = _rasterio_dtype(dtype)
+        res_x, res_y = self.ref_res
+        with rasterio.open(path_in) as src:
+            if any(src_dtype != np_dtype for src_dtype in src.dtypes) or not src.transform.is_rectilinear \
+                    or not math.isclose(src.transform.a, res_x) or not math.isclose(src.transform.e, -res_y):
+                return False
+            col_off = (self.ref_extent.left - src.transform.c) / res_x
+            row_off = (src.transform.f - self.ref_extent.top) / res_y
+            width = int((self.ref_extent.right - self.ref_extent.left) / res_x + 0.5)
+            height = int((self.ref_extent.top - self.ref_extent.bottom) / res_y + 0.5)
+            window = Window(round(col_off), round(row_off), width, height)
+            if not (math.isclose(col_off, window.col_off, abs_tol=1e-6)
+                    and math.isclose(row_off, window.row_off, abs_tol=1e-6)
+                    and window.col_off >= 0 and window.row_off >= 0
+                    and window.col_off + width <= src.width and window.row_off + height <= src.height):
+                return False
+
+            profile = {'driver': 'GTiff', 'dtype': np_dtype, 'nodata': src.nodata, 'width': width, 'height': height,
+                       'count': src.count, 'crs': src.crs, 'transform': src.window_transform(window),
+                       'bigtiff': 'IF_SAFER', 'num_threads': self._num_threads_option(), **_creation_profile(dtype)}
+            side = int(math.sqrt(max_block_bytes / (src.count * np.dtype(np_dtype).itemsize)))
+            block_shape = (max(_TILE_SIZE, side // _TILE_SIZE * _TILE_SIZE),) * 2
+            with rasterio.open(path_out, 'w', **profile) as dst:
+                for _, (rows, cols) in block_window_generator(block_shape, height, width):
+                    dst_window = Window.from_slices(rows, cols)
+                    src_window = Window(window.col_off + dst_window.col_off, window.row_off + dst_window.row_off,
+                                        dst_window.width, dst_window.height)
+                    dst.write(src.read(window=src_window), window=dst_window)
+                try:
+                    dst.write_colormap(1, src.colormap(1))
+                except ValueError:  # no colormap
+                    pass
+                # like gdal_translate, keep band descriptions, units, scales and offsets
+                dst.descriptions = src.descriptions
+                dst.units = src.units
+                dst.scales = src.scales
+                dst.offsets = src.offsets
+                area_or_point = src.tags().get('AREA_OR_POINT')
+                if area_or_point is not None:
+                    dst.update_tags(AREA_OR_POINT=area_or_point)
+                if tags:
+                    dst.update_tags(**tags)
+        return True
+
     def _check(self):
         """Check if profile and extent for reference file exist."""
         if self.ref_profile is None:
@@ -275,32 +860,36 @@ class GeoProcessing(object):
         :param clean_src: boolean to indicate if profile parameters are fresh reloaded or existing are used
         """
         self._check()
-        # delete src info if needed
-        if clean_src:
+        # delete src info if needed, or if it was loaded for another file
+        if clean_src or self.src_parameters.get('path') != os.path.abspath(path_in):
             self.src_parameters = {}
         # check if all parameters of input files are existing - when run in stand-alone mode
         if not self.src_parameters:
-            self.src_parameters = self._load_profile(path_in)
+            self._load_src_parameters(path_in)
         # check for main current geoprocessing limitation
         self._epsg_check(self.src_parameters['epsg'], path_in)
 
-    def vectorize(self, raster_path, root_out):
-        """Wrap `gdal_polygonize`.
+    def vectorize(self, raster_path, root_out, use_gdal=False):
+        """Polygonize a raster file, like `gdal_polygonize -8`.
+
+        The output shapefile contains one polygon for each 8-connected region of equal pixel value, with the pixel value
+        in a field ``ID``.  Nodata pixels are left out.
 
         :param raster_path: absolute path to raster file which is vectorized
         :param root_out: path to base folder in which the vectorized file is saved
+        :param use_gdal: use the gdal_polygonize command line tool instead of polygonizing in-process.
         :return: absolute path to vectorized file
         """
         # create output file name
         out_path = os.path.join(root_out, 'vector_{}.shp'.format(splitext(basename(raster_path))[0]))
 
-        # setup cmd command
-        cmd = '{} -8 "{}" "{}" vectorized ID'.format(_GDAL_POLY, normpath(raster_path), out_path)
-
-        if not os.path.exists(out_path):
+        if not _output_exists(out_path):
             try:
-                subprocess.check_call(cmd, shell=True, stdout=self.GDAL_print)
-            except subprocess.CalledProcessError as e:
+                if use_gdal:
+                    self._check_call([*_POLY_ARGS, normpath(raster_path), out_path, 'vectorized', 'ID'])
+                else:
+                    self._vectorize_in_process(raster_path, out_path)
+            except Exception as e:
                 raise OSError(f'Could not polygonize needed raster file: {e}')
             else:
                 logger.debug('* Raster file (%s) was successfully polygonized.', raster_path)
@@ -309,9 +898,26 @@ class GeoProcessing(object):
             pass
         return out_path
 
+    @staticmethod
+    def _vectorize_in_process(raster_path, out_path):
+        """Polygonize the first band of a raster with :func:`rasterio.features.shapes`, see :meth:`vectorize`."""
+        with rasterio.open(raster_path) as src:
+            data = src.read(1)
+            mask = src.read_masks(1) > 0
+            crs = src.crs
+            transform = src.transform
+        if data.dtype.name not in ('int16', 'int32', 'uint8', 'uint16'):
+            data = data.astype(np.int32)  # like gdal_polygonize, which polygonizes 32 bit integer values
+        geometries, values = [], []
+        for geometry, value in rasterio.features.shapes(data, mask=mask, connectivity=8, transform=transform):
+            geometries.append(shapely.geometry.shape(geometry))
+            values.append(value)
+        gpd.GeoDataFrame({'ID': np.array(values, dtype=np.int32)}, geometry=geometries, crs=crs).to_file(out_path)
+
+    @_with_gdal_env
     def rasterize_burn(self, path_in: str, path_out: str, nodata_value=0,
-                       burn_value=1, dtype='Byte', mode='statistical'):
-        """Rasterize a given geopandas dataframe with a specified `column_name`.
+                       burn_value=1, dtype='Byte', mode='statistical', use_gdal=False):
+        """Burn a fixed value into all pixels touched by the features of a vector file.
 
         :param path_in: directory for input file.
         :param path_out: directory for output file.
@@ -319,19 +925,20 @@ class GeoProcessing(object):
         :param burn_value: which value to burn
         :param dtype: dtype as a string
         :param mode: if to rasterize to the statistical or reporting extent and resolution (statistical, reporting)
+        :param use_gdal: use the gdal_rasterize command line tool instead of rasterizing in-process.
         :return: None
         """
         self._check()
 
         if mode == 'statistical':
             pextent = self.ref_extent
-            res = (float(self.ref_profile['transform'].a), float(abs(self.ref_profile['transform'].e)))
-            out_crs = self.ref_profile['crs'].to_epsg()
+            res = self.ref_res
+            out_crs = self.ref_epsg
         elif mode == 'reporting':
             self._check2()
             pextent = self.reporting_extent
-            res = (float(self.reporting_profile['transform'].a), float(abs(self.reporting_profile['transform'].e)))
-            out_crs = self.reporting_profile['crs'].to_epsg()
+            res = self.reporting_res
+            out_crs = self.reporting_epsg
         else:
             raise RuntimeError('this mode was not forseen in rasterization function.')
 
@@ -339,40 +946,36 @@ class GeoProcessing(object):
             init_value = 1
         else:
             init_value = nodata_value
-        cmd = 'gdal_rasterize -l "{}" -init {} -burn {} -at -a_nodata {} -co COMPRESS=DEFLATE -co TILED=YES -co INTERLEAVE=BAND ' \
-              '-ot {} -te {} {} {} {} -tr {} {} -a_SRS "EPSG:{}" "{}" "{}"'.format(
-                    splitext(basename(path_in))[0],
-                    init_value,
-                    burn_value,
-                    nodata_value,
-                    dtype,
-                    pextent.left,
-                    pextent.bottom,
-                    pextent.right,
-                    pextent.top,
-                    res[0],
-                    res[1],
-                    out_crs,
-                    path_in,
-                    path_out)
-
-        if not os.path.exists(path_out):
+        if not _output_exists(path_out):
+            tags = self.metadata.prepare_raster_tags('Vector file was rasterized to reference file extent.', '')
             try:
-                subprocess.check_call(cmd, shell=True)
-            except subprocess.CalledProcessError as e:
+                if use_gdal:
+                    cmd = ['gdal_rasterize', '-l', splitext(basename(path_in))[0], '-init', str(init_value),
+                           '-burn', str(burn_value), '-at', '-a_nodata', str(nodata_value),
+                           *_creation_options(dtype), *_ot_args(dtype),
+                           '-te', str(pextent.left), str(pextent.bottom), str(pextent.right), str(pextent.top),
+                           '-tr', str(res[0]), str(res[1]), '-a_SRS', f'EPSG:{out_crs}', path_in, path_out]
+                    self._check_call(cmd, stdout=None)
+                    with rasterio.open(path_out, 'r+') as dst:
+                        dst.update_tags(**tags)
+                else:
+                    geometries = gpd.read_file(path_in, columns=[]).geometry.values
+                    self._rasterize_in_process(path_out, geometries, np.full(len(geometries), burn_value), pextent,
+                                               res, out_crs, dtype, nodata_value, init_value, tags, all_touched=True)
+            except Exception as e:
+                # delete file if it is partly processed
+                if os.path.exists(path_out):
+                    os.remove(path_out)
                 raise OSError(f'Could not rasterize needed vector file: {e}')
             else:
-                tags = self.metadata.prepare_raster_tags(
-                    'Vector file was rasterized to reference file extent.', '')
-                with rasterio.open(path_out, 'r+') as dst:
-                    dst.update_tags(**tags)
                 logger.debug('* Vector file was successfully rasterized.')
         else:
             logger.debug('* Rasterized file %s already exists, skipping.', path_out)
             pass
 
+    @_with_gdal_env
     def rasterize(self, gdb: gpd.GeoDataFrame, gdb_column_name: str, path_out: str, nodata_value=0, dtype='Float32',
-                  guess_dtype=False, mode='statistical'):
+                  guess_dtype=False, mode='statistical', use_gdal=None):
         """Rasterize a given geopandas dataframe with a specified `column_name`.
 
         :param gdb: GeoDataFrame to rasterize.
@@ -382,6 +985,9 @@ class GeoProcessing(object):
         :param dtype: dtype as a string
         :param guess_dtype: guess dtype from the data (only for integer data)
         :param mode: if to rasterize to the statistical or reporting extent and resolution (statistical, reporting)
+        :param use_gdal: use the gdal_rasterize command line tool instead of rasterizing in-process.  By default
+          (None), gdal_rasterize is only used for geometries with more than :data:`RASTERIZE_MAX_COORDINATES`
+          vertices in total.
         :return: None
         """
         self._check()
@@ -390,103 +996,179 @@ class GeoProcessing(object):
         if nodata_value in gdb[gdb_column_name].values:
             logger.warning('rasterizing shape: nodata value %s appears in column we want to rasterize.', nodata_value)
 
-        # guess the dtype
-        if guess_dtype:
-            max_id = gdb[gdb_column_name].max()
-            if max_id <= 255:
-                dtype = 'Byte'
-            else:
-                dtype = 'UInt16'
-
-        # write the geodatabase to file
-        temp_out = os.path.join(self.temp_dir, 'vector_{}.gpkg'.format(splitext(basename(path_out))[0]))
+        # guess the dtype: the narrowest integer type which holds all values and the nodata value
+        if guess_dtype and gdb[gdb_column_name].dtype.kind in 'iu' and len(gdb):
+            dtype = _smallest_int_dtype(gdb[gdb_column_name].min(), gdb[gdb_column_name].max(), nodata_value) or dtype
 
         if mode == 'statistical':
             pextent = self.ref_extent
-            res = (float(self.ref_profile['transform'].a), float(abs(self.ref_profile['transform'].e)))
-            out_crs = self.ref_profile['crs'].to_epsg()
+            res = self.ref_res
+            out_crs = self.ref_epsg
         elif mode == 'reporting':
             self._check2()
             pextent = self.reporting_extent
-            res = (float(self.reporting_profile['transform'].a), float(abs(self.reporting_profile['transform'].e)))
-            out_crs = self.reporting_profile['crs'].to_epsg()
+            res = self.reporting_res
+            out_crs = self.reporting_epsg
         else:
             raise RuntimeError('this mode was not forseen in rasterization function.')
 
-        cmd = 'gdal_rasterize -a "{}" -l "{}" -a_nodata {} -co COMPRESS=DEFLATE -co TILED=YES -co INTERLEAVE=BAND ' \
-              '-ot {} -te {} {} {} {} -tr {} {} -a_SRS "EPSG:{}" ' \
-              '"{}" "{}"'.format(gdb_column_name,
-                                 splitext(basename(temp_out))[0],
-                                 nodata_value,
-                                 dtype,
-                                 pextent.left,
-                                 pextent.bottom,
-                                 pextent.right,
-                                 pextent.top,
-                                 res[0],
-                                 res[1],
-                                 out_crs,
-                                 temp_out,
-                                 path_out)
-
-        if not os.path.exists(path_out):
-            try:
-                gdb[[gdb_column_name, 'geometry']].to_file(temp_out, driver='GPKG')
-                subprocess.check_call(cmd, shell=True, stdout=self.GDAL_print)
-            except subprocess.CalledProcessError as e:
-                raise OSError(f'Could not rasterize needed vector file: {e}')
-            else:
-                tags = self.metadata.prepare_raster_tags(
-                    'Vector file was rasterized to reference file extent.', '')
-                with rasterio.open(path_out, 'r+') as dst:
-                    dst.update_tags(**tags)
-                logger.debug('* Vector file was successfully rasterized.')
-            finally:
-                # remove temp files
-                if os.path.exists(temp_out):
-                    os.remove(temp_out)
-        else:
+        if _output_exists(path_out):
             logger.debug('* Rasterized file %s already exists, skipping.', path_out)
-            pass
+            return
 
-    def FillHoles(self, path_in, path_out, maxdistance=25, smooth=0):
+        tags = self.metadata.prepare_raster_tags('Vector file was rasterized to reference file extent.', '')
+        if use_gdal is None:
+            # In-process rasterization passes every vertex through a Python object, while gdal_rasterize reads the
+            # geometries in binary form from a temporary file.  For very detailed geometries the latter is faster.
+            use_gdal = shapely.get_num_coordinates(gdb.geometry.values).sum() > RASTERIZE_MAX_COORDINATES
+        if not use_gdal:
+            self._rasterize_in_process(path_out, gdb.geometry.values, gdb[gdb_column_name].values, pextent, res,
+                                       out_crs, dtype, nodata_value, nodata_value, tags)
+            logger.debug('* Vector file was successfully rasterized.')
+            return
+
+        # write the geodatabase to file
+        temp_out = os.path.join(self.temp_dir, 'vector_{}.gpkg'.format(splitext(basename(path_out))[0]))
+        cmd = ['gdal_rasterize', '-a', gdb_column_name, '-l', splitext(basename(temp_out))[0],
+               '-a_nodata', str(nodata_value),
+               *_creation_options(dtype), *_ot_args(dtype),
+               '-te', str(pextent.left), str(pextent.bottom), str(pextent.right), str(pextent.top),
+               '-tr', str(res[0]), str(res[1]), '-a_SRS', f'EPSG:{out_crs}', temp_out, path_out]
+        try:
+            gdb[[gdb_column_name, 'geometry']].to_file(temp_out, driver='GPKG')
+            self._check_call(cmd)
+        except subprocess.CalledProcessError as e:
+            raise OSError(f'Could not rasterize needed vector file: {e}')
+        else:
+            with rasterio.open(path_out, 'r+') as dst:
+                dst.update_tags(**tags)
+            logger.debug('* Vector file was successfully rasterized.')
+        finally:
+            # remove temp files
+            if os.path.exists(temp_out):
+                os.remove(temp_out)
+
+    @staticmethod
+    def _rasterize_in_process(path_out, geometries, values, pextent, res, out_crs, dtype, nodata_value, fill_value,
+                              tags, all_touched=False, block_shape=(4096, 4096)):
+        """Burn geometries into a new GeoTIFF file block by block, using :func:`rasterio.features.rasterize`.
+
+        This gives the same result as running gdal_rasterize with the same extent and resolution, without the
+        round trip through a temporary vector file.  Only the geometries intersecting a block are burned into it.
+
+        :param path_out: output raster file
+        :param geometries: array of shapely geometries
+        :param values: array of values to burn for each geometry
+        :param pextent: bounding box of the output raster
+        :param res: output resolution tuple
+        :param out_crs: EPSG code of the output raster
+        :param dtype: GDAL data type name, as used for the command line tools
+        :param nodata_value: nodata value of the output raster
+        :param fill_value: value for pixels not covered by any geometry
+        :param tags: metadata tags for the output raster
+        :param all_touched: burn all pixels touched by a geometry instead of only those with their center inside
+        :param block_shape: shape of the blocks to rasterize at once
+        """
+        np_dtype = _rasterio_dtype(dtype)
+        width = int((pextent.right - pextent.left) / res[0] + 0.5)
+        height = int((pextent.top - pextent.bottom) / res[1] + 0.5)
+        transform = rasterio.transform.from_origin(pextent.left, pextent.top, res[0], res[1])
+        profile = {'driver': 'GTiff', 'dtype': np_dtype, 'nodata': nodata_value, 'width': width, 'height': height,
+                   'count': 1, 'crs': rasterio.crs.CRS.from_epsg(out_crs), 'transform': transform,
+                   'bigtiff': 'IF_SAFER', **_creation_profile(dtype)}
+        tree = shapely.STRtree(geometries)
+        with rasterio.open(path_out, 'w', **profile) as dst:
+            for _, (rows, cols) in block_window_generator(block_shape, height, width):
+                window = Window.from_slices(rows, cols)
+                bounds = rasterio.windows.bounds(window, transform)
+                # Keep the original order, so overlapping geometries are burned in the same order as gdal_rasterize.
+                idx = np.sort(tree.query(shapely.box(*bounds)))
+                block_geometries = _clip_to_block(geometries[idx], bounds, res)
+                keep = ~shapely.is_empty(block_geometries)
+                idx, block_geometries = idx[keep], block_geometries[keep]
+                if len(idx):
+                    data = rasterio.features.rasterize(zip(block_geometries, values[idx]),
+                                                       out_shape=(window.height, window.width), fill=fill_value,
+                                                       transform=rasterio.windows.transform(window, transform),
+                                                       all_touched=all_touched, dtype=np_dtype)
+                else:
+                    data = np.full((window.height, window.width), fill_value, dtype=np_dtype)
+                dst.write(data, 1, window=window)
+            dst.update_tags(**tags)
+
+    @_with_gdal_env
+    def FillHoles(self, path_in, path_out, maxdistance=25, smooth=0, use_gdal=False):
         """Fill nodata holes in a raster file.
 
         :param path_in: input filename
         :param path_out: output filename
         :param maxdistance: distance in pixels in which valid pixels are searched
         :param smooth: smoothing iterations
+        :param use_gdal: use the gdal_fillnodata command line tool instead of filling in-process.
         """
-        path_temp = os.path.join(self.temp_dir, 'fillHoles_temp.tif')
+        if _output_exists(path_out):
+            logger.debug('* File with filled data (%s) already exists, skipping.', path_out)
+            return
+
+        if not use_gdal:
+            try:
+                self._fill_holes_in_process(path_in, path_out, maxdistance, smooth)
+            except RasterioError as e:
+                # delete file if it is partly processed
+                if os.path.exists(path_out):
+                    os.remove(path_out)
+                raise OSError(f'Could not fill the holes in the input raster: {e}')
+            logger.debug('* Raster file (%s) was successfully filled.', path_in)
+            return
+
+        path_temp = self._helper_path(path_out, 'fillHoles_temp.tif')
 
-        cmd1 = '{} -md {} -si {} "{}" "{}"'.format(_GDAL_FILLNODATA, maxdistance, smooth, path_in, path_temp)
+        cmd1 = [_GDAL_FILLNODATA, '-md', str(maxdistance), '-si', str(smooth), path_in, path_temp]
 
         # now we bring back the nodata value in the file
         with rasterio.open(path_in) as src:
             nodata = src.nodata
-        cmd2 = '{} -a_nodata {} "{}"'.format(_GDAL_EDIT, nodata, path_temp)
+            dtype = src.dtypes[0]
+        cmd2 = [_GDAL_EDIT, '-a_nodata', str(nodata), path_temp]
 
         # and compress it
-        cmd3 = 'gdal_translate -co COMPRESS=DEFLATE -co TILED=YES -co INTERLEAVE=BAND ' \
-               '"{}" "{}"'.format(path_temp, path_out)
+        cmd3 = ['gdal_translate', *_creation_options(dtype), path_temp, path_out]
 
         # run
-        if not os.path.exists(path_out):
-            try:
-                subprocess.check_call(cmd1, shell=True, stdout=self.GDAL_print)
-                subprocess.check_call(cmd2, shell=True, stdout=self.GDAL_print)
-                subprocess.check_call(cmd3, shell=True, stdout=self.GDAL_print)
-            except subprocess.CalledProcessError as e:
-                raise OSError(f'Could not fill the holes in the input raster: {e}')
-            else:
-                logger.debug('* Raster file (%s) was successfully filled.', path_in)
-            finally:
-                # remove temp files
-                if os.path.exists(path_temp):
-                    os.remove(path_temp)
+        try:
+            self._check_call(cmd1)
+            self._check_call(cmd2)
+            self._check_call(cmd3)
+        except subprocess.CalledProcessError as e:
+            raise OSError(f'Could not fill the holes in the input raster: {e}')
         else:
-            logger.debug('* File with filled data (%s) already exists, skipping.', path_out)
-            pass
+            logger.debug('* Raster file (%s) was successfully filled.', path_in)
+        finally:
+            # remove temp files
+            _remove_files(path_temp)
+
+    @staticmethod
+    def _fill_holes_in_process(path_in, path_out, maxdistance, smooth):
+        """Fill nodata holes in the first band of a raster with :func:`rasterio.fill.fillnodata`, see :meth:`FillHoles`.
+
+        Like gdal_fillnodata, the output contains only the filled band, and keeps the nodata value of the input.
+        """
+        with rasterio.open(path_in) as src:
+            filled = rasterio.fill.fillnodata(src.read(1), mask=src.read_masks(1), max_search_distance=maxdistance,
+                                              smoothing_iterations=smooth)
+            profile = src.profile
+            profile.update(count=1, compress='deflate', tiled=True, blockxsize=_TILE_SIZE, blockysize=_TILE_SIZE,
+                           interleave='band', predictor=_predictor(profile['dtype']) or 1)
+            tags = src.tags()
+            try:
+                colormap = src.colormap(1)
+            except ValueError:  # no colormap
+                colormap = None
+        with rasterio.open(path_out, 'w', **profile) as dst:
+            dst.write(filled, 1)
+            dst.update_tags(**tags)
+            if colormap is not None:
+                dst.write_colormap(1, colormap)
 
     def pixel_area_m2(self):
         """Return the area in square meter of one pixel from the AccoRD reference file."""
@@ -496,60 +1178,21 @@ class GeoProcessing(object):
         else:
             return None
 
+    @_with_gdal_env
     def _load_profile(self, raster_path):
         """Extract key variables of the given raster file.
 
         :param raster_path: absolute file path to raster file for which to extract the profile
         :return: dictionary containing the key raster profile parameters
         """
-        dFile = {}
-        dFile['overwrite_s_srs'] = False  # flag that EPSG code of raster file was not valid and extracted from WKT
-        try:
-            with rasterio.open(raster_path) as src:
-                # EPSG
-                if src.crs.is_epsg_code:
-                    dFile['epsg'] = src.crs.to_epsg()
-                else:
-                    # we have no EPSG or the VRT problem which shows only the WKT instead of the EPSG code
-                    dFile['epsg'] = 'no_epsg_code'
-                    # check if we have a know wkt and can overwrite to the right epsg integer number
-                    for key, value in DIC_KNOWN_WKT_STRINGS.items():
-                        if key in src.crs.wkt:
-                            dFile['epsg'] = value
-                            # flag that s_srs is overwritten
-                            dFile['overwrite_s_srs'] = True
-                            break
-                # raster extent
-                dFile['bbox'] = src.bounds
-                # resolution tuple
-                dFile['res'] = src.res
-                # datatype
-                dFile['dtype'] = src.dtypes[0]
-                # raster profile
-                dFile['profile'] = src.profile
-                # raster height and width
-                dFile['width'] = src.width
-                dFile['height'] = src.height
-                # nodata value
-                dFile['nodata'] = src.nodata
-                # dataset name
-                dFile['name'] = src.name
-                # dataset file tags (no band tags)
-                dFile['tags'] = src.tags()
-                # pixel area in square metre
-                if src.crs.is_projected:
-                    dFile['px_area_m2'] = pixel_area(src.crs, src.transform)
-                    _, dFile['unit_factor'] = src.crs.linear_units_factor
-                else:
-                    dFile['px_area_m2'] = None
-                    dFile['unit_factor'] = None
-                # projected and units
-                dFile['projected'] = src.crs.is_projected
-                dFile['geographic'] = src.crs.is_geographic
-                dFile['unit'] = src.crs.linear_units
-        except rasterio.errors.RasterioIOError as e:
-            raise Error(f'Failed to open raster file "{raster_path}": {e}')
-        return dFile
+        return load_profile(raster_path)
+
+    def _load_src_parameters(self, raster_path):
+        """Load :attr:`src_parameters` for a raster file, remembering its path so they are only reused for that file.
+
+        :param raster_path: file path to the raster file which is going to be processed
+        """
+        self.src_parameters = dict(self._load_profile(raster_path), path=os.path.abspath(raster_path))
 
     def _check_raster_processing_needed(self):
         """Check if profile of a given raster matches the reference profile and if any processing is needed.
@@ -560,14 +1203,16 @@ class GeoProcessing(object):
             raise ValueError('the _check_raster_processing_needed function can be only called when the profile '
                              'of the input raster file is loaded (use _load_profile() function).')
 
-        if (self.src_parameters['epsg'] == self.ref_profile['crs'].to_epsg()) \
+        # Compare the CRS objects rather than EPSG codes, which may have been derived from the WKT string of the raster
+        # (see DIC_KNOWN_WKT_STRINGS).
+        if (self.src_parameters['profile']['crs'] == self.ref_profile['crs']) \
                 and (self.src_parameters['bbox'] == self.ref_extent) \
-                and (self.src_parameters['res'] == (float(self.ref_profile['transform'].a),
-                                                    float(abs(self.ref_profile['transform'].e)))):
+                and (self.src_parameters['res'] == self.ref_res):
             return True
         else:
             return False
 
+    @_with_gdal_env
     def AutomaticBring2AOI(self, path_in, raster_type=RasterType.CATEGORICAL, wOT=None, path_out=None,
                            secure_run=False):
         """Wrap :func:`Bring2AOI` to adjust a raster file if needed. Optimal settings are picked automatically.
@@ -586,7 +1231,7 @@ class GeoProcessing(object):
 
         # test if we even have to process the input raster file
         if self._check_raster_processing_needed():
-            logger.debug('* raster file {} OK'.format(os.path.basename(path_in)))
+            logger.debug('* raster file %s OK', os.path.basename(path_in))
             # reset the src_parameter before close to definitely clean (One Time Use)
             self.src_parameters = {}
             return path_in
@@ -595,12 +1240,13 @@ class GeoProcessing(object):
                 # now we have to prepare a generic output raster file name
                 path_out = os.path.join(self.temp_dir,
                                         '{}_{}m_EPSG{}.tif'.format(splitext(basename(path_in))[0],
-                                                                   int(self.ref_profile['transform'].a),
-                                                                   self.ref_profile['crs'].to_epsg()))
+                                                                   int(self.ref_res[0]),
+                                                                   self.ref_epsg))
             # run the standard Bring2AOI function
             self.Bring2AOI(path_in, path_out, raster_type=raster_type, wOT=wOT)
             return path_out
 
+    @_with_gdal_env
     def Bring2AOI(self, path_in, path_out, raster_type=RasterType.CATEGORICAL, wOT=None, secure_run=False):
         """Automatically transform input file to reference file (extent, resolution, projection).
 
@@ -622,7 +1268,7 @@ class GeoProcessing(object):
 
         # overwrite the output dataformat if not given
         if wOT is None:
-            wOT = _dtype_map[self.src_parameters['dtype']]
+            wOT = _gdal_dtype(self.src_parameters['dtype'])
 
         # decision tree for geoprocessing method based on:
         # processing case: crop, resample, or warp
@@ -657,47 +1303,19 @@ class GeoProcessing(object):
         :param raster_type: type of the raster content (categorical, relative, absolute_point, absolute_volume)
         :return: tuple, given the processing_mode (crop, translate, warp) and resampling_mode
         """
-        # possible processing_modes: Crop2AOI, Translate2AOI, Warp2AOI, VolumeWarp2AOI
-        # possible resampling_modes: nearest, sum, bilinear, mode, average, 3-step
-        decision_tree = {
-            'crop': {RasterType.CATEGORICAL: {'same': ('Crop2AOI', 'nearest')},
-                     RasterType.RELATIVE: {'same': ('Crop2AOI', 'bilinear')},
-                     RasterType.ABSOLUTE_POINT: {'same': ('Crop2AOI', 'nearest')},
-                     RasterType.ABSOLUTE_VOLUME: {'same': ('Crop2AOI', 'nearest')}},
-            'resample': {RasterType.CATEGORICAL: {'up-sampling': ('Translate2AOI', 'nearest'),
-                                                  'down-sampling': ('Translate2AOI', 'mode')},
-                         RasterType.RELATIVE: {'up-sampling': ('Translate2AOI', 'bilinear'),
-                                               'down-sampling': ('Translate2AOI', 'average')},
-                         RasterType.ABSOLUTE_POINT: {'up-sampling': ('Translate2AOI', 'bilinear'),
-                                                     'down-sampling': ('Translate2AOI', 'average')},
-                         RasterType.ABSOLUTE_VOLUME: {'up-sampling': ('VolumeWarp2AOI', '3-step'),
-                                                      'down-sampling': ('VolumeWarp2AOI', '3-step')}},
-            'warp': {RasterType.CATEGORICAL: {'same': ('Warp2AOI', 'nearest'),
-                                              'up-sampling': ('Warp2AOI', 'nearest'),
-                                              'down-sampling': ('Warp2AOI', 'mode')},
-                     RasterType.RELATIVE: {'same': ('Warp2AOI', 'near'),
-                                           'up-sampling': ('Warp2AOI', 'bilinear'),
-                                           'down-sampling': ('Warp2AOI', 'average')},
-                     RasterType.ABSOLUTE_POINT: {'same': ('Warp2AOI', 'near'),
-                                                 'up-sampling': ('Warp2AOI', 'bilinear'),
-                                                 'down-sampling': ('Warp2AOI', 'average')},
-                     RasterType.ABSOLUTE_VOLUME: {'same': ('VolumeWarp2AOI', '3-step'),
-                                                  'up-sampling': ('VolumeWarp2AOI', '3-step'),
-                                                  'down-sampling': ('VolumeWarp2AOI', '3-step')}}}
         try:
-            processing_mode, resampling_mode = decision_tree[processing_case][raster_type][res_case]
+            return _PROCESSING_TABLE[processing_case, raster_type, res_case]
         except KeyError:
             raise ValueError(f'the given data ({processing_case, raster_type, res_case}) is not in the GeoProcessing '
                              f'decision tree to be evaluated. No geoprocessing mode and resampling mode can be '
                              f'determined.')
 
-        return processing_mode, resampling_mode
-
     def _get_case_parameters(self):
         """Check src and reference dataset spatial resolution and projection to select correct geoprocessing method.
 
         :return: tuple, given the resampling strategy and processing type between input & reference raster file
         """
+        res_x, res_y = self.ref_res
         # First, check resolution change
         if self.src_parameters['projected']:
             if self.src_parameters['unit_factor'] != 1:
@@ -710,22 +1328,21 @@ class GeoProcessing(object):
             # way more complicated to get resolution in metre (we estimate for center of raster)
             center_lat = self.src_parameters['bbox'].top - \
                          (self.src_parameters['height'] / 2 * self.src_parameters['res'][1])
-            src_res = (EARTH_CIRCUMFERENCE_METRE * np.cos(np.radians(center_lat)) / 360 * self.src_parameters['res'][0],
-                       np.round(EARTH_CIRCUMFERENCE_METRE / 360, 0) * self.src_parameters['res'][1])
+            src_res = (EARTH_CIRCUMFERENCE_METRE * math.cos(math.radians(center_lat)) / 360
+                       * self.src_parameters['res'][0],
+                       _METRE_PER_DEGREE_LAT * self.src_parameters['res'][1])
         else:
             raise RuntimeError('Input dataset neither projected nor geographic coordinate system')
 
-        if src_res == (float(self.ref_profile['transform'].a),
-                       float(abs(self.ref_profile['transform'].e))):
+        if src_res == (res_x, res_y):
             res_case = 'same'
-        elif (src_res[0] * src_res[1]) > (float(self.ref_profile['transform'].a) *
-                                          float(abs(self.ref_profile['transform'].e))):
+        elif (src_res[0] * src_res[1]) > (res_x * res_y):
             res_case = 'up-sampling'  # higher resolution of the image is needed to get reference image specs
         else:
             res_case = 'down-sampling'  # lower resolution of the image is needed to get reference image specs
 
         # Second, check processing method
-        if self.src_parameters['epsg'] == self.ref_profile['crs'].to_epsg():
+        if self.src_parameters['epsg'] == self.ref_epsg:
             if res_case == 'same':
                 processing_case = 'crop'
             else:
@@ -746,17 +1363,15 @@ class GeoProcessing(object):
         # load file parameters (needed)
         src_parameters = self._load_profile(path_in)
         # now we check if key parameters are OK
-        if (src_parameters['epsg'] == self.ref_profile['crs'].to_epsg()) \
+        if (src_parameters['epsg'] == self.ref_epsg) \
                 and (src_parameters['bbox'] == self.ref_extent) \
-                and (src_parameters['res'] == (float(self.ref_profile['transform'].a),
-                                               float(abs(self.ref_profile['transform'].e)))):
+                and (src_parameters['res'] == self.ref_res):
             # all worked perfectly - nothing to do
             return False
         else:
             # now we check if we have a shift or something else
-            if (src_parameters['epsg'] == self.ref_profile['crs'].to_epsg()) \
-                    and (src_parameters['res'] == (float(self.ref_profile['transform'].a),
-                                                   float(abs(self.ref_profile['transform'].e))))\
+            if (src_parameters['epsg'] == self.ref_epsg) \
+                    and (src_parameters['res'] == self.ref_res)\
                     and (src_parameters['height'] == self.ref_profile['height']) \
                     and (src_parameters['width'] == self.ref_profile['width']):
                 # great something we can easy solve since it is just a sub-pixel shift
@@ -774,14 +1389,9 @@ class GeoProcessing(object):
         """
         # check if we need adjustment
         if self._shift_check(path_in):
-            cmd = '{} -a_ullr {} {} {} {} "{}"'.format(_GDAL_EDIT,
-                                                       self.ref_extent.left,
-                                                       self.ref_extent.top,
-                                                       self.ref_extent.right,
-                                                       self.ref_extent.bottom,
-                                                       path_in)
+            cmd = [_GDAL_EDIT, '-a_ullr', *self._projwin(), path_in]
             try:
-                subprocess.check_call(cmd, shell=True, stdout=self.GDAL_print)
+                self._check_call(cmd)
                 logger.warning('- sub-pixel shift was detected and resolved.')
             except subprocess.CalledProcessError as e:
                 raise OSError(
@@ -790,20 +1400,28 @@ class GeoProcessing(object):
             # nothing to do
             return
 
-    def VolumeWarp2AOI(self, path_in, path_out, wOT='Float64', oversampling_factor=10, secure_run=False):
+    @_with_gdal_env
+    def VolumeWarp2AOI(self, path_in, path_out, wOT='Float64', oversampling_factor=10, secure_run=False,
+                       use_gdal=False):
         """Warp rasters with absolute volume based data.
 
-        Note: still based on gdalwarp but in a 3-step approach which works for up-sampling and down-sampling
+        By default this is a single in-process warp with "sum" resampling: the GDAL warper weights every source pixel
+        by the fraction of its area which falls in the target pixel, so the total volume is preserved for up-sampling
+        and down-sampling alike.  With ``use_gdal``, we fall back to the older 3-step command line approach: oversample
+        with nearest neighbour (gdalwarp), scale by the pixel area ratio (gdal_translate ``-scale``), then sum
+        (gdalwarp), where only the last step writes a file, the first two are VRTs.
         IMPORTANT: since gdal_translate has no "sum" resample method we also use this approach for translate cases
 
         :param path_in: input file path (absolute) of raster file to be processed to reference file specifications
         :param path_out: output file path (absolute) of raster file
         :param wOT: overwriting the input raster data type
-        :param oversampling_factor: set the oversampling rate for the warp
+        :param oversampling_factor: set the oversampling rate for the warp (only used with ``use_gdal``)
         :param secure_run: self.src_parameters is reset before function execution (mainly used when called stand-alone)
+        :param use_gdal: use the 3-step gdalwarp / gdal_translate command line approach instead of warping in-process.
         """
         # check if all parameters of input files are existing - when run in stand-alone mode
         self._full_pre_check(path_in, clean_src=secure_run)
+        res_x, res_y = self.ref_res
         # yet another check - if we have an absolute_volume datatype then we need a check that we have projected
         # coordinate system and a known unit --> otherwise we got issues with the pixel area needed
         self._check3(path_in)
@@ -821,88 +1439,73 @@ class GeoProcessing(object):
             s_srs_string = 'EPSG:{}'.format(self.src_parameters['epsg'])
 
         # resolve potential issue in wOT
-        if wOT in _dtype_map.keys():
-            wOT = _dtype_map[wOT]
+        wOT = _gdal_dtype(wOT)
 
         # 1. warp to target EPSG with oversampled resolution (nearest neighbor) (crop to ref file with buffer of 10 px)
-        buffer_x = 10 * self.ref_profile['transform'].a
-        buffer_y = 10 * abs(self.ref_profile['transform'].e)
-
-        path_temp1 = os.path.join(self.temp_dir, 'VolumeData_helper_file1.tif')
-        cmd1 = 'gdalwarp --config GDAL_CACHEMAX 256 -s_srs "{}" -t_srs "EPSG:{}" -te {} {} {} {} -tr {} {} ' \
-               '-r {} -et 0 -ot {} -ovr None ' \
-               '-wo SAMPLE_STEPS=50 -wo SOURCE_EXTRA=5 -wo SAMPLE_GRID=YES ' \
-               '-co COMPRESS=DEFLATE -co INTERLEAVE=BAND -co BIGTIFF=YES -multi -co TILED=YES ' \
-               '-overwrite "{}" "{}"'.format(s_srs_string,
-                                             self.ref_profile['crs'].to_epsg(),
-                                             self.ref_extent.left - buffer_x,
-                                             self.ref_extent.bottom - buffer_y,
-                                             self.ref_extent.right + buffer_x,
-                                             self.ref_extent.top + buffer_y,
-                                             float(self.ref_profile['transform'].a) / oversampling_factor,
-                                             float(abs(self.ref_profile['transform'].e)) / oversampling_factor,
-                                             'near',
-                                             wOT,
-                                             path_in,
-                                             path_temp1)
-
-        # 2. adjust raster values to oversampling rate (gdal_calc)
-        path_temp2 = os.path.join(self.temp_dir, 'VolumeData_helper_file2.tif')
-        cmd2 = '{} -A "{}" --outfile="{}" --calc="A/({}*{})" --overwrite --quiet ' \
-               '--co="INTERLEAVE=BAND" --co="COMPRESS=DEFLATE" ' \
-               '--co="TILED=YES"'.format(_GDAL_CALC, path_temp1, path_temp2,
-                                         self.src_parameters['res'][0] / (float(self.ref_profile['transform'].a) /
-                                                                          oversampling_factor),
-                                         self.src_parameters['res'][1] / (float(abs(self.ref_profile['transform'].e)) /
-                                                                          oversampling_factor))
+        #    Steps 1 and 2 only write VRTs: step 3 computes the oversampled pixels on the fly, so they never go to disk.
+        buffer_x = 10 * res_x
+        buffer_y = 10 * res_y
+
+        path_temp1 = self._helper_path(path_out, 'VolumeData_helper_file1.vrt')
+        cmd1 = ['gdalwarp', '-wm', str(self.gdal_warp_memory),
+                '-s_srs', s_srs_string, '-t_srs', f'EPSG:{self.ref_epsg}',
+                '-te', str(self.ref_extent.left - buffer_x), str(self.ref_extent.bottom - buffer_y),
+                str(self.ref_extent.right + buffer_x), str(self.ref_extent.top + buffer_y),
+                '-tr', str(res_x / oversampling_factor), str(res_y / oversampling_factor),
+                '-r', 'near', *_ot_args(wOT), *self._warp_args(), '-of', 'VRT',
+                '-overwrite', path_in, path_temp1]
+
+        # 2. adjust raster values to oversampling rate (a linear scaling from [0, ratio] to [0, 1], which does not clip)
+        path_temp2 = self._helper_path(path_out, 'VolumeData_helper_file2.vrt')
+        oversampling_ratio = (self.src_parameters['res'][0] / (res_x / oversampling_factor)
+                              * self.src_parameters['res'][1] / (res_y / oversampling_factor))
+        cmd2 = ['gdal_translate', '-of', 'VRT', *_ot_args('Float64'), '-scale', '0', str(oversampling_ratio), '0', '1',
+                path_temp1, path_temp2]
 
         # 3. use 'sum' resampling mode in warp method to get final results (gdalwarp)
-        cmd3 = 'gdalwarp --config GDAL_CACHEMAX 256 -t_srs "EPSG:{}" -te {} {} {} {} -tr {} {} ' \
-               '-r {} -et 0 -ot {} -ovr None ' \
-               '-wo SAMPLE_STEPS=50 -wo SOURCE_EXTRA=5 -wo SAMPLE_GRID=YES ' \
-               '-co COMPRESS=DEFLATE -co INTERLEAVE=BAND -co BIGTIFF=YES -multi -co TILED=YES ' \
-               '-overwrite "{}" "{}"'.format(self.ref_profile['crs'].to_epsg(),
-                                             self.ref_extent.left,
-                                             self.ref_extent.bottom,
-                                             self.ref_extent.right,
-                                             self.ref_extent.top,
-                                             float(self.ref_profile['transform'].a),
-                                             float(abs(self.ref_profile['transform'].e)),
-                                             'sum',
-                                             wOT,
-                                             path_temp2,
-                                             path_out)
-
-        log_message = '* file {} was warped to AOI and resampled to target resolution'.format(os.path.basename(path_in))
-
-        if not os.path.exists(path_out):
+        cmd3 = ['gdalwarp', '-wm', str(self.gdal_warp_memory), '-t_srs', f'EPSG:{self.ref_epsg}',
+                '-te', str(self.ref_extent.left), str(self.ref_extent.bottom),
+                str(self.ref_extent.right), str(self.ref_extent.top),
+                '-tr', str(res_x), str(res_y),
+                '-r', 'sum', *_ot_args(wOT), *self._warp_args(),
+                *_creation_options(wOT), '-co', 'BIGTIFF=YES', '-multi',
+                '-overwrite', path_temp2, path_out]
+
+        log_message = '* file %s was warped to AOI and resampled to target resolution'
+
+        stamp = self._stamp(path_in, 'VolumeWarp2AOI', wOT, oversampling_factor)
+        if not _output_exists(path_out, stamp):
             try:
-                subprocess.check_call(cmd1, shell=True, stdout=self.GDAL_print)
-                subprocess.check_call(cmd2, shell=True, stdout=self.GDAL_print)
-                subprocess.check_call(cmd3, shell=True, stdout=self.GDAL_print)
+                tags = None if use_gdal else self._build_tags(path_in)  # see _build_tags
+                if use_gdal:
+                    self._check_call(cmd1)
+                    self._check_call(cmd2)
+                    self._check_call(cmd3)
+                else:
+                    self._warp_in_process(path_in, path_out, s_srs_string, 'sum', wOT, tags=tags)
                 # now we run a check if all processing was successful or if we have a sub-pixel shift to resolve
                 self._pixel_shift_adjustment(path_out)
-                logger.debug(log_message)
-            except subprocess.CalledProcessError as e:
+                logger.debug(log_message, os.path.basename(path_in))
+            except (subprocess.CalledProcessError, RasterioError) as e:
                 # delete file if it is partly processed
                 if os.path.exists(path_out):
                     os.remove(path_out)
                 raise OSError('Could not warp the raster file ({}) to the AOI: {}'.format(os.path.basename(path_in), e))
             else:
-                self.adapt_file_metadata(path_in, path_out)
+                if tags is None:
+                    self.adapt_file_metadata(path_in, path_out)
+                _write_stamp(path_out, stamp)
             finally:
                 # reset the src_parameter dic since function is a 'one time run'
                 self.src_parameters = {}
-                if os.path.exists(path_temp1):
-                    os.remove(path_temp1)
-                if os.path.exists(path_temp2):
-                    os.remove(path_temp2)
+                _remove_files(path_temp1, path_temp2)
         else:
             logger.warning('* file already processed. Use existing one {}!'.format(os.path.basename(path_out)))
             # reset the src_parameter dic since function is a 'one time run'
             self.src_parameters = {}
 
-    def Crop2AOI(self, path_in, path_out, wResampling='nearest', wOT='Float64', secure_run=False):
+    @_with_gdal_env
+    def Crop2AOI(self, path_in, path_out, wResampling='nearest', wOT='Float64', secure_run=False, use_gdal=False):
         """Crop raster to AOI when in same coordinate system and same resolution. No checks are done.
 
         Note: Nodata value is kept but dtype of output can be adjusted.
@@ -912,65 +1515,49 @@ class GeoProcessing(object):
         :param wResampling: resampling method
         :param wOT: overwriting the input raster data type
         :param secure_run: self.src_parameters is reset before function execution (mainly used when called stand-alone)
+        :param use_gdal: use the gdal_translate command line tool instead of translating in-process.
         """
         # check if all parameters of input files are existing - when run in stand-alone mode
         self._full_pre_check(path_in, clean_src=secure_run)
+        res_x, res_y = self.ref_res
 
         # first resolve gdal_translate and gdalwarp language issue
         if wResampling == 'near':
             wResampling = 'nearest'
         # resolve potential issue in wOT
-        if wOT in _dtype_map.keys():
-            wOT = _dtype_map[wOT]
+        wOT = _gdal_dtype(wOT)
 
         # Note: the resampling method was added to allow switches to different projection units even when theoretically
         #       no resampling is done (e.g. image in projection with kilometer unit and resolution 1 is same as
         #       reference in metre projection and resolution of 1000)
+        args = [*_creation_options(wOT), *_ot_args(wOT), '-projwin', *self._projwin()]
         if self.src_parameters['overwrite_s_srs']:
             # that case is needed since when input raster had no valid EPSG then gdal command gives wired results
-            cmd = 'gdal_translate --config GDAL_CACHEMAX 256 -co COMPRESS=DEFLATE -co TILED=YES ' \
-                  '-co INTERLEAVE=BAND -ot {} -projwin {} {} {} {} -projwin_srs "EPSG:{}" -a_srs "EPSG:{}" ' \
-                  '-r {} -tr {} {} "{}" "{}"'.format(wOT,
-                                                     self.ref_extent.left,
-                                                     self.ref_extent.top,
-                                                     self.ref_extent.right,
-                                                     self.ref_extent.bottom,
-                                                     self.ref_profile['crs'].to_epsg(),
-                                                     self.ref_profile['crs'].to_epsg(),
-                                                     wResampling,
-                                                     float(self.ref_profile['transform'].a),
-                                                     float(abs(self.ref_profile['transform'].e)),
-                                                     path_in,
-                                                     path_out)
-        else:
-            cmd = 'gdal_translate --config GDAL_CACHEMAX 256 -co COMPRESS=DEFLATE -co TILED=YES ' \
-                  '-co INTERLEAVE=BAND -ot {} -projwin {} {} {} {} -r {} -tr {} {} ' \
-                  '"{}" "{}"'.format(wOT,
-                                     self.ref_extent.left,
-                                     self.ref_extent.top,
-                                     self.ref_extent.right,
-                                     self.ref_extent.bottom,
-                                     wResampling,
-                                     float(self.ref_profile['transform'].a),
-                                     float(abs(self.ref_profile['transform'].e)),
-                                     path_in,
-                                     path_out)
-        log_message = '* file {} was successfully cropped to AOI'.format(os.path.basename(path_in))
-
-        if not os.path.exists(path_out):
+            args += ['-projwin_srs', f'EPSG:{self.ref_epsg}', '-a_srs', f'EPSG:{self.ref_epsg}']
+        args += ['-r', wResampling, '-tr', str(res_x), str(res_y), path_in, path_out]
+        log_message = '* file %s was successfully cropped to AOI'
+
+        stamp = self._stamp(path_in, 'Crop2AOI', wResampling, wOT)
+        if not _output_exists(path_out, stamp):
             try:
-                subprocess.check_call(cmd, shell=True, stdout=self.GDAL_print)
+                tags = None if use_gdal else self._build_tags(path_in)  # see _build_tags
+                # when the input is on the reference grid already, cropping is a plain copy of a window
+                if use_gdal or self.src_parameters['overwrite_s_srs'] \
+                        or not self._copy_window(path_in, path_out, wOT, tags=tags):
+                    self._translate(args, use_gdal, tags=tags)
                 # now we run a check if all processing was successful or if we have a sub-pixel shift to resolve
                 self._pixel_shift_adjustment(path_out)
-                logger.debug(log_message)
-            except subprocess.CalledProcessError as e:
+                logger.debug(log_message, os.path.basename(path_in))
+            except (subprocess.CalledProcessError, RuntimeError, RasterioError) as e:
                 # delete file if it is partly processed
                 if os.path.exists(path_out):
                     os.remove(path_out)
                 raise OSError(
                     'Could not crop the raster file ({}) to the AOI: {}'.format(os.path.basename(path_in), e))
             else:
-                self.adapt_file_metadata(path_in, path_out)
+                if tags is None:
+                    self.adapt_file_metadata(path_in, path_out)
+                _write_stamp(path_out, stamp)
             finally:
                 # reset the src_parameter dic since function is a 'one time run'
                 self.src_parameters = {}
@@ -979,8 +1566,9 @@ class GeoProcessing(object):
             # reset the src_parameter dic since function is a 'one time run'
             self.src_parameters = {}
 
+    @_with_gdal_env
     def Translate2AOI(self, path_in, path_out, wResampling='nearest', wOT='Float64', secure_run=False,
-                      mode=None):
+                      mode=None, use_gdal=False):
         """Translate raster (resampling and cropping) to AOI when in same coordinate system.
 
         Note: Nodata value is kept but dtype of output can be adjusted.
@@ -992,27 +1580,34 @@ class GeoProcessing(object):
         :param secure_run: self.src_parameters is reset before function execution (mainly used when called stand-alone)
         :param mode: resampling strategy between input & reference raster (due to gdal_translate sub-pixel shifts we
                      have to distinguish between up & down sampling) (default: None --> automatic detection)
+        :param use_gdal: use the gdal_translate command line tool instead of translating in-process.  For up-sampling,
+                         this also replaces the single in-process warp by the older 2-step gdal_translate approach.
         """
         # check if all parameters of input files are existing - when run in stand-alone mode
         self._full_pre_check(path_in, clean_src=secure_run)
+        res_x, res_y = self.ref_res
 
         # first resolve gdal_translate and gdalwarp language issue
         if wResampling == 'near':
             wResampling = 'nearest'
         # resolve potential issue in wOT
-        if wOT in _dtype_map.keys():
-            wOT = _dtype_map[wOT]
+        wOT = _gdal_dtype(wOT)
 
         # due to gdal_translate sub-pixel shifts we have to distinguish between up & down sampling
         if mode is None:
             mode, _ = self._get_case_parameters()
         if mode == 'same':
             # that is a Crop case
-            self.Crop2AOI(path_in, path_out, wOT=wOT, secure_run=False)
+            self.Crop2AOI(path_in, path_out, wOT=wOT, secure_run=False, use_gdal=use_gdal)
             return
 
         # now the different approaches
-        if mode == 'up-sampling':
+        if mode == 'up-sampling' and not use_gdal:
+            # the warper resamples straight to the reference grid, without the sub-pixel shifts of gdal_translate, so
+            # we don't need the 2-step approach (and its intermediate file) below
+            args_pre = args = path_temp = None
+            log_message = '* file %s was warped to AOI & resampled to target resolution'
+        elif mode == 'up-sampling':
             # use 2-step approach since gdal_translate first crop and then resample which leds to shifts
             # get the index of UL and LR corner for reference file in existing input file
             UL_row, UL_column = coord_2_index(self.ref_extent.left, self.ref_extent.top,
@@ -1021,126 +1616,74 @@ class GeoProcessing(object):
             LR_row, LR_column = coord_2_index(self.ref_extent.right, self.ref_extent.bottom,
                                               self.src_parameters['bbox'].left, self.src_parameters['bbox'].top,
                                               self.src_parameters['res'])
-            # add buffer of 1 pixel in input file resolution
-            if UL_column >= 1:
-                UL_column -= 1
-            if UL_row >= 1:
-                UL_row -= 1
-            if LR_column < self.src_parameters['width']:
-                LR_column += 1
-            if LR_row < self.src_parameters['height']:
-                LR_row += 1
+            # add buffer of 1 pixel in input file resolution (clamped to the input raster)
+            UL_row, UL_column = max(0, UL_row - 1), max(0, UL_column - 1)
+            LR_row = min(self.src_parameters['height'], LR_row + 1)
+            LR_column = min(self.src_parameters['width'], LR_column + 1)
 
             # create CMD for 1. step - resampling a bigger area as needed
-            path_temp = os.path.join(self.temp_dir, 'translation_helper_file.tif')
+            path_temp = self._helper_path(path_out, 'translation_helper_file.tif')
+            args_pre = [*_creation_options(wOT), *_ot_args(wOT)]
             # again the check is needed if we have a raster file without valid EPSG code
             if self.src_parameters['overwrite_s_srs']:
                 # that case is needed since when input raster had no valid EPSG then gdal command gives wired results
-                cmd_pre = 'gdal_translate --config GDAL_CACHEMAX 256 -co COMPRESS=DEFLATE -co TILED=YES ' \
-                          '-a_srs "EPSG:{}" -co INTERLEAVE=BAND -ot {} -tr {} {} -r {} -srcwin {} {} {} {} ' \
-                          '"{}" "{}"'.format(self.ref_profile['crs'].to_epsg(),
-                                             wOT,
-                                             float(self.ref_profile['transform'].a),
-                                             float(abs(self.ref_profile['transform'].e)),
-                                             wResampling,
-                                             UL_column,
-                                             UL_row,
-                                             LR_column - UL_column,
-                                             LR_row - UL_row,
-                                             path_in,
-                                             path_temp)
-            else:
-                cmd_pre = 'gdal_translate --config GDAL_CACHEMAX 256 -co COMPRESS=DEFLATE -co TILED=YES ' \
-                          '-co INTERLEAVE=BAND -ot {} -tr {} {} -r {} -srcwin {} {} {} {} ' \
-                          '"{}" "{}"'.format(wOT,
-                                             float(self.ref_profile['transform'].a),
-                                             float(abs(self.ref_profile['transform'].e)),
-                                             wResampling,
-                                             UL_column,
-                                             UL_row,
-                                             LR_column - UL_column,
-                                             LR_row - UL_row,
-                                             path_in,
-                                             path_temp)
+                args_pre += ['-a_srs', f'EPSG:{self.ref_epsg}']
+            args_pre += ['-tr', str(res_x), str(res_y), '-r', wResampling,
+                         '-srcwin', str(UL_column), str(UL_row), str(LR_column - UL_column), str(LR_row - UL_row),
+                         path_in, path_temp]
 
             # create CMD for 2. step - the cut to the extent
-            cmd = 'gdal_translate --config GDAL_CACHEMAX 256 -co COMPRESS=DEFLATE -co TILED=YES -co INTERLEAVE=BAND ' \
-                  '-ot {} -projwin {} {} {} {} ' \
-                  '"{}" "{}"'.format(wOT,
-                                     self.ref_extent.left,
-                                     self.ref_extent.top,
-                                     self.ref_extent.right,
-                                     self.ref_extent.bottom,
-                                     path_temp,
-                                     path_out)
-            log_message = '* file {} was cropped to AOI & resampled to target resolution in 2-step approach'.format(
-                os.path.basename(path_in))
+            args = [*_creation_options(wOT), *_ot_args(wOT), '-projwin', *self._projwin(), path_temp, path_out]
+            log_message = '* file %s was cropped to AOI & resampled to target resolution in 2-step approach'
         elif mode == 'down-sampling':
-            cmd_pre = None
-            path_temp = os.path.join(self.temp_dir, 'translation_helper_file.tif')
+            args_pre = None
+            path_temp = self._helper_path(path_out, 'translation_helper_file.tif')
 
+            args = [*_creation_options(wOT), *_ot_args(wOT)]
             # again the check is needed if we have a raster file without valid EPSG code
             if self.src_parameters['overwrite_s_srs']:
                 # that case is needed since when input raster had no valid EPSG then gdal command gives wired results
-                cmd = 'gdal_translate --config GDAL_CACHEMAX 256 -co COMPRESS=DEFLATE -co TILED=YES ' \
-                      '-a_srs "EPSG:{}" -co INTERLEAVE=BAND -ot {} -tr {} {} -r {} -projwin {} {} {} {} ' \
-                      '"{}" "{}"'.format(self.ref_profile['crs'].to_epsg(),
-                                         wOT,
-                                         float(self.ref_profile['transform'].a),
-                                         float(abs(self.ref_profile['transform'].e)),
-                                         wResampling,
-                                         self.ref_extent.left,
-                                         self.ref_extent.top,
-                                         self.ref_extent.right,
-                                         self.ref_extent.bottom,
-                                         path_in,
-                                         path_out)
-            else:
-                cmd = 'gdal_translate --config GDAL_CACHEMAX 256 -co COMPRESS=DEFLATE -co TILED=YES ' \
-                      '-co INTERLEAVE=BAND -ot {} -tr {} {} -r {} -projwin {} {} {} {} ' \
-                      '"{}" "{}"'.format(wOT,
-                                         float(self.ref_profile['transform'].a),
-                                         float(abs(self.ref_profile['transform'].e)),
-                                         wResampling,
-                                         self.ref_extent.left,
-                                         self.ref_extent.top,
-                                         self.ref_extent.right,
-                                         self.ref_extent.bottom,
-                                         path_in,
-                                         path_out)
-            log_message = '* file {} was cropped to AOI & resampled to target resolution'.format(
-                os.path.basename(path_in))
+                args += ['-a_srs', f'EPSG:{self.ref_epsg}']
+            args += ['-tr', str(res_x), str(res_y), '-r', wResampling, '-projwin', *self._projwin(), path_in, path_out]
+            log_message = '* file %s was cropped to AOI & resampled to target resolution'
         else:
             raise RuntimeError(f'this mode {mode} is currently not forseen.')
 
-        if not os.path.exists(path_out):
+        stamp = self._stamp(path_in, 'Translate2AOI', wResampling, wOT, mode)
+        if not _output_exists(path_out, stamp):
             try:
-                if cmd_pre is not None:
-                    subprocess.check_call(cmd_pre, shell=True, stdout=self.GDAL_print)
-                subprocess.check_call(cmd, shell=True, stdout=self.GDAL_print)
+                tags = None if use_gdal else self._build_tags(path_in)  # see _build_tags
+                if args is None:
+                    self._warp_in_process(path_in, path_out, self.ref_profile['crs'], wResampling, wOT, tags=tags)
+                else:
+                    if args_pre is not None:
+                        self._translate(args_pre, use_gdal)
+                    self._translate(args, use_gdal, tags=tags)
                 # now we run a check if all processing was successful or if we have a sub-pixel shift to resolve
                 self._pixel_shift_adjustment(path_out)
-                logger.debug(log_message)
-            except subprocess.CalledProcessError as e:
+                logger.debug(log_message, os.path.basename(path_in))
+            except (subprocess.CalledProcessError, RuntimeError, RasterioError) as e:
                 # delete file if it is partly processed
                 if os.path.exists(path_out):
                     os.remove(path_out)
                 raise OSError(
                     'Could not translate the raster file ({}) to the AOI: {}'.format(os.path.basename(path_in), e))
             else:
-                self.adapt_file_metadata(path_in, path_out)
+                if tags is None:
+                    self.adapt_file_metadata(path_in, path_out)
+                _write_stamp(path_out, stamp)
             finally:
                 # reset the src_parameter dic since function is a 'one time run'
                 self.src_parameters = {}
                 # remove temp files
-                if os.path.exists(path_temp):
-                    os.remove(path_temp)
+                _remove_files(path_temp)
         else:
             logger.warning('* file already processed. Use existing one {}!'.format(os.path.basename(path_out)))
             # reset the src_parameter dic since function is a 'one time run'
             self.src_parameters = {}
 
-    def Warp2AOI(self, path_in, path_out, wResampling='near', wOT='Float64', secure_run=False):
+    @_with_gdal_env
+    def Warp2AOI(self, path_in, path_out, wResampling='near', wOT='Float64', secure_run=False, use_gdal=False):
         """Warp a file to an AOI without any checks.
 
         Note: nodata value stays the same, but dtype can be adjusted.
@@ -1150,6 +1693,7 @@ class GeoProcessing(object):
         :param wResampling: resampling method
         :param wOT: overwriting the input raster data type
         :param secure_run: self.src_parameters is reset before function execution (mainly used when called stand-alone)
+        :param use_gdal: use the gdalwarp command line tool instead of warping in-process.
         """
         # check if all parameters of input files are existing - when run in stand-alone mode
         self._full_pre_check(path_in, clean_src=secure_run)
@@ -1158,8 +1702,7 @@ class GeoProcessing(object):
         if wResampling == 'nearest':
             wResampling = 'near'
         # resolve potential issue in wOT
-        if wOT in _dtype_map.keys():
-            wOT = _dtype_map[wOT]
+        wOT = _gdal_dtype(wOT)
 
         # resolve ESRI / EPSG issue
         if self.src_parameters['epsg'] in ESRI_IDENTIFIER:
@@ -1167,37 +1710,36 @@ class GeoProcessing(object):
         else:
             s_srs_string = 'EPSG:{}'.format(self.src_parameters['epsg'])
 
-        cmd = 'gdalwarp --config GDAL_CACHEMAX 256 -s_srs "{}" -t_srs "EPSG:{}" -te {} {} {} {} -tr {} {} -r {} ' \
-              '-et 0 -ot {} -ovr None ' \
-              '-wo SAMPLE_STEPS=50 -wo SOURCE_EXTRA=5 -wo SAMPLE_GRID=YES ' \
-              '-co COMPRESS=DEFLATE -co INTERLEAVE=BAND -co BIGTIFF=YES -multi -co TILED=YES ' \
-              '-overwrite "{}" "{}"'.format(s_srs_string,
-                                            self.ref_profile['crs'].to_epsg(),
-                                            self.ref_extent.left,
-                                            self.ref_extent.bottom,
-                                            self.ref_extent.right,
-                                            self.ref_extent.top,
-                                            float(self.ref_profile['transform'].a),
-                                            float(abs(self.ref_profile['transform'].e)),
-                                            wResampling,
-                                            wOT,
-                                            path_in,
-                                            path_out)
-        log_message = '* file {} was warped to AOI and resampled to target resolution'.format(os.path.basename(path_in))
-
-        if not os.path.exists(path_out):
+        cmd = ['gdalwarp', '-wm', str(self.gdal_warp_memory),
+               '-s_srs', s_srs_string, '-t_srs', f'EPSG:{self.ref_epsg}',
+               '-te', str(self.ref_extent.left), str(self.ref_extent.bottom),
+               str(self.ref_extent.right), str(self.ref_extent.top),
+               '-tr', str(self.ref_res[0]), str(self.ref_res[1]),
+               '-r', wResampling, *_ot_args(wOT), *self._warp_args(),
+               *_creation_options(wOT), '-co', 'BIGTIFF=YES', '-multi',
+               '-overwrite', path_in, path_out]
+        log_message = '* file %s was warped to AOI and resampled to target resolution'
+
+        stamp = self._stamp(path_in, 'Warp2AOI', wResampling, wOT)
+        if not _output_exists(path_out, stamp):
             try:
-                subprocess.check_call(cmd, shell=True, stdout=self.GDAL_print)
+                tags = None if use_gdal else self._build_tags(path_in)  # see _build_tags
+                if use_gdal:
+                    self._check_call(cmd)
+                else:
+                    self._warp_in_process(path_in, path_out, s_srs_string, wResampling, wOT, tags=tags)
                 # now we run a check if all processing was successful or if we have a sub-pixel shift to resolve
                 self._pixel_shift_adjustment(path_out)
-                logger.debug(log_message)
-            except subprocess.CalledProcessError as e:
+                logger.debug(log_message, os.path.basename(path_in))
+            except (subprocess.CalledProcessError, RasterioError) as e:
                 # delete file if it is partly processed
                 if os.path.exists(path_out):
                     os.remove(path_out)
                 raise OSError('Could not warp the raster file ({}) to the AOI: {}'.format(os.path.basename(path_in), e))
             else:
-                self.adapt_file_metadata(path_in, path_out)
+                if tags is None:
+                    self.adapt_file_metadata(path_in, path_out)
+                _write_stamp(path_out, stamp)
             finally:
                 # reset the src_parameter dic since function is a 'one time run'
                 self.src_parameters = {}
@@ -1206,6 +1748,57 @@ class GeoProcessing(object):
             # reset the src_parameter dic since function is a 'one time run'
             self.src_parameters = {}
 
+    def _warp_in_process(self, path_in, path_out, src_crs, resampling, dtype, block_shape=None,
+                         max_block_bytes=64 * 1024 * 1024, tags=None):
+        """Warp all bands of a raster to the reference grid in-process, through a :class:`rasterio.vrt.WarpedVRT`.
+
+        This uses the same GDAL warper and warp options as our gdalwarp command line, but avoids starting a separate
+        process (which has to initialize GDAL and PROJ again) and lets the warper use several threads.  The output is
+        written block by block, so we never hold the complete input or output in memory: by default the blocks are
+        squares aligned to the output tiles, sized so all bands of one block fit in ``max_block_bytes``.
+
+        :param path_in: input raster file
+        :param path_out: output raster file
+        :param src_crs: CRS of the input file (as a string), overrides the CRS found in the file
+        :param resampling: resampling method, as used for gdalwarp
+        :param dtype: GDAL data type name of the output, as used for the command line tools
+        :param block_shape: shape of the blocks to warp at once, or None to derive it from ``max_block_bytes``
+        :param max_block_bytes: memory budget for a single block (all bands), if ``block_shape`` is None
+        :param tags: metadata tags for the output file
+        """
+        res_x, res_y = self.ref_res
+        width = int((self.ref_extent.right - self.ref_extent.left) / res_x + 0.5)
+        height = int((self.ref_extent.top - self.ref_extent.bottom) / res_y + 0.5)
+        transform = rasterio.transform.from_origin(self.ref_extent.left, self.ref_extent.top,
+                                                   res_x,
+                                                   res_y)
+        np_dtype = _rasterio_dtype(dtype)
+        # Same as "-et 0 -wo SAMPLE_STEPS=50 -wo SOURCE_EXTRA=5 -wo SAMPLE_GRID=YES -multi -wm ..." for gdalwarp.  Note
+        # that WarpedVRT fails on a tolerance of exactly 0, so we use a negligible one.
+        warp_options = dict(tolerance=1e-9, warp_mem_limit=self.gdal_warp_memory,
+                            warp_extras={'SAMPLE_STEPS': 50, 'SOURCE_EXTRA': 5, 'SAMPLE_GRID': 'YES',
+                                         'NUM_THREADS': self.num_threads or max(1, (os.cpu_count() or 1) - 1)})
+        with rasterio.open(path_in) as src, \
+                WarpedVRT(src, src_crs=src_crs, crs=self.ref_profile['crs'], transform=transform, width=width,
+                          height=height, resampling=Resampling['nearest' if resampling == 'near' else resampling],
+                          dtype=np_dtype, **warp_options) as vrt:
+            profile = {'driver': 'GTiff', 'dtype': np_dtype, 'nodata': vrt.nodata, 'width': width, 'height': height,
+                       'count': vrt.count, 'crs': self.ref_profile['crs'], 'transform': transform,
+                       'bigtiff': 'IF_SAFER', 'num_threads': self._num_threads_option(), **_creation_profile(dtype)}
+            if block_shape is None:
+                side = int(math.sqrt(max_block_bytes / (vrt.count * np.dtype(np_dtype).itemsize)))
+                block_shape = (max(_TILE_SIZE, side // _TILE_SIZE * _TILE_SIZE),) * 2
+            with rasterio.open(path_out, 'w', **profile) as dst:
+                for _, (rows, cols) in block_window_generator(block_shape, height, width):
+                    window = Window.from_slices(rows, cols)
+                    dst.write(vrt.read(window=window), window=window)
+                try:
+                    dst.write_colormap(1, src.colormap(1))
+                except ValueError:  # no colormap
+                    pass
+                if tags:
+                    dst.update_tags(**tags)
+
     def adapt_file_metadata(self, path_in, path_out):
         """Write metadata extracted from input file to raster file.
 
@@ -1216,47 +1809,54 @@ class GeoProcessing(object):
         """
         # first remove existing metadata in dst_file (only allow our metadata)
         # Note: Structure metadata (incl. scale, offset, nodata value, Interleave, Area_or_point ) are not touched
-        cmd = '{} -unsetmd "{}"'.format(_GDAL_EDIT, path_out)
+        cmd = [_GDAL_EDIT, '-unsetmd', path_out]
         try:
-            subprocess.check_call(cmd, shell=True, stdout=self.GDAL_print)
+            self._check_call(cmd)
         except subprocess.CalledProcessError as e:
             raise OSError('GDAL_EDIT issue with file ({}) : {}'.format(os.path.basename(path_out), e))
 
+        with rasterio.open(path_out, 'r+') as dst:
+            dst.update_tags(**self._build_tags(path_in))
+
+    def _build_tags(self, path_in):
+        """Return the metadata tags for a raster file produced from ``path_in`` by one of the ``*2AOI`` methods.
+
+        When processing in-process, we write these tags while creating the output.  The GDAL command line tools copy the
+        metadata of the input file, so then :meth:`adapt_file_metadata` has to replace it afterwards.
+
+        :param path_in: file path (absolute) to file to extract metadata from
+        """
         # get metadata of input file (adapted ones - not only original)
         self.metadata.read_raster_tags([os.path.normpath(path_in)])
 
         # get unit if possible from input file
-        try:
-            punit = self.src_parameters['tags']['unit']
-        except Exception:
-            punit = ' '
+        punit = self.src_parameters.get('tags', {}).get('unit', ' ')
 
         # create full metadata dict
-        tags = self.metadata.prepare_raster_tags(
+        return self.metadata.prepare_raster_tags(
             'Original file: {}. Warped/translated to EPSG, resolution and extent of project AOI'.format(
                 os.path.basename(os.path.normpath(path_in))), punit)
 
-        with rasterio.open(path_out, 'r+') as dst:
-            dst.update_tags(**tags)
-
     def check_raster_contains_ref_extent(self, raster_path):
         """Check if the bounding box of a given raster contains the bounding box of the reference grid."""
-        with rasterio.open(raster_path) as ds_raster:
-            raster_crs = ds_raster.crs
-            raster_bbox = shapely.geometry.box(*ds_raster.bounds)
-        # GeoDataFrame for easy coordinate transformation
-        df_raster = gpd.GeoDataFrame({'id': 1, 'geometry': [raster_bbox]}, crs=raster_crs)
-
-        # Transform raster bounding box to reference coordinate system if needed.
-        # TODO : Only tranforming the 4 corners of the bounding box may not be sufficiently accurate for some
-        #  coordinate transforms.  Better to create a polygon from a list of points on the bounding box and transform
-        #  that.
-        df_raster.to_crs(crs=self.ref_profile['crs'], inplace=True)
-
-        bbox_ref = shapely.geometry.box(*self.ref_extent)
-        logger.debug('Raster bbox: %s\nref bbox: %s', df_raster.loc[0, 'geometry'], bbox_ref)
-        if not bbox_ref.within(df_raster.loc[0, 'geometry']):
-            ref_epsg = self.ref_profile['crs'].to_epsg()
+        # the (cached) profile saves opening the raster again in the checks and processing that follow
+        dFile = self._load_profile(raster_path)
+        raster_crs = dFile['profile']['crs']
+        raster_bbox = shapely.geometry.box(*dFile['bbox'])
+
+        # Transform raster bounding box to reference coordinate system if needed.  We densify the box to 20 segments
+        # per edge first, so the transformed polygon follows edges which become curved in the reference coordinate
+        # system.
+        if raster_crs != self.ref_profile['crs']:
+            left, bottom, right, top = dFile['bbox']
+            raster_bbox = shapely.transform(
+                raster_bbox.segmentize(max(right - left, top - bottom) / 20),
+                lambda xy: np.column_stack(rasterio.warp.transform(raster_crs, self.ref_profile['crs'],
+                                                                   xy[:, 0], xy[:, 1])))
+
+        logger.debug('Raster bbox: %s\nref bbox: %s', raster_bbox, self._ref_box)
+        if not shapely.within(self._ref_box, raster_bbox):
+            ref_epsg = self.ref_epsg
             raise Error(f'Raster file {raster_path} does not contain the complete reference extent.  Please provide a '
                         f'raster file with a minimum extent of {self.ref_extent} (in EPSG:{ref_epsg}).')
 
@@ -1275,7 +1875,7 @@ class GeoProcessing(object):
         :return: bool
         """
         # always freshly load the profile info
-        self.src_parameters = self._load_profile(raster_path)
+        self._load_src_parameters(raster_path)
         # check for main current geoprocessing limitation
         self._epsg_check(self.src_parameters['epsg'], raster_path)
 
@@ -1310,21 +1910,27 @@ class GeoProcessing(object):
         # check if we have to reproject something
         # Note: we always convert the raster AOI to avoid issues to change GeoDataFrame projections in the whole project
         # also gives an error if the GeoDataFrame has no valid epsg code
-        if gdf.crs.to_epsg() != self.src_parameters['epsg']:
-            df_raster.to_crs(epsg=gdf.crs.to_epsg(), inplace=True)
+        gdf_epsg = gdf.crs.to_epsg()
+        if gdf_epsg != self.src_parameters['epsg']:
+            df_raster.to_crs(epsg=gdf_epsg, inplace=True)
 
         # reset src_parameters if needed - otherwise further geoprocessing is possible without parameter extraction
         if stand_alone:
             self.src_parameters = {}
 
-        # now we finally can check if all (valid) polygons in the GeoDataFrame are within the raster bbox
-        if not gdf.geometry[gdf.is_valid].within(df_raster.loc[0, 'geometry']).all():
+        # now we finally can check if all (valid) polygons in the GeoDataFrame are within the raster bbox, using a
+        # prepared raster bbox so the test doesn't walk all its (densified) edges for every polygon.
+        raster_box = df_raster.loc[0, 'geometry']
+        shapely.prepare(raster_box)
+        geoms = gdf.geometry.values
+        if not shapely.contains(raster_box, geoms[shapely.is_valid(geoms)]).all():
             logger.warning('Not all needed shapes specified by the GeoDataFrame are included in ' +
                            'the provided raster file {}'.format(raster_path))
             return False
         else:
             return True
 
+    @_with_gdal_env
     def crop_2_reporting_AOI(self, src_path, dst_path, path_mask, add_progress=lambda p: None,
                              block_shape=(4096, 4096)):
         """Mask an input raster by given raster and crop to reporting extent.
@@ -1335,7 +1941,7 @@ class GeoProcessing(object):
         :param dst_path: path to output raster
         :param path_mask: path to the masking raster (dimension must be as src_path)
         :param add_progress: to use the progressbar in QGIS
-        :param block_shape: size of blocks for processing
+        :param block_shape: size of blocks for processing (aligned with the block size of dst_path)
         """
         # check
         self._check2()
@@ -1346,21 +1952,39 @@ class GeoProcessing(object):
                 src_nodata = src_data.nodatavals[0]
             else:
                 src_nodata = 0
+            mask_nodata = ds_mask.nodata
             with rasterio.open(dst_path, 'w', **dict(self.reporting_profile.copy(), dtype=src_data.dtypes[0],
                                                      nodata=src_nodata)) as ds_out:
+                # the windows start at the origin of the reporting raster: aligning them with its tiles means that
+                # every output tile is written at once, without reading back partial tiles
+                block_shape = _align_block_shape(block_shape, ds_out.block_shapes[0])
                 nblocks = number_blocks(self.reporting_profile, block_shape)
                 # copy tags to dst
                 ds_out.update_tags(**src_data.tags())
-                for _, dst_window in block_window_generator(block_shape, ds_out.height, ds_out.width):
-                    # here comes the magic -> find the processing_block of dst file in the src file
-                    dst_win_bounds = ds_out.window_bounds(dst_window)
-                    src_window = src_data.window(dst_win_bounds[0], dst_win_bounds[1],
-                                                 dst_win_bounds[2], dst_win_bounds[3])
-                    # get data & mask
-                    aData = src_data.read(1, window=src_window, masked=True)
-                    aMask = ds_mask.read(1, window=src_window)
-                    aData[aMask == ds_mask.nodata] = ds_out.nodata
-                    ds_out.write(aData.filled(ds_out.nodata), window=dst_window, indexes=1)
+                write_lock = threading.Lock()
+                dst_height, dst_width, dst_transform = ds_out.height, ds_out.width, ds_out.transform
+                src_transform = src_data.transform
+
+                def process_block(windows):
+                    # every block opens its own input datasets, see _map_blocks
+                    src_window, dst_window = windows
+                    with rasterio.open(src_path, 'r', sharing=False) as src_block, \
+                            rasterio.open(path_mask, 'r', sharing=False) as mask_block:
+                        aData = src_block.read(1, window=src_window)
+                        aMask = mask_block.read(1, window=src_window)
+                    # input nodata pixels already hold the output nodata value, so we only need to add the mask
+                    np.putmask(aData, aMask == mask_nodata, src_nodata)
+                    with write_lock:
+                        ds_out.write(aData, window=dst_window, indexes=1)
+
+                def block_windows():
+                    # (the datasets are not used here, as they may be accessed by the worker threads at the same time)
+                    for _, dst_window in block_window_generator(block_shape, dst_height, dst_width):
+                        # here comes the magic -> find the processing_block of dst file in the src file
+                        dst_win_bounds = rasterio.windows.bounds(dst_window, dst_transform)
+                        yield rasterio.windows.from_bounds(*dst_win_bounds, transform=src_transform), dst_window
+
+                for _ in _map_blocks(process_block, block_windows()):
                     add_progress(100. / nblocks)
 
     def vector_2_AOI(self, infile, outfile, mode='statistical'):
@@ -1374,14 +1998,15 @@ class GeoProcessing(object):
             out_crs = self.reporting_profile['crs']
 
         cmd = ['ogr2ogr', '-overwrite',
-               '-t_srs', str(out_crs).replace('"', '\\"'),
+               '-t_srs', str(out_crs),
                '-clipdst',  str(pextent.left), str(pextent.bottom), str(pextent.right), str(pextent.top),
                '-nlt', 'POLYGON',
                outfile, infile]
 
-        subprocess.run(cmd, check=True)
+        self._check_call(cmd, stdout=None)
 
-    def merge_raster(self, lPathIn, path_out, mode=None):
+    @_with_gdal_env
+    def merge_raster(self, lPathIn, path_out, mode=None, use_gdal=False):
         """Merge several GeoTiff files into one.
 
         Note: use mainly to combine several tiles or raster with non-overlapping nodata areas.
@@ -1389,57 +2014,66 @@ class GeoProcessing(object):
         :param lPathIn: list of paths with all GeoTiff files to merge
         :param path_out: absolute path of the output file name for merged GeoTiff file
         :param mode: processing extent (statistical, regional, None)
+        :param use_gdal: use the gdalbuildvrt and gdal_translate command line tools instead of merging in-process.
         """
-        # first generate the VRT file
-        # write paths to a text file
-        path_list = os.path.join(self.temp_dir, 'paths.txt')
-        with open(path_list, "w") as outfile:
-            outfile.write("\n".join(lPathIn))
-        # create temp vrt
-        path_vrt = os.path.join(self.temp_dir, os.path.basename(path_out).split('.')[0] + '.vrt')
-        cmd = 'gdalbuildvrt -input_file_list "{}" -overwrite -q "{}"'.format(path_list, path_vrt)
         if mode is None:
-            pass
+            vrt_args = []
         elif mode == 'statistic':
             self._check()
-            cmd += ' -te {} {} {} {} -tr {} {}'.format(self.ref_extent.left,
-                                                       self.ref_extent.bottom,
-                                                       self.ref_extent.right,
-                                                       self.ref_extent.top,
-                                                       float(self.ref_profile['transform'].a),
-                                                       float(abs(self.ref_profile['transform'].e)))
+            vrt_args = ['-te', str(self.ref_extent.left), str(self.ref_extent.bottom),
+                        str(self.ref_extent.right), str(self.ref_extent.top),
+                        '-tr', str(self.ref_res[0]), str(self.ref_res[1])]
         elif mode == 'reporting':
             self._check2()
-            cmd += ' -te {} {} {} {} -tr {} {}'.format(self.reporting_extent.left,
-                                                       self.reporting_extent.bottom,
-                                                       self.reporting_extent.right,
-                                                       self.reporting_extent.top,
-                                                       float(self.reporting_profile['transform'].a),
-                                                       float(abs(self.reporting_profile['transform'].e)))
+            vrt_args = ['-te', str(self.reporting_extent.left), str(self.reporting_extent.bottom),
+                        str(self.reporting_extent.right), str(self.reporting_extent.top),
+                        '-tr', str(self.reporting_res[0]), str(self.reporting_res[1])]
         else:
             raise RuntimeError('The given mode option is not forseen in merge_raster function')
+        translate_args = ['-strict', *_creation_options(_gdal_dtype(self._load_profile(lPathIn[0])['dtype']))]
+
+        if not use_gdal:
+            # build the VRT in memory, and translate it to GeoTiff right away
+            with self._osgeo_gdal() as gdal:
+                vrt = gdal.BuildVRT('', lPathIn, options=gdal.BuildVRTOptions(options=vrt_args))
+                if vrt is None:  # without gdal.UseExceptions(), errors are only signaled through the return value
+                    raise OSError(f'Could not generate the needed VRT file: {gdal.GetLastErrorMsg()}.')
+                ds = gdal.Translate(path_out, vrt, options=gdal.TranslateOptions(options=translate_args))
+                if ds is None:
+                    raise OSError(f'Could not translate the VRT file into raster file: {gdal.GetLastErrorMsg()}.')
+                ds = vrt = None  # close the output, so it is completely written
+            return
+
+        # first generate the VRT file
+        # write paths to a text file
+        path_list = self._helper_path(path_out, 'paths.txt')
+        with open(path_list, "w") as outfile:
+            outfile.write("\n".join(lPathIn))
+        # create temp vrt
+        path_vrt = os.path.join(self.temp_dir, os.path.basename(path_out).split('.')[0] + '.vrt')
+        cmd = ['gdalbuildvrt', '-input_file_list', path_list, '-overwrite', '-q', *vrt_args, path_vrt]
 
         try:
-            subprocess.check_call(cmd, shell=True, stdout=self.GDAL_print)
+            self._check_call(cmd)
         except subprocess.CalledProcessError as e:
+            _remove_files(path_list)
             raise OSError(f'Could not generate the needed VRT file: {e}.')
 
         # transfer to GeoTiff
-        cmd = 'gdal_translate -strict -co COMPRESS=DEFLATE "{}" "{}"'.format(path_vrt, path_out)
+        cmd = ['gdal_translate', *translate_args, path_vrt, path_out]
         try:
-            subprocess.check_call(cmd, shell=True, stdout=self.GDAL_print)
+            self._check_call(cmd)
         except subprocess.CalledProcessError as e:
             raise OSError(f'Could not translate the VRT file into raster file: {e}.')
         finally:
             # remove temp files
-            if os.path.exists(path_vrt):
-                os.remove(path_vrt)
-            if os.path.exists(path_list):
-                os.remove(path_list)
+            _remove_files(path_vrt, path_list)
 
+    @_with_gdal_env
     def spatial_disaggregation_byArea(self, path_proxy_raster, data, path_area_raster, area_names, path_out,
                                       add_progress=lambda p: None, proxy_sums=None,
-                                      processing_info='N/A', unit_info='N/A', block_shape=(2048, 2048)):
+                                      processing_info='N/A', unit_info='N/A', block_shape=(2048, 2048),
+                                      cache_blocks=False):
         """Disaggregate values per region using a proxy raster, such that the total for each region is preserved.
 
         Given an area raster and a table total values per area, disaggregate the totals according to the proxy raster,
@@ -1456,72 +2090,111 @@ class GeoProcessing(object):
         :param proxy_sums: Optional Series of precomputed sum of proxy data per Area.
         :param processing_info: string describing the processing step (optional)
         :param unit_info:  string describing the unit of the spatially disaggregated totals (optional)
-        :param block_shape: tuple (y_size, x_size) for block processing of the statistic extraction (optional)
+        :param block_shape: tuple (y_size, x_size) for block processing of the statistic extraction (optional,
+                            aligned with the block size of the proxy raster)
+        :param cache_blocks: if the proxy sums are computed here, keep a raw (uncompressed) copy of the proxy and area
+                             rasters in the temporary directory meanwhile, so they are not read and decompressed a
+                             second time.  This takes width * height * (size of both data types) of extra disk
+                             space, e.g. 6.4 GB for a 40000 x 40000 raster with float32 proxy and area.
         :return: DataFrame containing sum of proxy values per region.  Can be reused in subsequent calls to
                  :meth:`spatial_disaggregation_byArea` to save computation effort.
 
         """
         progress_remain = 100.  # remaining progress to be used for progress bar
-        if proxy_sums is None:
-            # first get the proxy raster value sum of the different areas for which to disaggregate the table data
-            proxy_sums = statistics_byArea(path_proxy_raster, path_area_raster, area_names,
-                                           add_progress=lambda p: add_progress(0.4 * p),
-                                           # assign 40% of progress to stats
-                                           block_shape=block_shape)[SUM]
-            progress_remain = 60.  # 40% assigned to the statistics extraction
-
-        # calculate area-specific contribution factor
-        # TODO make sure area_names and data have the same index before calling statistics_byArea, so proxy_sums will
-        #  be complete! (and the reindex is not needed here anymore)?
-        #  Take care that area_names can be a dict (convert to Series first?)!
-        dis_factor = (data / proxy_sums.reindex(data.index)).fillna(0)
-
-        # start processing
-        with rasterio.open(path_proxy_raster) as src_proxy, \
-                rasterio.open(path_area_raster) as src_area:
-
-            dst_profile = src_proxy.profile
-            dst_profile.update(dtype=rasterio.float32, nodata=np.nan)
+        path_cache = None
+        if proxy_sums is None and cache_blocks:
+            # keep a raw copy of the rasters, so we don't have to read and decompress them a second time
+            path_cache = os.path.join(self.temp_dir, splitext(basename(path_out))[0] + '_blocks')
+        cache = {}
+        try:
+            if proxy_sums is None:
+                # first get the proxy raster value sum of the different areas for which to disaggregate the table
+                # data (and fill the cache, if any)
+                proxy_sums = statistics_byArea(path_proxy_raster, path_area_raster, area_names,
+                                               add_progress=lambda p: add_progress(0.4 * p),
+                                               # assign 40% of progress to stats
+                                               block_shape=block_shape, path_cache=path_cache)[SUM]
+                progress_remain = 60.  # 40% assigned to the statistics extraction
+
+            # calculate area-specific contribution factor
+            # TODO make sure area_names and data have the same index before calling statistics_byArea, so proxy_sums
+            #  will be complete! (and the reindex is not needed here anymore)?
+            #  Take care that area_names can be a dict (convert to Series first?)!
+            dis_factor = (data / proxy_sums.reindex(data.index)).fillna(0)
+            # lookup table from area raster value to factor, pixels outside of the areas (incl. area 0) stay nodata
+            areas = pd.Series(dict(area_names.items()), dtype=np.int64)
+            areas = areas[areas != 0]
+            factor_table = _factor_table(dis_factor.reindex(areas.index).to_numpy(), areas.to_numpy())
+
+            # start processing
+            with rasterio.open(path_proxy_raster) as src_proxy, rasterio.open(path_area_raster) as src_area:
+                dst_profile = src_proxy.profile
+                block_shape = _align_block_shape(block_shape, src_proxy.block_shapes[0])
+                proxy_dtype, area_dtype = src_proxy.dtypes[0], src_area.dtypes[0]
+            proxy_nodata = dst_profile['nodata']
+            # blocks without areas are not written at all: SPARSE_OK leaves them out of the file (they read as
+            # nodata)
+            dst_profile.update(dtype=rasterio.float32, nodata=np.nan, sparse_ok=True,
+                               **_creation_profile('Float32'))
             # number of to process blocks
             nblocks = number_blocks(dst_profile, block_shape)
+            if path_cache is not None:
+                cache = _open_cache(path_cache, 'data', 'area')
 
             # init the output raster file
             with rasterio.open(path_out, 'w', **dst_profile) as dst:
                 # add metadata if needed
-                self.metadata.update_dataset_tags(dst, processing_info, unit_info, path_proxy_raster, path_area_raster)
-
-                # now iterate over the blocks
-                for _, window in block_window_generator(block_shape, dst_profile['height'], dst_profile['width']):
-                    # read data
-                    aProxy = src_proxy.read(1, window=window, masked=True)
-                    aArea = src_area.read(1, window=window)
+                self.metadata.update_dataset_tags(dst, processing_info, unit_info, path_proxy_raster,
+                                                  path_area_raster)
+                write_lock = threading.Lock()
+                buffers = threading.local()  # block buffers of every worker thread
+
+                def process_block(window):
+                    shape = tuple(stop - start for start, stop in window)
+                    aProxy = _thread_buffer(buffers, 'proxy', shape, proxy_dtype)
+                    aArea = _thread_buffer(buffers, 'area', shape, area_dtype)
+                    # read data from the cache, or else from the rasters (every block opens its own datasets, see
+                    # _map_blocks)
+                    if cache:
+                        _read_cached(cache, 'data', window, aProxy)
+                        _read_cached(cache, 'area', window, aArea)
+                    else:
+                        with rasterio.open(path_proxy_raster, sharing=False) as src_proxy, \
+                                rasterio.open(path_area_raster, sharing=False) as src_area:
+                            src_proxy.read(1, window=window, out=aProxy)
+                            src_area.read(1, window=window, out=aArea)
+
+                    # skip empty blocks (aArea.any() needs no boolean temporary)
+                    if not aArea.any():
+                        return
 
                     # init output block
-                    aData = np.full_like(aProxy, dst_profile['nodata'], dtype=dst_profile['dtype'])
+                    aData = _thread_buffer(buffers, 'out', shape, dst_profile['dtype'])
+                    aData.fill(dst_profile['nodata'])
 
-                    # check if empty
-                    if aProxy.mask.all() or (aArea == 0).all():
-                        dst.write(aData, 1, window=window)
-                        add_progress(progress_remain / nblocks)
-                        continue
-                    # reduce workload by only looping over existing areas & ETclasses in the block
-                    lAreas = np.unique(aArea[(aArea != 0) & (~aProxy.mask)]).tolist()
-
-                    # loop over the areas to spatially disaggregate the data to the proxy
-                    for area_name, area_value in area_names.items():
-                        if area_value not in lAreas:
-                            continue
-                        np.multiply(aProxy.data, dis_factor[area_name],
-                                    where=((aArea == area_value) & (~aProxy.mask)), out=aData)
+                    # spatially disaggregate the data to the proxy, with the factor of the area of every pixel
+                    np.multiply(aProxy, _lookup_factors(factor_table, aArea),
+                                where=_valid_mask(aProxy, proxy_nodata), out=aData)
                     # write to disk
-                    dst.write(aData, 1, window=window)
+                    with write_lock:
+                        dst.write(aData, 1, window=window)
+
+                # now process the blocks
+                for _ in _map_blocks(process_block, (window for _, window in block_window_generator(
+                        block_shape, dst_profile['height'], dst_profile['width']))):
                     add_progress(progress_remain / nblocks)  # remaining progress here
+        finally:
+            cache = None  # close the memory maps before their files are removed
+            if path_cache is not None:
+                _remove_files(*(_cache_file(path_cache, name) for name in ('data', 'area')))
         return proxy_sums  # Return proxy_sums so it may be reused by the caller in subsequent disaggregations
 
+    @_with_gdal_env
     def spatial_disaggregation_byArea_byET(self, path_proxy_raster, data, path_area_raster, area_names,
                                            path_ET_raster, ET_names, path_out,
                                            add_progress=lambda p: None, proxy_sums=None,
-                                           processing_info='N/A', unit_info='N/A', block_shape=(2048, 2048)):
+                                           processing_info='N/A', unit_info='N/A', block_shape=(2048, 2048),
+                                           cache_blocks=False):
         """Disaggregate values per region and ecosystem type using a proxy raster, preserving total values.
 
         Given area and ecosystem type rasters, and a table of total values per combination of area and ecosystem type,
@@ -1543,75 +2216,116 @@ class GeoProcessing(object):
         :param proxy_sums: Optional Series of precomputed sum of proxy data per Area and per ET.
         :param processing_info: string describing the processing step (optional)
         :param unit_info: string describing the unit of the spatially disaggregated totals (optional)
-        :param block_shape: tuple (y_size, x_size) for block processing of the statistic extraction (optional)
+        :param block_shape: tuple (y_size, x_size) for block processing of the statistic extraction (optional,
+                            aligned with the block size of the proxy raster)
+        :param cache_blocks: if the proxy sums are computed here, keep a raw (uncompressed) copy of the proxy, area and
+                             ET rasters in the temporary directory meanwhile, so they are not read and decompressed
+                             a second time.  This takes width * height * (size of the three data types) of extra
+                             disk space.
         :return: DataFrame containing sum of proxy values per region and per ecosystem type. Can be reused in subsequent
                  calls to :meth:`spatial_disaggregation_byArea_byET` to save computation effort.
         """
         progress_remain = 100.
-        if proxy_sums is None:
-            # first get the proxy raster value sum of the different areas for which to disaggregate the table data
-            proxy_sums = statistics_byArea_byET(path_proxy_raster, path_area_raster, area_names, path_ET_raster,
-                                                ET_names,
-                                                add_progress=lambda p: add_progress(0.4 * p),  # 40% of progress here
-                                                block_shape=block_shape)[SUM]
-            progress_remain = 60.
-
-        # calculate area-specific contribution factor
-        # Note: proxy_sums has a MultiIndex
-        # TODO make sure all indices from data appear in area_names and ET_names before calling statistics_byArea_byET,
-        #  so proxy_sums exist for every row in data (and the reindex is perhaps not needed here anymore)?
-        #  Take care that area_names and ET_names can be dict (convert to Series first?)!
-        dis_factor = (data / proxy_sums.reindex(data.index)).fillna(0)
-
-        # start processing
-        with rasterio.open(path_proxy_raster) as src_proxy, \
-                rasterio.open(path_area_raster) as src_area, \
-                rasterio.open(path_ET_raster) as src_ET:
-
-            # get info for block processing and output raster file
-            dst_profile = src_proxy.profile
-            dst_profile.update(dtype=rasterio.float32, nodata=np.nan)
+        path_cache = None
+        if proxy_sums is None and cache_blocks:
+            # keep a raw copy of the rasters, so we don't have to read and decompress them a second time
+            path_cache = os.path.join(self.temp_dir, splitext(basename(path_out))[0] + '_blocks')
+        cache = {}
+        try:
+            if proxy_sums is None:
+                # first get the proxy raster value sum of the different areas for which to disaggregate the table
+                # data (and fill the cache, if any)
+                proxy_sums = statistics_byArea_byET(path_proxy_raster, path_area_raster, area_names, path_ET_raster,
+                                                    ET_names,
+                                                    add_progress=lambda p: add_progress(0.4 * p),  # 40% of progress
+                                                    block_shape=block_shape, path_cache=path_cache)[SUM]
+                progress_remain = 60.
+
+            # calculate area-specific contribution factor
+            # Note: proxy_sums has a MultiIndex
+            # TODO make sure all indices from data appear in area_names and ET_names before calling
+            #  statistics_byArea_byET, so proxy_sums exist for every row in data (and the reindex is perhaps not needed
+            #  here anymore)?
+            #  Take care that area_names and ET_names can be dict (convert to Series first?)!
+            dis_factor = (data / proxy_sums.reindex(data.index)).fillna(0)
+            # lookup table from (area, ET class) raster values to factor, pixels outside of the areas (incl. area 0)
+            # or the ET classes stay nodata
+            areas = pd.Series(dict(area_names.items()), dtype=np.int64)
+            areas = areas[areas != 0]
+            ETs = pd.Series(dict(ET_names.items()), dtype=np.int64)
+            combinations = pd.MultiIndex.from_product([areas.index, ETs.index])
+            factor_table = _factor_table(dis_factor.reindex(combinations).to_numpy(),
+                                         np.repeat(areas.to_numpy(), len(ETs)),
+                                         np.tile(ETs.to_numpy(), len(areas)))
+
+            # start processing
+            with rasterio.open(path_proxy_raster) as src_proxy, rasterio.open(path_area_raster) as src_area, \
+                    rasterio.open(path_ET_raster) as src_ET:
+                # get info for block processing and output raster file
+                dst_profile = src_proxy.profile
+                block_shape = _align_block_shape(block_shape, src_proxy.block_shapes[0])
+                proxy_dtype, area_dtype, ET_dtype = src_proxy.dtypes[0], src_area.dtypes[0], src_ET.dtypes[0]
+            proxy_nodata = dst_profile['nodata']
+            # blocks without areas are not written at all: SPARSE_OK leaves them out of the file (they read as
+            # nodata)
+            dst_profile.update(dtype=rasterio.float32, nodata=np.nan, sparse_ok=True,
+                               **_creation_profile('Float32'))
             # number of to process blocks
             nblocks = number_blocks(dst_profile, block_shape)
+            if path_cache is not None:
+                cache = _open_cache(path_cache, 'data', 'area', 'ET')
 
             # init the output raster file
             with rasterio.open(path_out, 'w', **dst_profile) as dst:
                 # add metadata if needed
                 self.metadata.update_dataset_tags(dst, processing_info, unit_info,
                                                   path_proxy_raster, path_area_raster, path_ET_raster)
-
-                # now iterate over the blocks
-                for _, window in block_window_generator(block_shape, dst_profile['height'], dst_profile['width']):
-                    # read data
-                    aProxy = src_proxy.read(1, window=window, masked=True)
-                    aArea = src_area.read(1, window=window)
-                    aET = src_ET.read(1, window=window)
+                write_lock = threading.Lock()
+                buffers = threading.local()  # block buffers of every worker thread
+
+                def process_block(window):
+                    shape = tuple(stop - start for start, stop in window)
+                    aProxy = _thread_buffer(buffers, 'proxy', shape, proxy_dtype)
+                    aArea = _thread_buffer(buffers, 'area', shape, area_dtype)
+                    aET = _thread_buffer(buffers, 'ET', shape, ET_dtype)
+                    # read data from the cache, or else from the rasters (every block opens its own datasets, see
+                    # _map_blocks)
+                    if cache:
+                        _read_cached(cache, 'data', window, aProxy)
+                        _read_cached(cache, 'area', window, aArea)
+                        _read_cached(cache, 'ET', window, aET)
+                    else:
+                        with rasterio.open(path_proxy_raster, sharing=False) as src_proxy, \
+                                rasterio.open(path_area_raster, sharing=False) as src_area, \
+                                rasterio.open(path_ET_raster, sharing=False) as src_ET:
+                            src_proxy.read(1, window=window, out=aProxy)
+                            src_area.read(1, window=window, out=aArea)
+                            src_ET.read(1, window=window, out=aET)
+
+                    # skip empty blocks (aArea.any() needs no boolean temporary)
+                    if not aArea.any():
+                        return
 
                     # init output block
-                    aData = np.full_like(aProxy, dst_profile['nodata'], dtype=dst_profile['dtype'])
+                    aData = _thread_buffer(buffers, 'out', shape, dst_profile['dtype'])
+                    aData.fill(dst_profile['nodata'])
 
-                    # check if empty
-                    if aProxy.mask.all() or (aArea == 0).all():
-                        dst.write(aData, 1, window=window)
-                        add_progress(progress_remain / nblocks)
-                        continue
-                    # reduce workload by only looping over existing areas & ETclasses in the block
-                    lAreas = np.unique(aArea[(aArea != 0) & (~aProxy.mask)]).tolist()
-                    lET = np.unique(aET[(aArea != 0) & (~aProxy.mask)]).tolist()
-
-                    # loop over the areas & ETclasses to spatially disaggregate the data to the proxy
-                    for area_name, area_value in area_names.items():
-                        if area_value not in lAreas:
-                            continue
-                        for eco_type, eco_id in ET_names.items():
-                            if eco_id not in lET:
-                                continue
-                            np.multiply(aProxy.data, dis_factor[area_name, eco_type],
-                                        where=((aArea == area_value) & (aET == eco_id) & (~aProxy.mask)),
-                                        out=aData)
+                    # spatially disaggregate the data to the proxy, with the factor of the area & ETclass of every
+                    # pixel
+                    np.multiply(aProxy, _lookup_factors(factor_table, aArea, aET),
+                                where=_valid_mask(aProxy, proxy_nodata), out=aData)
                     # write to disk
-                    dst.write(aData, 1, window=window)
+                    with write_lock:
+                        dst.write(aData, 1, window=window)
+
+                # now process the blocks
+                for _ in _map_blocks(process_block, (window for _, window in block_window_generator(
+                        block_shape, dst_profile['height'], dst_profile['width']))):
                     add_progress(progress_remain / nblocks)  # 60% of progress here
+        finally:
+            cache = None  # close the memory maps before their files are removed
+            if path_cache is not None:
+                _remove_files(*(_cache_file(path_cache, name) for name in ('data', 'area', 'ET')))
         return proxy_sums  # For optional reuse by the caller in subsequent disaggregations
 
 
@@ -1654,8 +2368,9 @@ def Bring2COG():
     pass
 
 
+@_with_default_gdal_env
 def statistics_byArea(path_data_raster, path_area_raster, area_names, transform=None,
-                      add_progress=lambda p: None, block_shape=(2048, 2048)):
+                      add_progress=lambda p: None, block_shape=(2048, 2048), path_cache=None, max_workers=None):
     """Extract sum and count statistics for all areas given in the area_raster for the data_raster.
 
     Note: currently only works correctly for raster with absolute data values (relative datasets would need unit and
@@ -1667,55 +2382,93 @@ def statistics_byArea(path_data_raster, path_area_raster, area_names, transform=
                        value = raster value)
     :param transform: Optional single-argument function to transform the data by.
     :param add_progress: callback function to update progress bar.
-    :param block_shape: tuple (y_size, x_size) for block processing of the statistic extraction (optional)
+    :param block_shape: tuple (y_size, x_size) for block processing of the statistic extraction (optional, aligned
+                        with the block size of the data raster)
+    :param path_cache: Optional path prefix for a raw copy of the data and area rasters (see :func:`_create_cache`),
+                       for a subsequent pass over the same rasters.
+    :param max_workers: number of worker threads for the blocks (default: number of CPUs)
     :return: pandas dataframe with area codes as index and columns for raster value sum and raster pixel count
     """
     # convert area_names to DataFrame, indexed by SHAPE_ID
     area_names = pd.DataFrame(area_names.items(), columns=[GEO_ID, SHAPE_ID]).set_index(SHAPE_ID)
 
-    # ini pandas DataFrame to hold the results
-    df = pd.DataFrame(0., index=area_names.index, columns=[SUM, COUNT], dtype=float)
-    df.index.name = SHAPE_ID
+    # ini running sums and counts, indexed by area raster value (see _value_bins)
+    area_offset, area_size = _value_bins(area_names.index)
+    sums = np.zeros(area_size)
+    counts = np.zeros(area_size)
 
-    with rasterio.open(path_data_raster) as src_data, \
-            rasterio.open(path_area_raster) as src_area:
+    with rasterio.open(path_data_raster) as src_data, rasterio.open(path_area_raster) as src_area:
         # extract raster info for progress bar
         src_profile = src_data.profile
-        # number of to process blocks
-        nblocks = number_blocks(src_profile, block_shape)
-
-        # now iterate over the blocks of src files and process
-        for _, window in block_window_generator(block_shape, src_profile['height'], src_profile['width']):
-            # read data; convert to float to avoid overflow when original data is an integer type
-            aData = src_data.read(1, window=window, masked=True).astype(float)
-            aArea = src_area.read(1, window=window)
-
-            # create valid data mask
-            mValid = (aArea != src_area.nodata) & (~aData.mask)
-            # check if all is empty
-            if (~mValid).all():
-                add_progress(100. / nblocks)
-                continue
-
-            if transform:
-                aData = transform(aData)
-            # bring valid data into DataFrame
-            df_window = pd.DataFrame({SHAPE_ID: aArea[mValid].flatten(), SUM: aData[mValid].data.flatten(), COUNT: 1})
-            # add block data to master DataFrame
-            df = df.add(df_window.groupby(SHAPE_ID).sum(), fill_value=0.)
+        block_shape = _align_block_shape(block_shape, src_data.block_shapes[0])
+        cache = _create_cache(path_cache, data=src_data, area=src_area)
+        # np.bincount sums in float64 anyway, so we can read the data in its own type, unless we transform it (an
+        # integer type could overflow)
+        data_dtype = np.float64 if transform else src_data.dtypes[0]
+    # number of to process blocks
+    nblocks = number_blocks(src_profile, block_shape)
+
+    buffers = threading.local()  # block buffers of every worker thread
+
+    def block_statistics(window):
+        shape = tuple(stop - start for start, stop in window)
+        # read data (every block opens its own datasets, see _map_blocks)
+        with rasterio.open(path_data_raster, sharing=False) as src_data, \
+                rasterio.open(path_area_raster, sharing=False) as src_area:
+            aData = src_data.read(1, window=window, out=_thread_buffer(buffers, 'data', shape, data_dtype))
+            aArea = src_area.read(1, window=window, out=_thread_buffer(buffers, 'area', shape, src_area.dtypes[0]))
+            data_nodata, area_nodata = src_data.nodata, src_area.nodata
+        _write_cached(cache, 'data', window, aData)
+        _write_cached(cache, 'area', window, aArea)
+
+        # create valid data mask (combined in place, to avoid temporary blocks)
+        mValid = _valid_mask(aData, data_nodata)
+        mValid &= _valid_mask(aArea, area_nodata)
+        nvalid = np.count_nonzero(mValid)
+        # check if all is empty
+        if not nvalid:
+            return None
+
+        if transform:
+            aData = np.ma.getdata(transform(np.ma.masked_array(aData, ~mValid)))
+        # sum and count of the valid pixels per area, in a single pass over the block: rather than selecting the valid
+        # pixels first, the invalid ones are counted in an extra bin, which is dropped
+        area_bins = aArea.astype(np.intp)
+        area_bins -= area_offset
+        np.putmask(area_bins, ~mValid, area_size)
+        area_bins = area_bins.ravel()
+        if area_bins.min() < 0:
+            raise Error(_REGION_MISMATCH)
+        counts = np.bincount(area_bins, minlength=area_size + 1)
+        if counts.size > area_size + 1 or counts[area_size] != area_bins.size - nvalid:
+            raise Error(_REGION_MISMATCH)
+        return (np.bincount(area_bins, weights=aData.ravel(), minlength=area_size + 1)[:area_size],
+                counts[:area_size])
+
+    # now process the blocks of src files, and add up their statistics
+    try:
+        for block_result in _map_blocks(block_statistics, (window for _, window in block_window_generator(
+                block_shape, src_profile['height'], src_profile['width'])), max_workers):
+            if block_result is not None:
+                sums += block_result[0]
+                counts += block_result[1]
             add_progress(100. / nblocks)
+    finally:
+        cache = None  # flush and close the memory maps of the cache
 
     # If the SHAPE_ID index values do not agree, the rasterized shapefile doesn't match the currently selected regions.
-    if not df.index.isin(area_names.index).all():
-        raise Error('Mismatch between selected regions and rasterized regions shapefile.  '
-                    'This may happen when continuing from a previous run with different settings.')
+    area_bins = area_names.index.to_numpy(dtype=np.intp) - area_offset
+    if np.delete(counts, area_bins).any():
+        raise Error(_REGION_MISMATCH)
 
+    df = pd.DataFrame({SUM: sums[area_bins], COUNT: counts[area_bins]}, index=area_names.index).sort_index()
     return df.join(area_names).set_index(GEO_ID)
 
 
+@_with_default_gdal_env
 def statistics_byArea_byET(path_data_raster, path_area_raster, area_names, path_ET_raster, ET_names,
                            add_progress=lambda p: None,
-                           block_shape=(2048, 2048)):
+                           block_shape=(2048, 2048), path_cache=None, max_workers=None):
     """Extract sum and count statistics for per area and per ecosystem type.
 
     Note: currently only works correctly for raster with absolute data values (relative datasets would need
@@ -1729,7 +2482,11 @@ def statistics_byArea_byET(path_data_raster, path_area_raster, area_names, path_
     :param ET_names: dict  or Series mapping raster value to ecosystem types (key/index = clear name/ecosystem type,
                      value = raster value)
     :param add_progress: callback function to update progress bar.
-    :param block_shape: tuple (y_size, x_size) for block processing of the statistic extraction (optional)
+    :param block_shape: tuple (y_size, x_size) for block processing of the statistic extraction (optional, aligned
+                        with the block size of the data raster)
+    :param path_cache: Optional path prefix for a raw copy of the data, area and ET rasters (see
+                       :func:`_create_cache`), for a subsequent pass over the same rasters.
+    :param max_workers: number of worker threads for the blocks (default: number of CPUs)
     :return: pandas dataframe with area codes and ET class as multi-index and columns for raster value sum and
              raster pixel count
     """
@@ -1737,47 +2494,145 @@ def statistics_byArea_byET(path_data_raster, path_area_raster, area_names, path_
     area_names = pd.DataFrame(area_names.items(), columns=[GEO_ID, SHAPE_ID]).set_index(SHAPE_ID)
     ET_names = pd.DataFrame(ET_names.items(), columns=[ECOTYPE, ECO_ID]).set_index(ECO_ID)
 
-    # ini pandas DataFrame to hold the results
-    index = pd.MultiIndex.from_product([area_names.index, ET_names.index], names=[SHAPE_ID, ECO_ID])
-    df = pd.DataFrame(0., index=index, columns=[SUM, COUNT], dtype=float)
+    # ini running sums and counts, indexed by area and ET class raster value (see _value_bins)
+    area_offset, area_size = _value_bins(area_names.index)
+    ET_offset, ET_size = _value_bins(ET_names.index)
+    sums = np.zeros((area_size, ET_size))
+    counts = np.zeros((area_size, ET_size))
 
-    with rasterio.open(path_data_raster) as src_data, \
-            rasterio.open(path_area_raster) as src_area, \
+    with rasterio.open(path_data_raster) as src_data, rasterio.open(path_area_raster) as src_area, \
             rasterio.open(path_ET_raster) as src_ET:
         # extract raster info for progress bar
         src_profile = src_data.profile
-        # number of to process blocks
-        nblocks = number_blocks(src_profile, block_shape)
-
-        # now iterate over the blocks of src files and process
-        for _, window in block_window_generator(block_shape, src_profile['height'], src_profile['width']):
-            # read data
-            aData = src_data.read(1, window=window, masked=True).astype(float)
-            aArea = src_area.read(1, window=window)
-            aET = src_ET.read(1, window=window)
-
-            # create valid data mask
-            mValid = (aArea != src_area.nodata) & (~aData.mask) & (aET != src_ET.nodata)
-            # check if all is empty
-            if (~mValid).all():
-                add_progress(100. / nblocks)
-                continue
-
-            # bring valid data into DataFrame
-            df_window = pd.DataFrame({SHAPE_ID: aArea[mValid].flatten(), ECO_ID: aET[mValid].flatten(),
-                                      SUM: aData[mValid].data.flatten(), COUNT: 1})
-            # add block data to master DataFrame
-            df = df.add(df_window.groupby([SHAPE_ID, ECO_ID]).sum(), fill_value=0.)
+        block_shape = _align_block_shape(block_shape, src_data.block_shapes[0])
+        cache = _create_cache(path_cache, data=src_data, area=src_area, ET=src_ET)
+        data_dtype = src_data.dtypes[0]  # np.bincount sums in float64, no need to convert the data first
+    # number of to process blocks
+    nblocks = number_blocks(src_profile, block_shape)
+
+    buffers = threading.local()  # block buffers of every worker thread
+
+    def block_statistics(window):
+        shape = tuple(stop - start for start, stop in window)
+        # read data (every block opens its own datasets, see _map_blocks)
+        with rasterio.open(path_data_raster, sharing=False) as src_data, \
+                rasterio.open(path_area_raster, sharing=False) as src_area, \
+                rasterio.open(path_ET_raster, sharing=False) as src_ET:
+            aData = src_data.read(1, window=window, out=_thread_buffer(buffers, 'data', shape, data_dtype))
+            aArea = src_area.read(1, window=window, out=_thread_buffer(buffers, 'area', shape, src_area.dtypes[0]))
+            aET = src_ET.read(1, window=window, out=_thread_buffer(buffers, 'ET', shape, src_ET.dtypes[0]))
+            data_nodata, area_nodata, ET_nodata = src_data.nodata, src_area.nodata, src_ET.nodata
+        _write_cached(cache, 'data', window, aData)
+        _write_cached(cache, 'area', window, aArea)
+        _write_cached(cache, 'ET', window, aET)
+
+        # create valid data mask (combined in place, to avoid temporary blocks)
+        mValid = _valid_mask(aData, data_nodata)
+        mValid &= _valid_mask(aArea, area_nodata)
+        mValid &= _valid_mask(aET, ET_nodata)
+        # check if all is empty
+        if not mValid.any():
+            return None
+
+        # sum and count of the valid pixels per area & ET class, in a single pass over the block: rather than selecting
+        # the valid pixels first, the invalid ones are counted in an extra bin, which is dropped
+        area_bins = aArea.astype(np.intp)
+        area_bins -= area_offset
+        np.putmask(area_bins, ~mValid, 0)
+        if area_bins.min() < 0 or area_bins.max() >= area_size:
+            raise Error(_REGION_MISMATCH)
+        ET_bins = aET.astype(np.intp)
+        ET_bins -= ET_offset
+        # ET classes outside of the range of ET_names (rare) are summed separately, see below
+        mOther = (ET_bins < 0) | (ET_bins >= ET_size)
+        mOther &= mValid
+        other = None
+        if mOther.any():
+            mValid &= ~mOther
+            other = pd.DataFrame({SHAPE_ID: aArea[mOther].astype(np.int64), ECO_ID: aET[mOther].astype(np.int64),
+                                  SUM: aData[mOther].astype(np.float64), COUNT: 1.}).groupby([SHAPE_ID, ECO_ID]).sum()
+        bins = np.ravel_multi_index((area_bins, ET_bins), sums.shape, mode='clip')
+        np.putmask(bins, ~mValid, sums.size)
+        bins = bins.ravel()
+        return (np.bincount(bins, weights=aData.ravel(), minlength=sums.size + 1)[:-1].reshape(sums.shape),
+                np.bincount(bins, minlength=counts.size + 1)[:-1].reshape(counts.shape),
+                other)
+
+    # now process the blocks of src files, and add up their statistics
+    others = []  # statistics of the ET classes outside of the range of ET_names
+    try:
+        for block_result in _map_blocks(block_statistics, (window for _, window in block_window_generator(
+                block_shape, src_profile['height'], src_profile['width'])), max_workers):
+            if block_result is not None:
+                sums += block_result[0]
+                counts += block_result[1]
+                if block_result[2] is not None:
+                    others.append(block_result[2])
             add_progress(100. / nblocks)
+    finally:
+        cache = None  # flush and close the memory maps of the cache
 
     # If the SHAPE_ID index values do not agree, the rasterized shapefile doesn't match the currently selected regions:
-    if not df.index.get_level_values(SHAPE_ID).isin(area_names.index).all():
-        raise Error('Mismatch between selected regions and rasterized regions shapefile.  '
-                    'This may happen when continuing from a previous run with different settings.')
+    area_bins = area_names.index.to_numpy(dtype=np.intp) - area_offset
+    if np.delete(counts, area_bins, axis=0).any() or any(
+            not other.index.get_level_values(SHAPE_ID).isin(area_names.index).all() for other in others):
+        raise Error(_REGION_MISMATCH)
 
+    ET_bins = ET_names.index.to_numpy(dtype=np.intp) - ET_offset
+    index = pd.MultiIndex.from_product([area_names.index, ET_names.index], names=[SHAPE_ID, ECO_ID])
+    bins = np.ix_(area_bins, ET_bins)
+    df = pd.DataFrame({SUM: sums[bins].ravel(), COUNT: counts[bins].ravel()}, index=index)
+
+    # Pixels of ET classes which are not in ET_names are still part of the statistics of their area: they get rows of
+    # their own, with a NaN ecotype.
+    counts[:, ET_bins] = 0
+    area_idx, ET_idx = np.nonzero(counts)
+    others.append(pd.DataFrame({SUM: sums[area_idx, ET_idx], COUNT: counts[area_idx, ET_idx]},
+                               index=pd.MultiIndex.from_arrays([area_idx + area_offset, ET_idx + ET_offset],
+                                                               names=[SHAPE_ID, ECO_ID])))
+    df = pd.concat([df, pd.concat(others).groupby([SHAPE_ID, ECO_ID]).sum()]).sort_index()
     return df.join(area_names).join(ET_names).set_index([GEO_ID, ECOTYPE])
 
 
+def _map_blocks(function, blocks, max_workers=None):
+    """Apply ``function`` to every block in a pool of worker threads, and yield the results as they are completed.
+
+    GDAL and numpy release the GIL, so reading, processing and writing of different blocks overlap.  Only twice as
+    many blocks as there are workers are submitted at any time, so we don't hold many blocks in memory.
+
+    Note: rasterio datasets can not be shared between threads, so ``function`` has to open its own datasets (with
+    ``sharing=False``, to stay out of GDAL's shared dataset pool), and serialize writes to a shared output dataset.
+    :class:`rasterio.Env` settings are per thread, so every worker runs ``function`` in a :class:`rasterio.Env` with the
+    options of the calling thread's environment.
+
+    :param function: single-argument function to process one block
+    :param blocks: iterable of arguments for ``function``, e.g. block windows
+    :param max_workers: number of worker threads, by default the number of CPUs
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    gdal_options = rasterio.env.getenv() if rasterio.env.hasenv() else {}
+
+    def run_block(block):
+        with rasterio.Env(**gdal_options):
+            return function(block)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        try:
+            for block in blocks:
+                if len(pending) >= 2 * max_workers:
+                    done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()  # raise errors as soon as they occur
+                pending.add(executor.submit(run_block, block))
+            for future in concurrent.futures.as_completed(pending):
+                yield future.result()
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+
+
 def block_window_generator(block_shapes, img_height, img_width):
     """Return an iterator over a band's block windows and their indexes.
 
@@ -1791,7 +2646,8 @@ def block_window_generator(block_shapes, img_height, img_width):
     and is similar to Python's ``enumerate()`` in that it also returns
     indexes.
     Main change to default rasterio function is that you can define
-    your own block_shape!!!
+    your own block_shape!!!  Blocks which are larger than the native blocks (tiles or strips) of a raster, and aligned
+    with them (see :func:`_align_block_shape`), still only decompress every native block once.
     """
     # get block_height and block_width separately
     block_h, block_w = block_shapes
@@ -1825,6 +2681,102 @@ def number_blocks(profile, block_shape):
     return math.ceil(profile['height'] * 1.0 / block_shape[0]) * math.ceil(profile['width'] * 1.0 / block_shape[1])
 
 
+def _align_block_shape(block_shape, native_shape):
+    """Align a block shape for block processing with the native blocks (tiles or strips) of a raster.
+
+    Blocks which cut through native blocks make GDAL decompress those native blocks more than once.  The width is
+    rounded to a multiple of the native block width, and the height is chosen such that a block still holds about as
+    many pixels as requested (so blocks of striped rasters span the full width, but fewer rows).
+
+    :param block_shape: tuple (y_size, x_size) of the requested block size
+    :param native_shape: tuple (y_size, x_size) of the native block size, e.g. ``src.block_shapes[0]``
+    :return: tuple (y_size, x_size) of the aligned block size
+    """
+    native_height, native_width = native_shape
+    width = max(1, round(block_shape[1] / native_width)) * native_width
+    height = max(1, round(block_shape[0] * block_shape[1] / (width * native_height))) * native_height
+    if (height, width) != tuple(block_shape):
+        logger.debug('Aligned block shape %s to native block shape %s: %s', block_shape, native_shape, (height, width))
+    return height, width
+
+
+def load_profile(raster_path):
+    """Extract key variables of the given raster file.
+
+    Results are cached by (absolute) path, modification time and size of the file, so the header of a raster file is
+    only read once as long as it is not modified, no matter how the path is spelled.
+
+    :param raster_path: file path to raster file for which to extract the profile
+    :return: dictionary containing the key raster profile parameters
+    """
+    try:
+        stat = os.stat(raster_path)
+    except OSError:  # not a regular file (e.g. a GDAL virtual file system path): don't cache
+        return _read_profile(raster_path)
+    dFile = dict(_read_profile_cached(os.path.abspath(raster_path), stat.st_mtime_ns, stat.st_size))
+    # the profile dict is sometimes modified by the caller
+    dFile['profile'] = dFile['profile'].copy()
+    return dFile
+
+
+@functools.lru_cache(maxsize=256)
+def _read_profile_cached(raster_path, mtime, size):
+    """Cached version of :func:`_read_profile`, the modification time and size are only part of the cache key."""
+    return _read_profile(raster_path)
+
+
+def _read_profile(raster_path):
+    """Read the key variables of a raster file, see :func:`load_profile`."""
+    dFile = {}
+    dFile['overwrite_s_srs'] = False  # flag that EPSG code of raster file was not valid and extracted from WKT
+    try:
+        with rasterio.open(raster_path) as src:
+            # EPSG
+            if src.crs.is_epsg_code:
+                dFile['epsg'] = src.crs.to_epsg()
+            else:
+                # we have no EPSG or the VRT problem which shows only the WKT instead of the EPSG code
+                dFile['epsg'] = 'no_epsg_code'
+                # check if we have a know wkt and can overwrite to the right epsg integer number
+                for key, value in DIC_KNOWN_WKT_STRINGS.items():
+                    if key in src.crs.wkt:
+                        dFile['epsg'] = value
+                        # flag that s_srs is overwritten
+                        dFile['overwrite_s_srs'] = True
+                        break
+            # raster extent
+            dFile['bbox'] = src.bounds
+            # resolution tuple
+            dFile['res'] = src.res
+            # datatype
+            dFile['dtype'] = src.dtypes[0]
+            # raster profile
+            dFile['profile'] = src.profile
+            # raster height and width
+            dFile['width'] = src.width
+            dFile['height'] = src.height
+            # nodata value
+            dFile['nodata'] = src.nodata
+            # dataset name
+            dFile['name'] = src.name
+            # dataset file tags (no band tags)
+            dFile['tags'] = src.tags()
+            # pixel area in square metre
+            if src.crs.is_projected:
+                dFile['px_area_m2'] = pixel_area(src.crs, src.transform)
+                _, dFile['unit_factor'] = src.crs.linear_units_factor
+            else:
+                dFile['px_area_m2'] = None
+                dFile['unit_factor'] = None
+            # projected and units
+            dFile['projected'] = src.crs.is_projected
+            dFile['geographic'] = src.crs.is_geographic
+            dFile['unit'] = src.crs.linear_units
+    except rasterio.errors.RasterioIOError as e:
+        raise Error(f'Failed to open raster file "{raster_path}": {e}')
+    return dFile
+
+
 def pixel_area(crs: rasterio.crs.CRS, transform: affine.Affine):
     """Calculate the area of a pixel in units of m2."""
     affine_area = abs(transform.a * transform.e - transform.b * transform.d)
@@ -1849,17 +2801,20 @@ def coord_2_index(x, y, raster_x_min, raster_y_max, pixres, raster_x_max=None, r
 
     .. note::
         output tuple is directly in numpy indexing order (row, column).
+
+    .. note::
+        x and y can also be arrays of coordinates, which are converted in one go (the indices are then arrays too).
     """
-    index_column = int((x - raster_x_min) / float(pixres[0]))
-    index_row = int((y - raster_y_max) / float(-pixres[1]))
-
-    if (raster_x_max is None) or (raster_y_min is None):
-        return index_row, index_column
-    else:
-        if (raster_y_min < y <= raster_y_max) and (raster_x_min <= x < raster_x_max):
-            return index_row, index_column
-        else:
+    x, y = np.asarray(x), np.asarray(y)
+    index_column = ((x - raster_x_min) / float(pixres[0])).astype(np.int64)
+    index_row = ((y - raster_y_max) / float(-pixres[1])).astype(np.int64)
+
+    if (raster_x_max is not None) and (raster_y_min is not None):
+        if not np.all((raster_y_min < y) & (y <= raster_y_max) & (raster_x_min <= x) & (x < raster_x_max)):
             raise ValueError("The given coordinate is outside the dataset")
+    if index_row.ndim == 0 and index_column.ndim == 0:
+        return int(index_row), int(index_column)
+    return index_row, index_column
 
 
 def average_rasters(output_file, *rasters, block_shape=(1024, 1024), **profile_args):
@@ -1902,6 +2857,9 @@ def sum_rasters(output_file, *rasters,
 
 #Might be interesting to move to Geoprocessing Class
 def GSM(nosm, sm, gaussian_sigma, gaussian_kernel_radius, block_shape=(2048, 2048)):
+    # scipy.ndimage is only needed here, and importing it is a large part of the import time of this module
+    from scipy.ndimage import correlate
+
     # create kernel
     radius = gaussian_kernel_radius
     y, x = np.ogrid[-radius: radius + 1, -radius: radius + 1]
@@ -1960,6 +2918,8 @@ def adding_stats(rasters, shapes, outname, stats):
     outname: name of the output file
     stats: list of statistics to process
     '''
+    import rasterio.mask
+
     gdf = gpd.read_file(shapes).sort_index()
     new_column = []
     for raster in rasters:
@@ -1967,7 +2927,7 @@ def adding_stats(rasters, shapes, outname, stats):
             for atuple in gdf.itertuples():
                 try:
                     value, _ = rasterio.mask.mask(ds, [atuple.geometry], crop=True, indexes=1)
-                except Exception:
+                except (ValueError, rasterio.errors.WindowError):
                     logger.exception("Something went wrong with the masking, "
                                      "could be due to shapes falling outside raster")
                     value = ds.nodata
@@ -1,17 +1,27 @@
 """Base implementation of a run."""
 
-import glob
+import collections
+import concurrent.futures
+import copy
+import importlib.util
 import logging
-import math
 import os
+import threading
+import time
 
 import geopandas as gpd
+import numpy as np
+import pyogrio
+import pyproj
 import rasterio
+import shapely
 import yaml
 
-from .config_check import ConfigError, ConfigCheck, ConfigRaster, ConfigRasterDir
+from .config_check import (ConfigError, ConfigCheck, ConfigItem, ConfigRaster, ConfigRasterDir, check_positive_int,
+                           list_rasters)
 from .errors import Error
-from .geoprocessing import SHAPE_ID, MINIMUM_RESOLUTION, POLY_MIN_SIZE, GeoProcessing
+from .geoprocessing import (SHAPE_ID, MINIMUM_RESOLUTION, POLY_MIN_SIZE, GeoProcessing, block_window_generator,
+                            load_profile)
 
 logger = logging.getLogger(__name__)
 _log_format = logging.Formatter('%(asctime)s %(name)s [%(levelname)s] - %(message)s')
@@ -26,6 +36,17 @@ _STATISTICS_SHAPE = 'statistics_shape'
 _REPORTING_SHAPE = 'reporting_shape'
 _DEFLATOR = 'deflator'
 
+_PROGRESS_INTERVAL = 0.1  # minimum time in seconds between progress callbacks during the pre-run phase
+_PROGRESS_UNITS = 1000000  # progress is counted as an integer number of 1 / _PROGRESS_UNITS percent
+
+# Use the libyaml based loader and dumper when available, they are much faster than the pure Python versions.
+_YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+_YamlDumper = getattr(yaml, 'CDumper', yaml.Dumper)
+# Let pyogrio read vector files through Arrow buffers if pyarrow is installed.
+_READ_FILE_OPTIONS = dict(engine='pyogrio', use_arrow=importlib.util.find_spec('pyarrow') is not None)
+_YAML_CACHE_SIZE = 100
+_yaml_cache = collections.OrderedDict()  # LRU cache of parsed YAML files: {path: (mtime, size, content)}
+
 
 def set_up_console_logging(root_logger, verbose=False):
     """Install a log handler that prints to the terminal."""
@@ -66,6 +87,48 @@ def get_logfile():
     return _logfile
 
 
+def load_yaml(path):
+    """Load a YAML file, using a cache keyed by the modification time and size of the file.
+
+    Returns a deep copy of the parsed content, so the caller may modify the result.
+
+    :param path: Path of the YAML file.
+    """
+    key = os.path.abspath(path)
+    stat = os.stat(key)
+    entry = _yaml_cache.get(key)
+    if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+        _yaml_cache.move_to_end(key)
+    else:
+        with open(key) as f:
+            entry = (stat.st_mtime_ns, stat.st_size, yaml.load(f, Loader=_YamlLoader))
+        _yaml_cache[key] = entry
+        if len(_yaml_cache) > _YAML_CACHE_SIZE:
+            _yaml_cache.popitem(last=False)
+    return copy.deepcopy(entry[2])
+
+
+def _snap_bounds(bounds, res=MINIMUM_RESOLUTION):
+    """Return the smallest bounding box containing ``bounds`` with all edges at a multiple of ``res``.
+
+    :param bounds: Array (minx, miny, maxx, maxy), as returned by :attr:`geopandas.GeoDataFrame.total_bounds`.
+    :param res: Resolution to align to.
+    :return: :class:`rasterio.coords.BoundingBox`
+    """
+    bounds = np.asarray(bounds) / res
+    return rasterio.coords.BoundingBox(*(np.concatenate([np.floor(bounds[:2]), np.ceil(bounds[2:])]) * res).tolist())
+
+
+def _shape_ids(n):
+    """Return the SHAPE_ID values 1, ..., n for n shapes, using the narrowest integer dtype which fits."""
+    return np.arange(1, n + 1, dtype=np.uint16 if n < 65535 else np.int32)
+
+
+def _shape_id_dtype(n):
+    """Return the narrowest unsigned integer type (GDAL data type name) which holds the SHAPE_IDs of n shapes."""
+    return 'Byte' if n <= 255 else 'UInt16' if n <= 65535 else 'UInt32'
+
+
 class Cancelled(Exception):
     """Custom Exception to signal cancellation of a Run.
 
@@ -86,6 +149,13 @@ class Run:
     id_col_reporting = None  #: Column name to use as index in reporting region file.
     component = None  #: Name of module / component, to be set in subclasses.
     software_name = 'NCA Framework'
+    #: GDAL configuration options used while rasterizing region shapes and adjusting input rasters: on top of the
+    #: :class:`.geoprocessing.GeoProcessing` options, a larger swath size and VSI curl chunks.  Subclasses can tune
+    #: these.
+    gdal_env_options = dict(GeoProcessing.gdal_env_options,
+                            GDAL_SWATH_SIZE=67108864,
+                            CPL_VSIL_CURL_CHUNK_SIZE=1048576,
+                            GDAL_TIFF_OVR_BLOCKSIZE=256)
 
     def __init__(self, config):
         """Initialize a run from a config dict.
@@ -95,6 +165,8 @@ class Run:
         """
         logger.debug('Run.__init__')
         self.config_template = {
+            'max_workers': ConfigItem(check_positive_int, optional=True,
+                                      description='Maximum number of worker threads, by default the number of CPUs.'),
         }  #: Dictionary of :obj:`.config_check.ConfigItem` describing the required configuration for this run.
 
         # If running from command line, config contains a 'func' attribute used to select the run type (side effect of
@@ -113,9 +185,11 @@ class Run:
         self.output_dir = self.config['output_dir']
         self.run_dir = os.path.join(self.output_dir, self.run_name)
 
-        self._progress = 0.
+        self._progress = 0  #: Total progress, as an integer number of 1 / _PROGRESS_UNITS percent.
         self._progress_callback = None  #: Callback function to report progress to QGIS.
         self._progress_weight_run = 0.85  #: Proportion of the progress bar used for the run itself.
+        self._progress_lock = threading.Lock()  #: Protects progress updates coming from worker threads.
+        self._last_progress_callback = 0.  #: time.monotonic() of the last pre-run progress callback.
         self.root_logger = logger  #: root logger for Run log file.  Can be overridden in subclass
 
     def start(self, progress_callback=None):
@@ -133,12 +207,14 @@ class Run:
             set_up_logfile(self.run_dir, self.root_logger, self.config.get('verbose', False))
         logger.info(self.version_info())
 
-        # dump config as provided by user, so we can see exactly what the input was when we want to debug
-        self._dump_config()
+        # dump config as provided by user, so we can see exactly what the input was when we want to debug.  The dump is
+        # written in the background while we continue, from a snapshot because _configure() modifies self.config.
+        dump_thread = threading.Thread(target=self._dump_config, args=(copy.deepcopy(self.config),))
+        dump_thread.start()
 
         try:
             self._configure()
-            self._progress = 100. * (1. - self._progress_weight_run)
+            self._progress = round(100. * (1. - self._progress_weight_run) * _PROGRESS_UNITS)
             self._start()
         except Cancelled:
             logger.exception('Run canceled.')
@@ -146,6 +222,8 @@ class Run:
         except BaseException:
             logger.exception('Error:')
             raise
+        finally:
+            dump_thread.join()
         logger.info('Run complete.')
 
     def _configure(self):
@@ -157,13 +235,14 @@ class Run:
             raise ConfigError(f'Please provide a land cover file for year {self.years[0]}.',
                               [_LAND_COVER, self.years[0]])
         try:
-            with rasterio.open(land_cover_year0) as src:
-                self.src_profile = src.profile
-                self.src_res = src.res
-                self.epsg = src.crs.to_epsg()
-                if self.epsg == 4326:
-                    logger.exception(f'Land cover {land_cover_year0} is in EPSG:4326 is not supported, please reproject')
-                    raise ConfigError(f'Land cover {land_cover_year0} is in EPSG:4326 is not supported, please reproject')
+            # load_profile caches the result, so later checks on this file don't have to open it again.
+            src_parameters = load_profile(land_cover_year0)
+            self.src_profile = src_parameters['profile']
+            self.src_res = src_parameters['res']
+            self.epsg = self.src_profile['crs'].to_epsg()
+            if self.epsg == 4326:
+                logger.exception(f'Land cover {land_cover_year0} is in EPSG:4326 is not supported, please reproject')
+                raise ConfigError(f'Land cover {land_cover_year0} is in EPSG:4326 is not supported, please reproject')
         except Exception as e:
             raise ConfigError(f'Failed to open land cover file for year {self.years[0]}: "{e}"',
                               [_LAND_COVER, self.years[0]])
@@ -225,11 +304,25 @@ class Run:
 
         os.makedirs(self.temp_dir(), exist_ok=True)
 
-    def _dump_config(self):
-        """Write a YAML dump of the current config in our run directory."""
+    def _dump_config(self, config):
+        """Write a YAML dump of ``config`` in our run directory.
+
+        Runs in a background thread, so errors are logged rather than raised.
+        """
         logger.debug('Dump config at %s', self.run_dir)
-        with open(os.path.join(self.run_dir, 'config.yaml'), 'w') as f:
-            f.write(yaml.dump(self.config))
+        config_file = os.path.join(self.run_dir, 'config.yaml')
+        try:
+            config_yaml = yaml.dump(config, Dumper=_YamlDumper)
+            try:  # When continuing a run with the same config, the file is already up to date.
+                with open(config_file) as f:
+                    if f.read() == config_yaml:
+                        return
+            except OSError:
+                pass
+            with open(config_file, 'w') as f:
+                f.write(config_yaml)
+        except Exception:
+            logger.exception('Failed to write config dump %s:', config_file)
 
     def _load_region_shapes(self):
         """Load shapes for statistics (input) and shapes for reporting (output) into a :class:`geopandas.GeoDataFrame`.
@@ -245,13 +338,6 @@ class Run:
         if not file_statistics:
             raise ConfigError('Please provide vector file describing the input statistics geographical regions.',
                               [_STATISTICS_SHAPE])
-        try:
-            self.statistics_shape = gpd.read_file(file_statistics).set_index(self.id_col_statistics).sort_index()
-        except KeyError:
-            raise ConfigError(f'The provided file "{file_statistics}" for input statistics geographical regions does '
-                              f'not have a column {self.id_col_statistics}.', [_STATISTICS_SHAPE])
-        except Exception as e:
-            raise Error(f'Failed to read input stastistics geographical regions file "{file_statistics}": {e}.')
 
         #: Column name to use as index in reporting region file.
         file_reporting = self.config.get(_REPORTING_SHAPE)
@@ -259,7 +345,10 @@ class Run:
             raise ConfigError('Please provide a vector file describing the geographical regions for reporting.',
                               [_REPORTING_SHAPE])
         try:
-            self.reporting_shape = gpd.read_file(file_reporting).set_index(self.id_col_reporting).sort_index()
+            # Only the index column and the geometry of the reporting regions are used, so skip all other attributes.
+            self.reporting_shape = gpd.read_file(
+                file_reporting, columns=[self.id_col_reporting], **_READ_FILE_OPTIONS).set_index(
+                self.id_col_reporting)
         except KeyError:
             raise ConfigError(f'The provided file "{file_reporting}" for reporting geographical regions does not have '
                               f'a column {self.id_col_reporting}.', [_REPORTING_SHAPE])
@@ -278,54 +367,79 @@ class Run:
         if lMismatch:
             raise ConfigError('The following regions are missing from the provided reporting vector file: ' +
                               ', '.join(lMismatch), [_REPORTING_SHAPE])
-        self.reporting_shape = self.reporting_shape.reindex(selected_regions).sort_index()
+        # reindex returns rows in the order of the labels, so sorting the labels avoids sorting the frame afterwards
+        self.reporting_shape = self.reporting_shape.reindex(sorted(selected_regions))
 
         logger.debug('Check if statistics and reporting vector files have correct EPSG')
+        # Build the target CRS once, and compare CRS objects directly: to_epsg() has to search the PROJ database.
+        target_crs = pyproj.CRS.from_epsg(self.epsg)
         # reporting vector file
-        try:
-            check_epsg = self.reporting_shape.crs.to_epsg()
-        except Exception:
+        if self.reporting_shape.crs is None:
             raise ConfigError('Please provide a reporting shapefile with a valid EPSG projection.',
                               [_REPORTING_SHAPE])
-        if check_epsg != self.epsg:
-            self.reporting_shape.to_crs(epsg=self.epsg, inplace=True)
+        if not self.reporting_shape.crs.equals(target_crs, ignore_axis_order=True):
+            self.reporting_shape.to_crs(target_crs, inplace=True)
             logger.debug('** reporting vector file had to be warped')
-        # statistics vector file
+
+        # Only statistics regions which intersect the selected reporting regions are needed: filter on the bounding box
+        # of the reporting regions (plus a margin of one pixel), so the driver can skip all other features using the
+        # spatial index of the file if it has one.  read_file reprojects the bbox GeoSeries to the CRS of the file, so
+        # this only works if the file has a CRS (otherwise we read everything, and report the missing CRS below).
+        reporting_bbox = gpd.GeoSeries([shapely.box(*self.reporting_shape.total_bounds).buffer(
+            self.src_res[0], join_style='mitre')], crs=self.reporting_shape.crs)
         try:
-            check_epsg = self.statistics_shape.crs.to_epsg()
-        except Exception:
+            if pyogrio.read_info(file_statistics)['crs'] is None:
+                reporting_bbox = None
+            self.statistics_shape = gpd.read_file(
+                file_statistics, bbox=reporting_bbox, **_READ_FILE_OPTIONS).set_index(self.id_col_statistics)
+        except KeyError:
+            raise ConfigError(f'The provided file "{file_statistics}" for input statistics geographical regions does '
+                              f'not have a column {self.id_col_statistics}.', [_STATISTICS_SHAPE])
+        except Exception as e:
+            raise Error(f'Failed to read input stastistics geographical regions file "{file_statistics}": {e}.')
+
+        # statistics vector file
+        if self.statistics_shape.crs is None:
             raise ConfigError('Please provide a statistics shapefile with a valid EPSG projection.',
                               [_STATISTICS_SHAPE])
-        if check_epsg != self.epsg:
-            self.statistics_shape.to_crs(epsg=self.epsg, inplace=True)
+        if not self.statistics_shape.crs.equals(target_crs, ignore_axis_order=True):
+            self.statistics_shape.to_crs(target_crs, inplace=True)
             logger.debug('** statistics vector file had to be warped')
 
         # SHAPE_ID: integer number to be used as identifier when rasterizing .
-        self.statistics_shape[SHAPE_ID] = range(1, 1 + self.statistics_shape.shape[0])
-        self.reporting_shape[SHAPE_ID] = range(1, 1 + self.reporting_shape.shape[0])
+        self.reporting_shape[SHAPE_ID] = _shape_ids(len(self.reporting_shape))
+        #: Area of each reporting region (in the order of :attr:`reporting_shape`), computed once for reuse.
+        self.reporting_areas = shapely.area(self.reporting_shape.geometry.values)
 
         # Get the "statistics_regions" needed to cover the selected "reporting_regions":
         #
-        # We clip the statistics vector file by the reporting one to get a list of all names from the statistic regions
-        # intersecting the reporting ones --> faster then a gpd.overlay()
-        logger.debug('** clip the statistical vector file by selected reporting regions')
-        df_check = gpd.clip(self.statistics_shape, self.reporting_shape)
+        # We intersect the statistics regions with the reporting regions to get a list of all names from the statistic
+        # regions intersecting the reporting ones.  The spatial index gives us the candidate pairs, so we only have to
+        # compute the intersection area for those pairs --> faster then a gpd.clip() or gpd.overlay()
+        logger.debug('** intersect the statistical vector file with selected reporting regions')
+        idx_reporting, idx_statistics = self.statistics_shape.sindex.query(self.reporting_shape.geometry.values,
+                                                                           predicate='intersects')
+        overlap = shapely.area(shapely.intersection(self.statistics_shape.geometry.values[idx_statistics],
+                                                    self.reporting_shape.geometry.values[idx_reporting]))
+        overlap = np.bincount(idx_statistics, weights=overlap, minlength=len(self.statistics_shape))
         # we have to remove false areas (boundary of a statistical region is identical to boundary of reporting one)
-        df_check = df_check[~df_check.is_empty]
-        df_check = df_check[df_check.area > POLY_MIN_SIZE]
-        if df_check.empty:
+        overlap_mask = overlap > POLY_MIN_SIZE
+        if not overlap_mask.any():
             raise ConfigError(
                 'No areas in the statistics regions file overlap with the selected reporting regions.',
                 [_STATISTICS_SHAPE])
         # check if all reporting polygons are completely covered by a statistical ones (minimum overlap)
-        area_delta = self.reporting_shape.area.sum() - df_check.area.sum()
+        area_delta = self.reporting_areas.sum() - overlap[overlap_mask].sum()
         # assume that any area difference less then a third of a pixel will disappear after rasterization
         if abs(area_delta) > (self.src_res[0] * self.src_res[1] / 3.):
             raise ConfigError(
                 'The statistics regions file does not completely cover all selected reporting regions.',
                 [_STATISTICS_SHAPE])
-        # extract the identifier to get the reporting_regions
-        self.statistics_shape = self.statistics_shape.reindex(df_check.index.unique()).sort_index()
+        # extract the identifier to get the reporting_regions (np.unique also sorts them)
+        self.statistics_shape = self.statistics_shape.reindex(np.unique(self.statistics_shape.index[overlap_mask]))
+        self.statistics_shape[SHAPE_ID] = _shape_ids(len(self.statistics_shape))
+        #: Area of each statistics region (in the order of :attr:`statistics_shape`), computed once for reuse.
+        self.statistics_areas = shapely.area(self.statistics_shape.geometry.values)
 
     def _StudyScopeCheck(self):
         """Set up project extent, resolution, raster metadata.
@@ -338,16 +452,9 @@ class Run:
         """
         # Generate the bounds for the statistical AOI
         logger.debug('Calculate the raster statistical AOI')
-        # first get total bounds for selected regions in statistical vector file
-        # format: minx, miny, maxx, maxy
-        bbox = self.statistics_shape.total_bounds
-        # allign to min_resolution increment to support better merges
-        bbox = bbox / MINIMUM_RESOLUTION
-        # named tuple - BoundingBox(left, bottom, right, top)
-        AOI_bbox = rasterio.coords.BoundingBox(left=math.floor(bbox[0]) * MINIMUM_RESOLUTION,
-                                               bottom=math.floor(bbox[1]) * MINIMUM_RESOLUTION,
-                                               right=math.ceil(bbox[2]) * MINIMUM_RESOLUTION,
-                                               top=math.ceil(bbox[3]) * MINIMUM_RESOLUTION)
+        # total bounds of the selected regions in the statistical vector file, aligned to MINIMUM_RESOLUTION
+        # increments to support better merges
+        AOI_bbox = _snap_bounds(self.statistics_shape.total_bounds)
 
         # Set up the accord object with the needed extent
         logger.debug('Initialize the global raster AccoRD object')
@@ -399,16 +506,9 @@ class Run:
 
     def _create_reporting_profile(self):
         """Generate the reporting regions rasterio profile out of the profile of the statistical regions."""
-        # first get total bounds for selected regions in reporting vector file
-        # format: minx, miny, maxx, maxy
-        bbox = self.reporting_shape.total_bounds
-        # allign to min_resolution increment to support better merges
-        bbox = bbox / MINIMUM_RESOLUTION
-        # named tuple - BoundingBox(left, bottom, right, top)
-        AOI_bbox = rasterio.coords.BoundingBox(left=math.floor(bbox[0]) * MINIMUM_RESOLUTION,
-                                               bottom=math.floor(bbox[1]) * MINIMUM_RESOLUTION,
-                                               right=math.ceil(bbox[2]) * MINIMUM_RESOLUTION,
-                                               top=math.ceil(bbox[3]) * MINIMUM_RESOLUTION)
+        # total bounds of the selected regions in the reporting vector file, aligned to MINIMUM_RESOLUTION
+        # increments to support better merges
+        AOI_bbox = _snap_bounds(self.reporting_shape.total_bounds)
         self.accord.reporting_extent = AOI_bbox
         # adapt the rasterio profile of statistical_regions
         self.accord.reporting_profile = self.accord.ref_profile.copy()
@@ -430,16 +530,61 @@ class Run:
         # first, reporting vector file
         # output file name
         self.reporting_raster = os.path.join(self.temp_dir(), 'reporting_shape_rasterized.tif')
-        # run rasterization
-        self.accord.rasterize(self.reporting_shape, SHAPE_ID, self.reporting_raster,
-                              guess_dtype=True, mode='statistical')
-
         # second, statistical vector file
-        # output file name
         self.statistics_raster = os.path.join(self.temp_dir(), 'statistics_shape_rasterized.tif')
-        # run rasterization
-        self.accord.rasterize(self.statistics_shape, SHAPE_ID, self.statistics_raster,
-                              guess_dtype=True, mode='statistical')
+        # run rasterization, both rasters get the same data type, just wide enough for all SHAPE_IDs.
+        dtype = _shape_id_dtype(max(len(self.statistics_shape), len(self.reporting_shape)))
+        with rasterio.Env(**self.gdal_env_options):
+            self.accord.rasterize(self.statistics_shape, SHAPE_ID, self.statistics_raster,
+                                  dtype=dtype, mode='statistical')
+            # If every statistics region lies within a single reporting region, the reporting raster follows from the
+            # statistics raster by a simple lookup, which is much cheaper than burning all reporting regions again.
+            lut = None if os.path.exists(self.reporting_raster) else self._reporting_lookup_table()
+            if lut is None:
+                self.accord.rasterize(self.reporting_shape, SHAPE_ID, self.reporting_raster,
+                                      dtype=dtype, mode='statistical')
+            else:
+                logger.debug('Derive reporting raster from statistics raster')
+                self._remap_raster(self.statistics_raster, self.reporting_raster, lut)
+
+    def _reporting_lookup_table(self):
+        """Build a lookup table from statistics region SHAPE_ID to the SHAPE_ID of the reporting region containing it.
+
+        :return: array ``lut`` so that ``lut[statistics_id]`` is the matching reporting id (0 for nodata), or None if
+          some statistics region is not contained in a single reporting region.
+        """
+        idx_statistics, idx_reporting = self.reporting_shape.sindex.query(self.statistics_shape.geometry.values,
+                                                                          predicate='intersects')
+        overlap = shapely.area(shapely.intersection(self.statistics_shape.geometry.values[idx_statistics],
+                                                    self.reporting_shape.geometry.values[idx_reporting]))
+        # For every statistics region, keep the reporting region with the largest overlap.
+        best_overlap = np.zeros(len(self.statistics_shape))
+        best_reporting = np.zeros(len(self.statistics_shape), dtype=np.intp)
+        order = np.lexsort((overlap, idx_statistics))  # sorted by statistics region, then by increasing overlap
+        idx_statistics, idx_reporting, overlap = idx_statistics[order], idx_reporting[order], overlap[order]
+        last = np.append(idx_statistics[1:] != idx_statistics[:-1], True)  # last (= largest) overlap of each region
+        best_overlap[idx_statistics[last]] = overlap[last]
+        best_reporting[idx_statistics[last]] = idx_reporting[last]
+        # Same tolerance as the coverage check in _load_region_shapes: less than a third of a pixel.
+        if np.any(self.statistics_areas - best_overlap > self.src_res[0] * self.src_res[1] / 3.):
+            return None
+
+        reporting_ids = self.reporting_shape[SHAPE_ID].values
+        lut = np.zeros(self.statistics_shape[SHAPE_ID].max() + 1, dtype=reporting_ids.dtype)
+        lut[self.statistics_shape[SHAPE_ID].values] = reporting_ids[best_reporting]
+        return lut
+
+    def _remap_raster(self, path_in, path_out, lut, block_shape=(4096, 4096)):
+        """Write a copy of an integer raster with every pixel value ``v`` replaced by ``lut[v]``."""
+        with rasterio.open(path_in) as src:
+            profile = src.profile
+            profile.update(nodata=0, predictor=2)
+            with rasterio.open(path_out, 'w', **profile) as dst:
+                for _, (rows, cols) in block_window_generator(block_shape, src.height, src.width):
+                    window = rasterio.windows.Window.from_slices(rows, cols)
+                    dst.write(lut[src.read(1, window=window)].astype(profile['dtype'], copy=False), 1, window=window)
+                dst.update_tags(**self.accord.metadata.prepare_raster_tags(
+                    'Vector file was rasterized to reference file extent.', ''))
 
     def adjust_rasters(self, config_check):
         """If needed, warp or clip input raster data so it matches the current calculation's extent and projection.
@@ -450,48 +595,41 @@ class Run:
             raise RuntimeError('adjust_rasters() called on ConfigCheck before validation.  This is an error.')
         config_rasters = config_check.get_configitems(ConfigRaster)
         config_rasterdirs = config_check.get_configitems(ConfigRasterDir)
-        rasterlists = {rasterdir: glob.glob(os.path.join(rasterdir.value, '*.tif')) +
-                       glob.glob(os.path.join(rasterdir.value, '*.tiff'))
-                       for rasterdir in config_rasterdirs if rasterdir.value}
+        rasterlists = {rasterdir: list_rasters(rasterdir.value) for rasterdir in config_rasterdirs if rasterdir.value}
         num_rasters = len(config_rasters) + sum(len(lst) for lst in rasterlists.values())
         if num_rasters == 0:
             return
 
-        progress_per_raster = 100. / num_rasters  # for progress bar
+        warp_suffix = '_{}m_EPSG{}.tif'.format(int(self.accord.ref_profile['transform'].a), self.accord.ref_epsg)
+        jobs = []  # (path_in, path_out, raster_type) for every raster
+        raster_jobs = []
         for raster in config_rasters:
             if raster.value is not None:
-                # Make a safe output filename for each different raster in the configuration
-                output_filename = '_'.join(str(x) for x in raster._path)
-                output_filename = ''.join(char if char.isalnum() else '_' for char in output_filename)
-                output_path = os.path.join(self.temp_dir(), output_filename +
-                                           '_{}m_EPSG{}.tif'.format(
-                                               int(self.accord.ref_profile['transform'].a),
-                                               self.accord.ref_profile['crs'].to_epsg()))
-                warped_raster = self.accord.AutomaticBring2AOI(raster.value, path_out=output_path,
-                                                               raster_type=raster.type, secure_run=True)
-                self._add_progress_prerun(progress_per_raster)
-                # Update config entry: recurse into config until we find the last item
-                entry = self.config
-                for key in raster._path:
-                    item = entry[key]
-                    if not isinstance(item, dict):
-                        entry[key] = warped_raster
-                        break
-                    else:
-                        entry = item
+                raster_jobs.append(raster)
+                jobs.append((raster.value, os.path.join(self.temp_dir(), raster.safe_name + warp_suffix), raster.type))
 
+        rasterdir_jobs = []
         for rasterdir, rasters in rasterlists.items():
-            output_dirname = '_'.join(str(x) for x in rasterdir._path)
-            output_dirname = ''.join(char if char.isalnum() else '_' for char in output_dirname)
-            tmpdir = os.path.join(self.temp_dir(), output_dirname)
+            tmpdir = os.path.join(self.temp_dir(), rasterdir.safe_name)
             os.makedirs(tmpdir, exist_ok=True)
-            warped_rasters = []
-            for file in rasters:
-                output_filename = os.path.join(tmpdir, os.path.basename(file))
-                warped_rasters.append(self.accord.AutomaticBring2AOI(file, path_out=output_filename,
-                                                                     raster_type=rasterdir.type, secure_run=True))
-                self._add_progress_prerun(progress_per_raster)
+            rasterdir_jobs.append((rasterdir, tmpdir, slice(len(jobs), len(jobs) + len(rasters))))
+            jobs += [(file, os.path.join(tmpdir, os.path.basename(file)), rasterdir.type) for file in rasters]
+
+        results = self._bring2aoi_parallel(jobs, add_progress=self._add_progress_prerun)
+
+        # Update the config only after all rasters are done, in the original order.
+        for raster, result in zip(raster_jobs, results):
+            # Update config entry: recurse into config until we find the last item
+            entry = self.config
+            for key in raster._path:
+                item = entry[key]
+                if not isinstance(item, dict):
+                    entry[key] = result
+                    break
+                else:
+                    entry = item
 
+        for rasterdir, tmpdir, dir_results in rasterdir_jobs:
             try:  # If input rasters already have right dimension, tmpdir will be empty -> attempt cleanup.
                 os.rmdir(tmpdir)  # Delete tmpdir if it's empty.
             except OSError:  # Directory was not empty.
@@ -501,19 +639,63 @@ class Run:
             for key in rasterdir._path:
                 item = entry[key]
                 if not isinstance(item, dict):
-                    entry[key] = sorted(warped_rasters)
+                    entry[key] = sorted(results[dir_results])
                     break
                 else:
                     entry = item
 
+        self._flush_progress(0, force=True)
+
+    def _bring2aoi_parallel(self, jobs, add_progress=lambda p: None):
+        """Bring several rasters to the reference grid in a pool of worker threads.
+
+        The heavy lifting (warping, translating, block processing) runs in-process in GDAL and numpy, which release the
+        GIL, so threads are sufficient (process pools would also not work when running inside QGIS).  The number of
+        threads is limited by the ``max_workers`` config item.
+
+        :param jobs: List of ``(path_in, path_out, raster_type)`` tuples: the input raster, the path for the adjusted
+                     raster, and its :class:`.geoprocessing.RasterType`.
+        :param add_progress: Callback function to report the progress, in percent of all jobs.
+        :return: List with the path of the raster to use for every job, in the same order as ``jobs``.
+        """
+        if not jobs:
+            return []
+        max_workers = self.config.get('max_workers') or os.cpu_count() or 1
+        # every job gets its share of the CPUs for its GDAL threads (all CPUs for a single job)
+        workers = min(max_workers, len(jobs))
+        num_threads = max(1, (os.cpu_count() or 1) // workers) if workers > 1 else None
+        logger.debug('Adjust %s input rasters using %s worker threads', len(jobs), workers)
+        with rasterio.Env(**self.gdal_env_options), \
+                concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            # Every job uses its own copy of the AccoRD object, which keeps state while processing a single raster.
+            futures = [executor.submit(self._bring2aoi, self.accord.copy(num_threads), path_in, path_out, raster_type)
+                       for path_in, path_out, raster_type in jobs]
+            try:
+                for future in concurrent.futures.as_completed(futures):
+                    future.result()  # raise errors as soon as they occur
+                    add_progress(100. / len(jobs))
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+        return [future.result() for future in futures]
+
+    def _bring2aoi(self, accord, path_in, path_out, raster_type):
+        """Run :meth:`.geoprocessing.GeoProcessing.AutomaticBring2AOI` in a worker thread."""
+        # rasterio.Env settings are per thread, so every worker sets up its own environment, with its share of the
+        # GDAL threads.
+        with rasterio.Env(**dict(self.gdal_env_options, GDAL_NUM_THREADS=accord._num_threads_option())):
+            return accord.AutomaticBring2AOI(path_in, path_out=path_out, raster_type=raster_type, secure_run=True)
+
     def add_progress(self, p):
         """Increment total progress and pass on to progress bar callback function.
 
-        The sum of all increments `p` during an entire run should equal 100.
+        The sum of all increments `p` during an entire run should equal 100.  Safe to call from worker threads.
         """
         if self._progress_callback is not None:
-            self._progress += p
-            self._progress_callback(p)
+            with self._progress_lock:
+                self._progress += round(p * _PROGRESS_UNITS)
+                self._progress_callback(p)
 
     def _add_progress_prerun(self, p):
         """Update progress bar outside of the main run phase.
@@ -521,6 +703,18 @@ class Run:
         This method should be used to update the progress bar for calculations in during initialization and raster
         checks, outside of the specific ecosystem service run itself.
         """
-        self._progress += p * (1 - self._progress_weight_run)
-        if self._progress_callback:
-            self._progress_callback(self._progress)
+        self._flush_progress(round(p * (1 - self._progress_weight_run) * _PROGRESS_UNITS))
+
+    def _flush_progress(self, delta, force=False):
+        """Add ``delta`` to the total progress, and pass the total on to the progress bar callback function.
+
+        ``delta`` is an integer number of 1 / ``_PROGRESS_UNITS`` percent, so many small increments add up exactly.
+        Safe to call from worker threads.  To avoid flooding the callback when many small steps complete quickly, the
+        callback is invoked at most once every ``_PROGRESS_INTERVAL`` seconds, unless ``force`` is set.
+        """
+        with self._progress_lock:
+            self._progress += delta
+            now = time.monotonic()
+            if self._progress_callback and (force or now - self._last_progress_callback >= _PROGRESS_INTERVAL):
+                self._last_progress_callback = now
+                self._progress_callback(self._progress / _PROGRESS_UNITS)
@@ -1,8 +1,10 @@
+import concurrent.futures
 import logging
 import os
 import numpy as np
 import geopandas as gpd
 import pandas as pd
+import rasterio
 from importlib.resources import files
 
 import enca
@@ -27,6 +29,7 @@ INDICES = {'l1': 'Burnt area',
 
 REF_YEAR = 'ref_year'
 REF_LANDCOVER = 'ref_landcover'
+USE_PARALLEL_YEARS = 'use_parallel_years'
 
 class Infra(enca.ENCARun):
 
@@ -40,6 +43,7 @@ class Infra(enca.ENCARun):
             self.component: {
                 REF_YEAR: ConfigItem(optional=True),
                 REF_LANDCOVER: ConfigRaster(optional=True),
+                USE_PARALLEL_YEARS: ConfigItem(optional=True, default=True),
                 "paths_indices" :
                     {layer: {YEARLY: ConfigRaster(optional=True)} for layer in INDICES},
                 "general" : {
@@ -77,32 +81,58 @@ class Infra(enca.ENCARun):
         # extract statistics per SELU
         logger.info('* Calculate Acessible Ecosystem Infrastructure per SELU')
         #40s per year
-        for year in self.years:
-            logger.info('** processing year {} ...'.format(year))
-            self.extract_stats(year)
+        self._for_all_years(self.extract_stats)
         logger.info('* SELU statistics ready')
 
         #return
 
-        # create INFRA account table per SELU
+        # create INFRA account table per SELU (needs the statistics of the first year as baseline)
         logger.info('* Calculate Overall access & intensity of use and health')
         #40s
-        for year in self.years:
-            logger.info('** processing year {} ...'.format(year))
-            self.calc_indices(year, ID_FIELD = 'HYBAS_ID', vrt_nodata=-9999)
+        self._for_all_years(self.calc_indices, ID_FIELD = 'HYBAS_ID', vrt_nodata=-9999)
 
         logger.info('* Indices available')
 
         # group INFRA account per reporting area -> done in TEC
         logger.debug('* Create INFRA account table')
-        for year in self.years:
-            #5s
-            logger.info('** processing year {} ...'.format(year))
-            self.create_account_table(year)
+        #5s
+        self._for_all_years(self.create_account_table)
         logger.info('* INFRA account created')
 
+    def _for_all_years(self, function, **kwargs):
+        """Run ``function(year, block_workers=..., **kwargs)`` for every year, in a pool of worker threads.
+
+        The years are independent, and the work is mostly GDAL I/O and numpy, which release the GIL.  We use threads,
+        as process pools do not work inside QGIS.  The ``max_workers`` threads are shared between the years, and the
+        raster blocks processed within each year (``block_workers``, e.g. for statistics_byArea).  Set
+        ``use_parallel_years`` to false in the config to process the years one by one, with all ``max_workers`` threads
+        for the raster blocks (this also needs less memory).
+        """
+        max_workers = self.config.get('max_workers') or os.cpu_count() or 1
+        year_workers = min(len(self.years), max_workers) if self.config[self.component][USE_PARALLEL_YEARS] else 1
+        block_workers = max(1, max_workers // year_workers)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=year_workers) as executor:
+            futures = {}
+            for year in self.years:
+                logger.info('** processing year {} ...'.format(year))
+                futures[executor.submit(self._run_year, function, year, block_workers, **kwargs)] = year
+            try:
+                for future in concurrent.futures.as_completed(futures):
+                    future.result()  # raise errors as soon as they occur
+                    logger.debug('** year %s ready', futures[future])
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    def _run_year(self, function, year, block_workers, **kwargs):
+        """Run ``function(year, block_workers=..., **kwargs)`` in a worker thread of :meth:`_for_all_years`."""
+        # rasterio.Env settings are per thread.  GDAL gets the same share of the CPUs as the block processing.
+        with rasterio.Env(**dict(self.gdal_env_options, GDAL_NUM_THREADS=block_workers)):
+            return function(year, block_workers=block_workers, **kwargs)
+
     ######################################################################################################################
-    def calc_indices(self, year, ID_FIELD = 'HYBAS_ID', vrt_nodata=-9999):
+    def calc_indices(self, year, ID_FIELD = 'HYBAS_ID', vrt_nodata=-9999, block_workers=None):
         # region = self.aoi_name
         path_SELU = self.path_results_eip[year]
         path_BASELINE = self.path_results_eip[self.years[0]]
@@ -112,8 +142,8 @@ class Infra(enca.ENCARun):
         # lPaths = []
         lColumns = []
 
-        #remove keys with none or empty value
-        self.config["infra"]["paths_indices_cleaned"] = {k: v[year] for k, v in self.config["infra"]["paths_indices"].items() if v[year]}
+        #remove keys with none or empty value (local, years are processed in parallel)
+        paths_indices = {k: v[year] for k, v in self.config["infra"]["paths_indices"].items() if v[year]}
 
         #TODO move to yaml incl key to indicate layer for indexing
         #note indexing the layer starts from 0
@@ -125,8 +155,8 @@ class Infra(enca.ENCARun):
         # Layer-6 = Fire Vulnerability (ad_9)
         # Layer-7 = Mine Pollution Risk (ad_10)
         # Layer-8 = Population statsitcs (ad_3)
-        paths= [path for path in self.config["infra"]["paths_indices_cleaned"].values()]
-        keys = [keys for keys in self.config["infra"]["paths_indices_cleaned"].keys()]
+        paths= [path for path in paths_indices.values()]
+        keys = [keys for keys in paths_indices.keys()]
         rename_dict= {'l1':'ad_8','l2':'ad_6',
                       'l3':'ad_7','l4':'ad_5','l5':'ad_4',
                       'l6':'ad_9','l7':'ad_10','l8':'ad_3',
@@ -147,7 +177,7 @@ class Infra(enca.ENCARun):
         for idx,path in enumerate(paths):
             stats = statistics_byArea(path, self.statistics_raster,
                                       self.statistics_shape[SHAPE_ID]
-                                      , transform=function[keys[idx]])
+                                      , transform=function[keys[idx]], max_workers=block_workers)
             stats.index = stats.index.astype(str)
             if keys[idx] == 'l4':
                 stats["sum"] = stats["sum"] *1.5
@@ -187,34 +217,49 @@ class Infra(enca.ENCARun):
         # EHI8_ready = False
         #health indicators
         if 'ad_4' in lColumns:
-            df['ad_4'] = np.clip(df['ad_4'], a_max=1.0, a_min=0.7)         #Clamp biodiversity intactness index to 1.0
+            #Clamp biodiversity intactness index to 1.0
+            df['ad_4'] = np.clip(df['ad_4'].to_numpy(), a_max=1.0, a_min=0.7)
         if 'ad_5' in lColumns:
-            df['ad_5'] = np.clip(df['ad_5'], a_max=1.0, a_min=0.7)         #Clamp MSA to 0.7 at lower boundaries
+            df['ad_5'] = np.clip(df['ad_5'].to_numpy(), a_max=1.0, a_min=0.7)      #Clamp MSA to 0.7 at lower boundaries
         if 'ad_6' in lColumns:
-            df['ad_6'] = np.clip(1. - df['ad_6'], a_max=None, a_min = 0.7)  #Reverse vulnerability to health and clamp low value
+            #Reverse vulnerability to health and clamp low value
+            df['ad_6'] = np.clip(1. - df['ad_6'].to_numpy(), a_max=None, a_min = 0.7)
             #note ad_6 (ecosystem vulnerability map) is too coarse and not used to calculate biodiversity health
         if 'ad_7' in lColumns:
-            df['ad_7'] = np.clip(df['ad_7'], a_max=None, a_min = 0.7)       #Clamp EDGE score to 0.7 at low range
+            df['ad_7'] = np.clip(df['ad_7'].to_numpy(), a_max=None, a_min = 0.7)   #Clamp EDGE score to 0.7 at low range
 
         if 'ad_12' in lColumns:
-            df['ad_12'] = np.clip(0.8 + df['ad_12']/10., a_max=1.0, a_min=None )   #Clamp Fauna density index between 0.9 and 1.0
+            #Clamp Fauna density index between 0.9 and 1.0
+            df['ad_12'] = np.clip(0.8 + df['ad_12'].to_numpy()/10., a_max=1.0, a_min=None )
             if 'ad_5' in lColumns:
                 df['EHI6']  = df[['ad_5','ad_12']].mean(axis=1)
-                df['EHI6'] = np.clip(df['EHI6'], a_max=None, a_min=0.7)
+                df['EHI6'] = np.clip(df['EHI6'].to_numpy(), a_max=None, a_min=0.7)
                 # EHI6_ready = True
             else: df['EHI6']    = 1
         elif 'ad_4'  in lColumns and 'ad_5'  in lColumns and 'ad_7' in lColumns:
             df['EHI6'] = df[['ad_4','ad_5','ad_7']].mean(axis=1)            #Average all biodiversity inputs
-            df['EHI6'] = np.clip(df['EHI6'], a_max=None, a_min=0.7)         #Clip biodiversity between 0.7 and 1.0 to count for uncertainty in biodiv indices
+            #Clip biodiversity between 0.7 and 1.0 to count for uncertainty in biodiv indices
+            df['EHI6'] = np.clip(df['EHI6'].to_numpy(), a_max=None, a_min=0.7)
             # EHI6_ready = True
         else: df['EHI6']    = 1
 
         if 'ad_8' in lColumns and 'ad_9' in lColumns:
             # non-burned_area/area + (burned/area * health_fire_danger-impact)
-            if 'ad_11' in lColumns:
-                # non-burned_area/area + (burned/area * (health_fire_danger-impact [0-1] / fire_density[0-3 fires in avg/year]))
-                df['EHI7']    =  ( ((df['EB1_1LC'] - df['ad_8']) / df['EB1_1LC'] * 1.0) + (df['ad_8'] / df['EB1_1LC'] * (df['ad_9'] / df['ad_11'])) )
-            else : df['EHI7']    =  ( ((df['EB1_1LC'] - df['ad_8']) / df['EB1_1LC'] * 1.0) + (df['ad_8'] / df['EB1_1LC'] * df['ad_9']) )
+            area = df['EB1_1LC'].to_numpy(dtype=np.float64)
+            burned = df['ad_8'].to_numpy(dtype=np.float64)
+            impact = df['ad_9'].to_numpy(dtype=np.float64)
+            # evaluate in place on two buffers instead of one temporary per pandas operation
+            with np.errstate(divide='ignore', invalid='ignore'):
+                if 'ad_11' in lColumns:
+                    # non-burned_area/area +
+                    #     (burned/area * (health_fire_danger-impact [0-1] / fire_density[0-3 fires in avg/year]))
+                    impact = impact / df['ad_11'].to_numpy(dtype=np.float64)
+                ehi7 = area - burned
+                ehi7 /= area
+                burned_fraction = burned / area
+                burned_fraction *= impact
+                ehi7 += burned_fraction
+            df['EHI7'] = ehi7
             # EHI7_ready = True
         else: df['EHI7']    = 1
 
@@ -224,11 +269,16 @@ class Infra(enca.ENCARun):
         #pollution indicators
         if ['ad_10'] in lColumns:
             df['EHI8']    = 1 - ((df['ad_10'] - 1.)/(10./2))                #Mining Pollution ranges 1.0 to 10.0
-            df['EHI8'] = np.clip(df['EHI8'], a_max=None, a_min=0.5)         #clip mining pollution between 0.5 and 1.0
+            #clip mining pollution between 0.5 and 1.0
+            df['EHI8'] = np.clip(df['EHI8'].to_numpy(), a_max=None, a_min=0.5)
             # EHI8_ready = True
         else: df['EHI8']    = 1
 
-        df['EIH'] = np.power(df['EHI6']*df['EHI7']*df['EHI8'],1./(3))  #geometric mean
+        #geometric mean
+        eih = df['EHI6'].to_numpy(dtype=np.float64) * df['EHI7'].to_numpy(dtype=np.float64)
+        eih *= df['EHI8'].to_numpy(dtype=np.float64)
+        with np.errstate(invalid='ignore'):
+            df['EIH'] = np.power(eih, 1./3, out=eih)
 
         #clip SUI to avoid overrun EI_IUV
         df['EIIUV']= df['EISUI']  * df['EIH']
@@ -247,8 +297,8 @@ class Infra(enca.ENCARun):
     ######################################################################################################################
     def SELUintersect(self,pArea, ID_FIELD):
         '''function to get results for only countries/areas'''
-        # read in SELU file
-        gdf = self.statistics_shape
+        # read in SELU file (copy, as we add columns and years are processed in parallel)
+        gdf = self.statistics_shape.copy()
 
         # read in country file
         gdf_country = self.reporting_shape.loc[[pArea]]
@@ -263,7 +313,7 @@ class Infra(enca.ENCARun):
         return gdf[ID_FIELD].tolist(), gdf[[ID_FIELD, 'F_AREA']]
 
     ######################################################################################################################
-    def create_account_table(self, year, ID_FIELD = 'HYBAS_ID'):
+    def create_account_table(self, year, ID_FIELD = 'HYBAS_ID', block_workers=None):
         #function creates the INFRA/FUNCTIONAL SERVICES ACCOUNT TABLE
         path_INFRA_shp = self.path_results_infra[year]
 
@@ -348,7 +398,7 @@ class Infra(enca.ENCARun):
         return
 
     ######################################################################################################################
-    def extract_stats(self, year, ID_FIELD='HYBAS_ID'):
+    def extract_stats(self, year, ID_FIELD='HYBAS_ID', block_workers=None):
 
         #1. build datacube raster from all input
         lPaths = []
@@ -376,7 +426,8 @@ class Infra(enca.ENCARun):
         df['Area_poly'] = df.area * m2_2ha
 
         for idx,path in enumerate(lPaths):
-            stats = statistics_byArea(path, self.statistics_raster, self.statistics_shape[SHAPE_ID])
+            stats = statistics_byArea(path, self.statistics_raster, self.statistics_shape[SHAPE_ID],
+                                      max_workers=block_workers)
             if idx == 0:
                 df["Area_rast"] = stats['px_count']*pix2ha
                 #normalize GBLI
@@ -102,8 +102,11 @@ class FRAGRIV(object):
 
                     aOut = np.sum(np.stack(aData, axis=0), axis= 0) / len(f_ins)
                     f_out.write(aOut.astype(rasterio.float32), 1,window=window)
-        except:
+        except BaseException:
             #remove wrong file
-            os.unlink(self.fragriv)
-
-        [f_in.close() for f_in in f_ins]
+            if os.path.exists(self.fragriv):
+                os.unlink(self.fragriv)
+            raise
+        finally:
+            for f_in in f_ins:
+                f_in.close()
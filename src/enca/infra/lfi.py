@@ -106,8 +106,8 @@ class OSM(object):
                 self.accord.vector_2_AOI(self.merged_trunkroads_railways,self.merged_trunkroads_railways_warped,mode='reporting')
             else:
                 self.merged_trunkroads_railways_warped = self.merged_trunkroads_railways
-        except:
-            raise RuntimeError('Failed to read {}.'.format(self.merged_trunkroads_railways))
+        except (OSError, RuntimeError, ValueError) as e:
+            raise Error('Failed to read {}: {}'.format(self.merged_trunkroads_railways, e))
 
         self.accord.rasterize_burn(self.merged_trunkroads_railways_warped,self.merged_trunkroads_railways_inv, nodata_value=1,
                                    burn_value=0, dtype='Byte')
@@ -23,6 +23,7 @@ import psutil
 import matplotlib.pyplot as plt
 import re
 import seaborn
+from enca.framework.geoprocessing import GeoProcessing
 
 ################333
 def createDataFrame(path, pattern, fsymlinks=False, second_pattern = None):
@@ -77,12 +78,11 @@ def Cut2AOI(path_in, path_out, file_extent):
     
 
 
-    cmd = 'gdal_translate --config GDAL_CACHEMAX 256 -co COMPRESS=LZW -projwin {} {} {} {} {} {}'.format(
-                                                                  bbox[0],bbox[3],bbox[2], bbox[1],
-                                                                  path_in, path_out)
-    
+    cmd = ['gdal_translate', '--config', 'GDAL_CACHEMAX', GeoProcessing.gdal_cache_pct, '-co', 'COMPRESS=LZW',
+           '-projwin', str(bbox[0]), str(bbox[3]), str(bbox[2]), str(bbox[1]), path_in, path_out]
+
     try:
-        subprocess.check_call(cmd, shell=True)
+        subprocess.check_call(cmd)
     except:
         raise
 
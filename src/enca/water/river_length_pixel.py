@@ -23,7 +23,7 @@ class RiverLength(enca.ENCARun):
 
     def _start(self):
         # Convert GLORIC shapefile to correct EPSG
-        ref_epsg = self.accord.ref_profile['crs'].to_epsg()
+        ref_epsg = self.accord.ref_epsg
         temp_file = os.path.join(self.temp_dir(), f'GLORIC_EPSG{ref_epsg}.shp')
 
         extent = self.accord.ref_extent
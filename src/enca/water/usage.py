@@ -131,14 +131,17 @@ class Usage(enca.ENCARun):
 
         # Now warp input for all needed years to our AOI:
         res = int(self.accord.ref_profile['transform'].a)
-        epsg = self.accord.ref_profile['crs'].to_epsg()
-        ghs_pop_aoi = {}
-        for year in years_needed:
-            input_file = ghs_pop_input[year]
+        epsg = self.accord.ref_epsg
+        years_needed = sorted(years_needed)
+        input_files = [ghs_pop_input[year] for year in years_needed]
+        output_files = []
+        for input_file in input_files:
             name = os.path.splitext(os.path.basename(input_file))[0]
-            output_file = os.path.join(self.maps, f'{name}_{res}m_EPSG{epsg}.tif')
-            ghs_pop_aoi[year] = self.accord.AutomaticBring2AOI(input_file, RasterType.ABSOLUTE_VOLUME,
-                                                               path_out=output_file, secure_run=True)
+            output_files.append(os.path.join(self.maps, f'{name}_{res}m_EPSG{epsg}.tif'))
+        # The years are independent, so warp them in parallel.
+        ghs_pop_aoi = dict(zip(years_needed, self._bring2aoi_parallel(
+            [(input_file, output_file, RasterType.ABSOLUTE_VOLUME)
+             for input_file, output_file in zip(input_files, output_files)])))
 
         # Now interpolate for those years that need it:
         years_warped = sorted(ghs_pop_aoi.keys())
@@ -0,0 +1,56 @@
+"""Regression tests for the block statistics of :mod:`enca.framework.geoprocessing`."""
+import math
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from enca.framework.geoprocessing import COUNT, SUM, statistics_byArea, statistics_byArea_byET
+
+# 4 x 4 fixture: area 0 is nodata, data -1 is nodata, ET class 255 is nodata.  ET classes 3 and 9 are not in
+# ET_NAMES, 3 lies within the range of the known classes, 9 outside of it.
+AREA = np.array([[1, 1, 2, 2],
+                 [1, 1, 2, 2],
+                 [0, 0, 2, 2],
+                 [1, 1, 2, 2]], dtype=np.uint8)
+ET = np.array([[1, 2, 1, 2],
+               [1, 3, 1, 9],
+               [1, 1, 255, 2],
+               [2, 3, 1, 1]], dtype=np.uint8)
+DATA = np.array([[1, 2, 3, 4],
+                 [5, -1, 6, 7],
+                 [8, 9, 10, 11],
+                 [12, 13, 14, 15]], dtype=np.float32)
+AREA_NAMES = {'A': 1, 'B': 2}
+ET_NAMES = {'x': 1, 'y': 2}
+
+
+def _write(path, array, nodata):
+    with rasterio.open(path, 'w', driver='GTiff', height=array.shape[0], width=array.shape[1], count=1,
+                       dtype=array.dtype, nodata=nodata, crs='EPSG:3035',
+                       transform=from_origin(4000000, 3000000, 100, 100)) as ds:
+        ds.write(array, 1)
+    return str(path)
+
+
+def _fixture(tmp_path):
+    return (_write(tmp_path / 'data.tif', DATA, -1), _write(tmp_path / 'area.tif', AREA, 0),
+            _write(tmp_path / 'ET.tif', ET, 255))
+
+
+def test_statistics_byArea(tmp_path):
+    path_data, path_area, _ = _fixture(tmp_path)
+    df = statistics_byArea(path_data, path_area, AREA_NAMES, block_shape=(2, 2))
+    assert list(df.index) == ['A', 'B']
+    assert df[SUM].tolist() == [33., 70.]
+    assert df[COUNT].tolist() == [5., 8.]
+
+
+def test_statistics_byArea_byET(tmp_path):
+    path_data, path_area, path_ET = _fixture(tmp_path)
+    df = statistics_byArea_byET(path_data, path_area, AREA_NAMES, path_ET, ET_NAMES, block_shape=(2, 2))
+    # pixels of unknown ET classes are kept, as rows with a NaN ecotype
+    index = [(area, None if isinstance(eco, float) and math.isnan(eco) else eco) for area, eco in df.index]
+    assert index == [('A', 'x'), ('A', 'y'), ('A', None), ('B', 'x'), ('B', 'y'), ('B', None)]
+    assert df[SUM].tolist() == [6., 14., 13., 38., 15., 7.]
+    assert df[COUNT].tolist() == [2., 2., 1., 4., 2., 1.]